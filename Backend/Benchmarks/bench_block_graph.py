@@ -0,0 +1,144 @@
+'''## Benchmark: compact scan records vs. building response models for every match
+Scans a synthetic repository (about `--blocks` Blocks, see `repo_generator`) for the backlinks of
+its most linked to Page and for a common search term, once collecting Pydantic models for every
+match (how scans used to work, reimplemented here for comparison) and once with the slotted records
+of `meta_utils`, converted to the same response models at the end. Reports the time taken and the
+memory held by the collected matches (with `tracemalloc`, Page contents already cached).
+
+    python -m Backend.Benchmarks.bench_block_graph --blocks 100000
+'''
+import argparse
+import gc
+import shutil
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from ..models.meta_model import BackLink, BackLinkReference, BlockSearchResult, PageLinkage
+from ..utilities.cache_utils import page_cache
+from ..utilities.meta_utils import BacklinkExtractor, ReferenceExtractor, References, scan_page_files, find_blocks
+from ..utilities.outline_utils import PageOutline
+from ..utilities.page_utils import extract_page_link_names
+from .repo_generator import BLOCKS_PER_PAGE, generate_repo
+
+DEFAULT_BLOCK_COUNT = 100_000
+SEARCH_QUERY = 'e' # in most lines of random text
+
+##
+## How scans collected their results before (a model per match, children copied)
+##
+
+class LegacyReferences:
+    def __init__(self):
+        self.backlinks_map: Dict[str, BackLink] = {}
+
+    def add_backlink(self, backlink: BackLink) -> None:
+        if backlink.page_name in self.backlinks_map:
+            self.backlinks_map[backlink.page_name].references.extend(backlink.references)
+        else:
+            self.backlinks_map[backlink.page_name] = backlink
+
+class LegacyBacklinkExtractor(ReferenceExtractor):
+    def __init__(self, src_page_name: str):
+        self._src_page_name: str = src_page_name
+
+    def extract(self, text: str, active_page_name: str, line_index: int, outline: PageOutline, collected: LegacyReferences) -> None:
+        for backlink_name in extract_page_link_names(text):
+            if backlink_name == self._src_page_name:
+                children = outline.children(line_index - 1)
+                references = [BackLinkReference(line=text, line_number=line_index, children=children)]
+                collected.add_backlink(BackLink(page_name=active_page_name, references=references))
+
+def legacy_collect_backlinks(page_name: str, paths: Sequence[Path]) -> LegacyReferences:
+    refs = LegacyReferences()
+    extractors = [LegacyBacklinkExtractor(page_name)]
+    for path in paths: # same loop as `meta_utils._process_file`
+        outline = PageOutline(page_cache.read_lines(path))
+        active_page_name = path.name.replace('.md', '')
+        line_index = 0
+        for line in outline.lines:
+            for extractor in extractors:
+                extractor.extract(line, active_page_name, line_index + 1, outline, refs)
+            line_index += 1
+    return refs
+
+def legacy_search_blocks(query: str, paths: Sequence[Path]) -> List[BlockSearchResult]:
+    block_list: List[BlockSearchResult] = []
+    for path in paths:
+        last_block: Optional[BlockSearchResult] = None
+        line_number = 1
+        for line in page_cache.read_text(path).splitlines():
+            if query.lower() in line.lower():
+                last_block = BlockSearchResult(block_id=None, block_text=line, line_number=line_number, page_name=path.name)
+                block_list.append(last_block)
+            elif 'id::' in line and last_block is not None:
+                last_block.block_id = line.split('id::')[1].strip()
+            else:
+                last_block = None
+            line_number += 1
+    return block_list
+
+##
+## Measuring
+##
+
+def measure(collect: Callable[[], object], convert: Callable[[object], object], repeat: int = 3) -> Tuple[float, float]:
+    '''## Time to collect and convert (ms, best of `repeat`), and memory held by the collected matches (MiB)'''
+    elapsed_ms = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        convert(collect())
+        elapsed_ms = min(elapsed_ms, (time.perf_counter() - start) * 1000)
+
+    gc.collect()
+    tracemalloc.start()
+    collected = collect()
+    held_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del collected
+    return elapsed_ms, held_bytes / 2**20
+
+def report(name: str, legacy: Tuple[float, float], compact: Tuple[float, float], match_count: int) -> None:
+    (legacy_ms, legacy_mib), (compact_ms, compact_mib) = legacy, compact
+    print(f'{name} ({match_count} matches)')
+    print(f'  model per match: {legacy_ms:9.1f} ms {legacy_mib:8.2f} MiB held')
+    print(f'  compact records: {compact_ms:9.1f} ms {compact_mib:8.2f} MiB held')
+    print(f'  saved:           {legacy_ms - compact_ms:9.1f} ms {legacy_mib - compact_mib:8.2f} MiB '
+          f'({(1 - compact_ms / legacy_ms) * 100:.0f}% time, {(1 - compact_mib / legacy_mib) * 100:.0f}% memory)')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--blocks', type=int, default=DEFAULT_BLOCK_COUNT, help='roughly how many Blocks the repository has')
+    parser.add_argument('--seed', type=int, default=1234)
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix='elegant-notes-bench-'))
+    try:
+        page_count = max(1, args.blocks * 2 // sum(BLOCKS_PER_PAGE))
+        repo = generate_repo(work_dir / 'repo', page_count, args.seed)
+        paths = sorted(repo.pages_path.glob('*.md'))
+        block_count = sum(len(page_cache.read_lines(path)) for path in paths) # also fills the cache
+        print(f'{len(paths)} pages, {block_count} lines')
+
+        extractors = [BacklinkExtractor(repo.hub_page_name + '.md')]
+        legacy_refs = legacy_collect_backlinks(repo.hub_page_name, paths)
+        backlink_count = sum(len(backlink.references) for backlink in legacy_refs.backlinks_map.values())
+        report('backlinks of the most linked to page',
+               measure(lambda: legacy_collect_backlinks(repo.hub_page_name, paths),
+                       lambda refs: PageLinkage(backlinks=refs.backlinks_map.values(), block_refs=[])),
+               measure(lambda: scan_page_files(extractors, paths), References.to_model),
+               backlink_count)
+
+        report(f'block search for {SEARCH_QUERY!r}',
+               measure(lambda: legacy_search_blocks(SEARCH_QUERY, paths), list),
+               measure(lambda: [find_blocks(SEARCH_QUERY, path) for path in paths],
+                       lambda pages: [matches.to_model(index) for matches in pages for index in range(len(matches))]),
+               len(legacy_search_blocks(SEARCH_QUERY, paths)))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+'''## Benchmark: concurrent logins/registrations against the users database
+Compares SQLAlchemy's default SQLite engine with `db_api.create_users_engine` (WAL, pragmas,
+pooling). Each thread registers users and looks them up again (the database part of a login;
+password hashing is left out, see `bench_password_hashing`). Reports operations per second and
+how many failed with `database is locked`.
+
+    python -m Backend.Benchmarks.bench_concurrent_logins --threads 16 --operations 200
+'''
+import argparse
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from ..database.db_api import Base, create_users_engine
+from ..models.user_model import User
+from ..utilities.db_utils import db_add_user, db_get_user_by_username
+
+# a real hash, so nothing gets hashed while measuring
+HASHED_PASSWORD = '$2b$04$1ODiMsDuXpf6rf.m3RfX1uXtVMmT41zXGWL7c6TwR6XNyzCJgPLsm'
+
+def run_workload(engine, thread_count: int, operation_count: int):
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def worker(thread_index: int) -> int:
+        failures = 0
+        for operation_index in range(operation_count):
+            db = session_factory()
+            try:
+                username = f'user-{thread_index}-{operation_index // 4}@email.com'
+                if operation_index % 4 == 0: # one registration for every three logins
+                    db_add_user(db, User(id='', username=username, password='', name='Benchmark'), HASHED_PASSWORD)
+                else:
+                    db_get_user_by_username(db, username)
+            except OperationalError:
+                failures += 1
+                db.rollback()
+            finally:
+                db.close()
+        return failures
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=thread_count) as executor:
+        failures = sum(executor.map(worker, range(thread_count)))
+    elapsed = time.perf_counter() - start
+    engine.dispose()
+    return thread_count * operation_count / elapsed, failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--operations', type=int, default=200, help='operations per thread')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engines = {
+            'default engine': lambda url: create_engine(url, connect_args={'check_same_thread': False}),
+            'tuned engine': create_users_engine,
+        }
+        for label, make_engine in engines.items():
+            url = f'sqlite:///{Path(tmp_dir) / uuid.uuid4().hex}.db'
+            operations_per_second, failures = run_workload(make_engine(url), args.threads, args.operations)
+            print(f'{label:>15}: {operations_per_second:8.1f} operations/sec, {failures} failed (database is locked)')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+'''## Benchmark: FastAPI's default JSON encoding vs. the pre-encoded responses of `json_utils`
+Collects the backlinks of the most linked to Page and the results of a common block search in a
+synthetic repository (about `--blocks` Blocks, see `repo_generator`), then times turning them into
+a response body: the way FastAPI does for returned models (`jsonable_encoder` and `JSONResponse`),
+with Pydantic's serializer (`dump_models_json`) and, for the backlinks, straight from the scan
+records (`References.to_json`, with and without `orjson`). The backlinks are timed starting from
+the scan records, so building the models counts. All bodies are checked to be the same.
+
+    python -m Backend.Benchmarks.bench_json --blocks 100000
+'''
+import argparse
+import gc
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from ..models.meta_model import BlockSearchResult, PageLinkage
+from ..utilities import json_utils
+from ..utilities.cache_utils import page_cache
+from ..utilities.json_utils import dump_models_json
+from ..utilities.meta_utils import BacklinkExtractor, scan_page_files, find_blocks
+from .repo_generator import BLOCKS_PER_PAGE, generate_repo
+
+DEFAULT_BLOCK_COUNT = 100_000
+SEARCH_QUERY = 'e' # in most lines of random text
+
+def measure(encode: Callable[[], bytes], repeat: int = 3) -> float:
+    '''## Time to encode (ms, best of `repeat`)'''
+    elapsed_ms = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        encode()
+        elapsed_ms = min(elapsed_ms, (time.perf_counter() - start) * 1000)
+    return elapsed_ms
+
+def default_response_body(value) -> bytes:
+    return JSONResponse(jsonable_encoder(value)).body
+
+def without_orjson(encode: Callable[[], bytes]) -> Callable[[], bytes]:
+    def encode_without_orjson() -> bytes:
+        orjson, json_utils.orjson = json_utils.orjson, None
+        try:
+            return encode()
+        finally:
+            json_utils.orjson = orjson
+    return encode_without_orjson
+
+def report(name: str, encoders: List[tuple]) -> None:
+    bodies = {label: encode() for label, encode in encoders}
+    expected = next(iter(bodies.values()))
+    print(f'{name} ({len(expected) / 2**20:.1f} MiB)')
+    baseline_ms = None
+    for label, encode in encoders:
+        elapsed_ms = measure(encode)
+        baseline_ms = elapsed_ms if baseline_ms is None else baseline_ms
+        same = 'same bytes' if bodies[label] == expected else 'DIFFERENT BYTES'
+        print(f'  {label:<28} {elapsed_ms:9.1f} ms {baseline_ms / elapsed_ms:6.1f}x  {same}')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--blocks', type=int, default=DEFAULT_BLOCK_COUNT, help='roughly how many Blocks the repository has')
+    parser.add_argument('--seed', type=int, default=1234)
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix='elegant-notes-bench-'))
+    try:
+        page_count = max(1, args.blocks * 2 // sum(BLOCKS_PER_PAGE))
+        repo = generate_repo(work_dir / 'repo', page_count, args.seed)
+        paths = sorted(repo.pages_path.glob('*.md'))
+        block_count = sum(len(page_cache.read_lines(path)) for path in paths) # also fills the cache
+        print(f'{len(paths)} pages, {block_count} lines, orjson {"installed" if json_utils.orjson else "not installed"}')
+
+        refs = scan_page_files([BacklinkExtractor(repo.hub_page_name + '.md')], paths)
+        linkage = refs.to_model()
+        encoders = [('jsonable_encoder (default)', lambda: default_response_body(refs.to_model())),
+                    ('dump_models_json', lambda: dump_models_json(refs.to_model(), PageLinkage)),
+                    ('to_json without orjson', without_orjson(refs.to_json))]
+        if json_utils.orjson is not None:
+            encoders.append(('to_json with orjson', refs.to_json))
+        report(f'backlinks of the most linked to page ({sum(len(b.references) for b in linkage.backlinks)} references)', encoders)
+
+        results = [matches.to_model(index) for matches in (find_blocks(SEARCH_QUERY, path) for path in paths)
+                   for index in range(len(matches))]
+        report(f'block search for {SEARCH_QUERY!r} ({len(results)} results)',
+               [('jsonable_encoder (default)', lambda: default_response_body(results)),
+                ('dump_models_json', lambda: dump_models_json(results, List[BlockSearchResult]))])
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
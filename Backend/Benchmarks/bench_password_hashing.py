@@ -0,0 +1,53 @@
+'''## Microbenchmark: logins per second through the password hashing pool
+Verifies the same password over and over (what a login burst looks like to the server) with a
+range of pool sizes, and reports logins/sec in total and per worker thread (~per core).
+
+    python -m Backend.Benchmarks.bench_password_hashing --rounds 12 --logins 64
+'''
+import argparse
+import asyncio
+import os
+import time
+
+from ..config import (
+    set_bcrypt_rounds,
+    set_password_hash_workers,
+    set_password_hash_queue_limit,
+    DEFAULT_BCRYPT_ROUNDS,
+)
+from ..utilities.auth_utils import hash_str
+from ..utilities.password_pool_utils import PasswordHashingPool
+
+def measure_logins_per_second(hashed: str, password: str, login_count: int, worker_count: int) -> float:
+    set_password_hash_workers(worker_count)
+    set_password_hash_queue_limit(login_count) # nothing gets rejected while measuring
+    pool = PasswordHashingPool()
+
+    async def login_burst():
+        await asyncio.gather(*(pool.verify(hashed, password) for _ in range(login_count)))
+
+    start = time.perf_counter()
+    asyncio.run(login_burst())
+    elapsed = time.perf_counter() - start
+    pool.shutdown()
+    return login_count / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, default=DEFAULT_BCRYPT_ROUNDS, help='bcrypt cost factor')
+    parser.add_argument('--logins', type=int, default=32, help='logins per measurement')
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    set_bcrypt_rounds(args.rounds)
+    password = 'correct horse battery staple'
+    hashed = hash_str(password)
+    print(f'bcrypt rounds: {args.rounds}, logins per measurement: {args.logins}')
+    worker_count = 1
+    while worker_count <= args.max_workers:
+        logins_per_second = measure_logins_per_second(hashed, password, args.logins, worker_count)
+        print(f'{worker_count:>3} worker(s): {logins_per_second:8.1f} logins/sec, {logins_per_second / worker_count:8.1f} per core')
+        worker_count *= 2
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+'''## Benchmark suite: the main operations against synthetic repositories of 1k/10k/100k Pages
+Generates a repository per size (see `repo_generator`; same seed, same repository), then times
+getting a Page's references, Block search (scanning and, if available, with the search index),
+Page search, renaming a well-linked Page, saving a Page and logging in.
+
+Everything runs in-process and offline. Results are written as JSON so runs on different commits
+can be compared:
+
+    python -m Backend.Benchmarks.bench_suite --sizes 1000,10000 --output before.json
+    python -m Backend.Benchmarks.bench_suite --sizes 1000,10000 --output after.json --compare before.json
+
+The first call of each operation (`cold_ms`) includes building the indexes it relies on; the
+other statistics are over the calls after it. Block search scans also report their throughput
+(`mb_per_s`, bytes of Pages scanned per second at the median).
+'''
+import argparse
+import asyncio
+import itertools
+import json
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy.orm import sessionmaker
+
+from ..config import (
+    set_bcrypt_rounds,
+    set_block_search_db_path,
+    set_save_coalesce_window,
+    DEFAULT_BCRYPT_ROUNDS,
+)
+from ..database.db_api import Base, create_users_engine
+from ..handlers.auth_handler import handle_user_login
+from ..handlers.meta_handler import handle_get_all_references, handle_block_search, handle_page_search
+from ..handlers.page_handler import handle_page_rename, handle_update_page
+from ..models.meta_model import ReferencesRetrievalRequest
+from ..models.page_model import PageRenameInfo, PageWithContentWithoutMetaData
+from ..models.user_model import User, UserCredentials
+from ..utilities.auth_utils import hash_str
+from ..utilities.db_utils import db_add_user
+from ..utilities.index_utils import drop_reference_index
+from ..utilities.page_metadata_utils import drop_page_metadata_index
+from ..utilities.page_search_utils import drop_page_name_index
+from ..utilities.password_pool_utils import password_hashing_pool
+from ..utilities.search_index_utils import drop_block_search_index, is_fts5_available
+from .repo_generator import generate_repo, page_name, GeneratedRepo
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_SEED = 1234
+DEFAULT_RUNS = 10
+# comparing against a previous run flags anything this much slower (median)
+REGRESSION_THRESHOLD = 1.2
+
+def time_calls(func: Callable[[], object], runs: int) -> Dict[str, float]:
+    '''## Call `func` once cold and then `runs` times, and summarize the timings in milliseconds'''
+    start = time.perf_counter()
+    func()
+    cold_ms = (time.perf_counter() - start) * 1000
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        'runs': runs,
+        'cold_ms': round(cold_ms, 3),
+        'min_ms': round(timings[0], 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+    }
+
+def benchmark_repo(repo: GeneratedRepo, runs: int, search_db_path: Optional[Path]) -> List[dict]:
+    results = []
+
+    def record(name: str, func: Callable[[], object], run_count: int = runs, scanned_bytes: Optional[int] = None):
+        result = {'benchmark': name, 'pages': len(repo.page_names), **time_calls(func, run_count)}
+        throughput = ''
+        if scanned_bytes is not None:
+            result['mb_per_s'] = round(scanned_bytes / 1e6 / (result['median_ms'] / 1000), 1)
+            throughput = f'   {result["mb_per_s"]:>8.1f} MB/s'
+        results.append(result)
+        print(f'{result["pages"]:>7} pages  {name:<28} cold {result["cold_ms"]:>10.1f} ms   median {result["median_ms"]:>10.1f} ms{throughput}')
+
+    hub_request = ReferencesRetrievalRequest(page_name=repo.hub_page_name, block_ids=repo.block_ids[:5])
+    record('get_all_references', lambda: handle_get_all_references(hub_request, repo.repo_path))
+
+    repo_bytes = sum(path.stat().st_size for path in repo.repo_path.rglob('*.md'))
+    record('block_search_scan', lambda: handle_block_search('abc', repo.repo_path), scanned_bytes=repo_bytes)
+    record('block_search_scan_limit_20', lambda: handle_block_search('abc', repo.repo_path, limit=20))
+
+    record('page_search_prefix', lambda: handle_page_search('page-0001', repo.repo_path, limit=20))
+    record('page_search_fuzzy', lambda: handle_page_search('pge12', repo.repo_path, limit=20, fuzzy=True))
+
+    # a single changed line, saved straight to disk (no coalescing)
+    page_to_save = page_name(len(repo.page_names) // 2)
+    original_content = (repo.pages_path / f'{page_to_save}.md').read_text()
+    saves = itertools.count()
+    record('update_page', lambda: handle_update_page(repo.pages_path, PageWithContentWithoutMetaData(
+        name=page_to_save, content=f'{original_content}- saved {next(saves)} times\n')))
+
+    # rename the most linked to Page back and forth, which rewrites every Page linking to it
+    names = [repo.hub_page_name, f'{repo.hub_page_name}-renamed']
+    renames = itertools.count()
+    def rename():
+        index = next(renames)
+        rename_info = PageRenameInfo(old_name=names[index % 2], new_name=names[(index + 1) % 2])
+        handle_page_rename(repo.pages_path, rename_info, repo.repo_path)
+    record('page_rename_hub', rename, run_count=runs if runs % 2 else runs + 1) # end up with the original name
+
+    # last, so the index doesn't slow down the saves and renames above by keeping up with them
+    if search_db_path is not None:
+        set_block_search_db_path(search_db_path)
+        record('block_search_index', lambda: handle_block_search('abc', repo.repo_path))
+        set_block_search_db_path(None)
+
+    # free the indexes of this repository before moving on to the next (see `UserRepository.release`)
+    drop_reference_index(repo.repo_path)
+    drop_page_name_index(repo.repo_path)
+    drop_block_search_index(repo.repo_path)
+    drop_page_metadata_index(repo.pages_path)
+    return results
+
+def benchmark_login(work_dir: Path, runs: int, bcrypt_rounds: int) -> dict:
+    set_bcrypt_rounds(bcrypt_rounds)
+    engine = create_users_engine(f'sqlite:///{work_dir / "users.db"}')
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    credentials = UserCredentials(username='benchmark@email.com', password='correct horse battery staple')
+    db_add_user(db, User(id='benchmark', name='Benchmark', **credentials.model_dump()), hash_str(credentials.password))
+    try:
+        result = {'benchmark': 'login', 'pages': None, 'bcrypt_rounds': bcrypt_rounds,
+                  **time_calls(lambda: asyncio.run(handle_user_login(credentials, db)), runs)}
+    finally:
+        db.close()
+        engine.dispose()
+        password_hashing_pool.shutdown()
+    print(f'{"":>13}{"login":<28} cold {result["cold_ms"]:>10.1f} ms   median {result["median_ms"]:>10.1f} ms')
+    return result
+
+def compare_results(previous: dict, current: dict, threshold: float = REGRESSION_THRESHOLD) -> List[str]:
+    '''## Benchmarks whose median got slower than `threshold` times the previous one'''
+    previous_medians = {(r['benchmark'], r['pages']): r['median_ms'] for r in previous['results']}
+    regressions = []
+    for result in current['results']:
+        before = previous_medians.get((result['benchmark'], result['pages']))
+        if before and result['median_ms'] > before * threshold:
+            regressions.append(f'{result["benchmark"]} ({result["pages"]} pages): {before:.1f} ms -> {result["median_ms"]:.1f} ms')
+    return regressions
+
+def _current_commit() -> Optional[str]:
+    try:
+        completed = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                   cwd=Path(__file__).parent, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return completed.stdout.strip() or None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)), help='comma separated Page counts')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS, help='timed calls per operation (after the cold one)')
+    parser.add_argument('--rounds', type=int, default=DEFAULT_BCRYPT_ROUNDS, help='bcrypt cost factor for logins')
+    parser.add_argument('--output', type=Path, help='where to write the JSON results (default: stdout)')
+    parser.add_argument('--compare', type=Path, help='JSON results of a previous run to check for regressions')
+    parser.add_argument('--work-dir', type=Path, help='where to generate the repositories (default: a temporary folder, removed afterwards)')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    set_block_search_db_path(None) # Block search scans unless asked otherwise below
+    set_save_coalesce_window(0) # time the save itself, not handing it to the queue
+    work_dir = args.work_dir or Path(tempfile.mkdtemp(prefix='elegant-notes-bench-'))
+    work_dir.mkdir(parents=True, exist_ok=True)
+    search_db_path = work_dir / 'block-search.db' if is_fts5_available() else None
+
+    results = []
+    try:
+        for size in sizes:
+            start = time.perf_counter()
+            repo = generate_repo(work_dir / f'repo-{size}', size, args.seed)
+            print(f'generated {size} pages in {time.perf_counter() - start:.1f} s')
+            results.extend(benchmark_repo(repo, args.runs, search_db_path))
+        results.append(benchmark_login(work_dir, args.runs, args.rounds))
+    finally:
+        if args.work_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        'commit': _current_commit(),
+        'created': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'results': results,
+    }
+    report_json = json.dumps(report, indent=2)
+    if args.output is None:
+        print(report_json)
+    else:
+        args.output.write_text(report_json + '\n')
+
+    if args.compare is not None:
+        regressions = compare_results(json.loads(args.compare.read_text()), report)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
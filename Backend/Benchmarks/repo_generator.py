@@ -0,0 +1,59 @@
+'''## Synthetic user repositories for benchmarking
+Built on the test data generators (`Tests/utils.py`), which draw from the global `random` module,
+so a repository generated from the same seed is the same every time.'''
+import random
+import uuid
+from pathlib import Path
+from typing import List, NamedTuple
+
+from ..Tests.utils import generate_line_content, write_md_content
+
+# Rough shape of a real notes repository
+BLOCKS_PER_PAGE = (5, 30)
+BLOCK_TEXT_LENGTH = (10, 80)
+MAX_INDENTION_LEVEL = 4
+LINK_PROBABILITY = 0.15       # per Block
+BLOCK_REF_PROBABILITY = 0.03  # per Block
+BLOCK_ID_PROBABILITY = 0.05   # per Block (how many Blocks get referenced at all)
+# Links favour a few popular ("hub") Pages, like daily notes or project Pages do
+LINK_TARGET_SKEW = 1.2
+
+class GeneratedRepo(NamedTuple):
+    repo_path: Path
+    pages_path: Path
+    page_names: List[str]
+    hub_page_name: str       # the most linked to Page
+    block_ids: List[str]
+
+def page_name(index: int) -> str:
+    return f'page-{index:06}'
+
+def generate_repo(repo_path: Path, page_count: int, seed: int) -> GeneratedRepo:
+    random.seed(seed)
+    pages_path = repo_path / 'pages'
+    pages_path.mkdir(parents=True, exist_ok=True)
+    page_names = [page_name(index) for index in range(page_count)]
+    # Zipf-like popularity: the n-th Page gets linked to about 1/n^skew as often as the first one
+    link_weights = [1 / (rank + 1) ** LINK_TARGET_SKEW for rank in range(page_count)]
+    link_targets = random.choices(page_names, weights=link_weights, k=page_count * 4)
+    block_ids: List[str] = []
+
+    for name in page_names:
+        lines = []
+        indention_level = 0
+        for _ in range(random.randint(*BLOCKS_PER_PAGE)):
+            # children only ever go one level deeper than their parent
+            indention_level = random.randint(0, min(indention_level + 1, MAX_INDENTION_LEVEL))
+            line = generate_line_content(indention_level, random.randint(*BLOCK_TEXT_LENGTH))
+            if random.random() < LINK_PROBABILITY:
+                line += f' [[{random.choice(link_targets)}]]'
+            if block_ids and random.random() < BLOCK_REF_PROBABILITY:
+                line += f' (({random.choice(block_ids)}))'
+            lines.append(line)
+            if random.random() < BLOCK_ID_PROBABILITY:
+                block_id = str(uuid.UUID(int=random.getrandbits(128), version=4))
+                block_ids.append(block_id)
+                lines.append(f'{" " * 4 * indention_level}  id:: {block_id}')
+        write_md_content(pages_path / f'{name}.md', '\n'.join(lines) + '\n')
+
+    return GeneratedRepo(repo_path, pages_path, page_names, page_names[0], block_ids)
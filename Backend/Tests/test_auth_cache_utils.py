@@ -0,0 +1,103 @@
+import uuid
+
+import pytest
+
+from ..models.user_model import User
+from ..utilities.auth_cache_utils import AuthCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+def make_user(username='example@email.com'):
+    return User(id=str(uuid.uuid4()), username=username, password='hash', name='Test User')
+
+def test_auth_cache__hit_after_put(clock):
+    # Setup environment
+    cache = AuthCache(clock=clock)
+    user = make_user()
+
+    # Perform function action under testing
+    assert cache.get('token') is None
+    cache.put('token', user, clock.now + 60)
+    cached = cache.get('token')
+
+    # Verify results
+    assert cached == user
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.entries) == (1, 1, 1)
+    assert stats.hit_rate == 0.5
+
+@pytest.mark.parametrize('token_lifetime,ttl,expected_lifetime', [
+    (60, 300, 60),  # token expires first
+    (600, 300, 300), # TTL ends first
+])
+def test_auth_cache__entries_expire(clock, token_lifetime, ttl, expected_lifetime):
+    # Setup environment
+    cache = AuthCache(ttl_seconds=ttl, clock=clock)
+    cache.put('token', make_user(), clock.now + token_lifetime)
+
+    # Perform function action under testing
+    clock.now += expected_lifetime - 1
+    before_expiring = cache.get('token')
+    clock.now += 1
+    after_expiring = cache.get('token')
+
+    # Verify results
+    assert before_expiring is not None
+    assert after_expiring is None
+    assert cache.stats().entries == 0
+
+def test_auth_cache__evicts_least_recently_used(clock):
+    # Setup environment
+    cache = AuthCache(max_entries=2, clock=clock)
+    cache.put('a', make_user('a@email.com'), clock.now + 60)
+    cache.put('b', make_user('b@email.com'), clock.now + 60)
+    cache.get('a')
+
+    # Perform function action under testing
+    cache.put('c', make_user('c@email.com'), clock.now + 60)
+
+    # Verify results
+    assert cache.get('a') is not None
+    assert cache.get('b') is None
+    assert cache.get('c') is not None
+    assert cache.stats().evictions == 1
+
+def test_auth_cache__revoked_token_is_not_cached_again(clock):
+    # Setup environment
+    cache = AuthCache(clock=clock)
+    cache.put('token', make_user(), clock.now + 60)
+
+    # Perform function action under testing
+    cache.revoke('token', clock.now + 60)
+    cache.put('token', make_user(), clock.now + 60)
+
+    # Verify results
+    assert cache.get('token') is None
+    assert cache.is_revoked('token')
+    clock.now += 61
+    cache.revoke('other', clock.now + 60) # revoking cleans up tokens that expired by now
+    assert not cache.is_revoked('token')
+
+def test_auth_cache__invalidate_user_drops_all_their_tokens(clock):
+    # Setup environment
+    cache = AuthCache(clock=clock)
+    cache.put('token-1', make_user(), clock.now + 60)
+    cache.put('token-2', make_user(), clock.now + 60)
+    cache.put('token-3', make_user('other@email.com'), clock.now + 60)
+
+    # Perform function action under testing
+    cache.invalidate_user('example@email.com')
+
+    # Verify results
+    assert cache.get('token-1') is None
+    assert cache.get('token-2') is None
+    assert cache.get('token-3') is not None
@@ -0,0 +1,72 @@
+import asyncio
+import threading
+import uuid
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.orm import sessionmaker
+
+from ..config import set_bcrypt_rounds, DEFAULT_BCRYPT_ROUNDS
+from ..database.db_api import create_users_engine
+from ..handlers import auth_handler
+from ..handlers.auth_handler import handle_user_login, handle_user_registration
+from ..models.user_model import Base, User, UserCredentials
+
+@pytest.fixture
+def tmp_dir(tmp_path):
+    return tmp_path
+
+@pytest.fixture
+def db():
+    set_bcrypt_rounds(4) # the cheapest bcrypt allows, these tests aren't about hashing
+    engine = create_users_engine('sqlite://')
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+    set_bcrypt_rounds(DEFAULT_BCRYPT_ROUNDS)
+
+def record_threads(monkeypatch, module, names, threads):
+    for name in names:
+        func = getattr(module, name)
+        def recording(*args, _func=func, _name=name):
+            threads[_name] = threading.current_thread()
+            return _func(*args)
+        monkeypatch.setattr(module, name, recording)
+
+def test_handle_user_registration__database_and_files_off_the_event_loop(tmp_dir, db, monkeypatch):
+    # Setup environment
+    threads = {}
+    record_threads(monkeypatch, auth_handler, ['db_get_user_by_username', 'db_add_user', 'create_user_repo'], threads)
+    user = User(id=str(uuid.uuid4()), username='new@email.com', password='abc123', name='New User')
+
+    # Perform function action under testing
+    async def register():
+        return threading.current_thread(), await handle_user_registration(user, db, tmp_dir)
+    loop_thread, tokens = asyncio.run(register())
+
+    # Verify results
+    assert tokens.access_token
+    assert (tmp_dir / 'users' / user.id).is_dir()
+    assert sorted(threads) == ['create_user_repo', 'db_add_user', 'db_get_user_by_username']
+    assert all(thread is not loop_thread for thread in threads.values())
+
+def test_handle_user_login__sync_lookup_off_the_event_loop(tmp_dir, db, monkeypatch):
+    # Setup environment
+    user = User(id=str(uuid.uuid4()), username='existing@email.com', password='abc123', name='Existing User')
+    asyncio.run(handle_user_registration(user, db, tmp_dir))
+    threads = {}
+    record_threads(monkeypatch, auth_handler, ['db_get_user_by_username'], threads)
+
+    # Perform function action under testing
+    async def log_in(password):
+        return threading.current_thread(), await handle_user_login(UserCredentials(username=user.username, password=password), db)
+    loop_thread, tokens = asyncio.run(log_in('abc123'))
+    with pytest.raises(HTTPException) as e_info:
+        asyncio.run(log_in('wrong'))
+
+    # Verify results
+    assert tokens.access_token
+    assert e_info.value.status_code == 401
+    assert threads['db_get_user_by_username'] is not loop_thread
@@ -0,0 +1,44 @@
+import pytest
+
+from ..utilities.byte_search_utils import find_block_lines
+
+@pytest.fixture
+def tmp_dir(tmp_path):
+    return tmp_path
+
+def search_decoded_lines(query, path):
+    # how the Block search has always worked: line by line over the decoded Page
+    found = []
+    last_line_matched = False
+    with open(path, 'r') as f:
+        for line_number, line in enumerate(f.read().splitlines(), start=1):
+            if query.lower() in line.lower():
+                found.append((line_number, line, None))
+                last_line_matched = True
+            elif 'id::' in line and last_line_matched:
+                found[-1] = (found[-1][0], found[-1][1], line.split('id::')[1].strip())
+            else:
+                last_line_matched = False
+    return found
+
+@pytest.mark.parametrize('content', [
+    '',
+    '- find me\n- not me\n    - Find ME too',
+    '- find\n  id:: 1234\n  id:: 5678\n- other\n  id:: lost',
+    '- find\n  id:: find\n- find',
+    '- no newline at the end: find',
+    '- find\r\n  id:: crlf\r\n- FIND',
+    '- ünïcödé find\n- 🙂 FÏND\n  id:: äbc',
+    '- Kelvin sign: \u212a\n- dotted capital I: \u0130\n- find',
+    '- find\u2028- one line for bytes, two for text',
+    '- find\x0c- FIND',
+])
+@pytest.mark.parametrize('query', ['find', 'FIND', 'k', 'i', 'fïnd', 'id', '', '\n'])
+def test_find_block_lines__same_results_as_searching_decoded_lines(tmp_dir, content, query):
+    path = tmp_dir / 'example.md'
+    path.write_bytes(content.encode())
+    assert find_block_lines(query, path) == search_decoded_lines(query, path)
+
+def test_find_block_lines__missing_page_raises(tmp_dir):
+    with pytest.raises(FileNotFoundError):
+        find_block_lines('find', tmp_dir / 'missing.md')
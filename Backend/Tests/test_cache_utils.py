@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+from ..utilities.cache_utils import PageCache
+from .utils import write_md_content
+
+@pytest.fixture
+def tmp_dir(tmp_path):
+    return tmp_path
+
+@pytest.mark.parametrize('content', [
+    '',
+    '- a',
+    '- a\n    - b\n',
+    '- a\r\n- b\n\n- c',
+])
+def test_page_cache__reads_match_file_reads(tmp_dir, content):
+    path = tmp_dir / 'example.md'
+    write_md_content(path, content)
+    cache = PageCache()
+    with open(path, 'r') as f:
+        expected_text = f.read()
+    with open(path, 'r') as f:
+        expected_lines = f.readlines()
+    for _ in range(2): # miss, then hit
+        assert cache.read_text(path) == expected_text
+        assert cache.read_lines(path) == expected_lines
+    assert cache.stats().misses == 1
+    assert cache.stats().hits == 3
+
+def test_page_cache__changed_file_is_read_again(tmp_dir):
+    # Setup environment
+    path = tmp_dir / 'example.md'
+    write_md_content(path, '- before')
+    cache = PageCache()
+    assert cache.read_text(path) == '- before'
+
+    # Perform function action under testing
+    write_md_content(path, '- after!')
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000)) # in case both writes land in the same mtime tick
+
+    # Verify results
+    assert cache.read_text(path) == '- after!'
+    assert cache.stats().misses == 2
+
+def test_page_cache__evicts_least_recently_used_when_over_size(tmp_dir):
+    # Setup environment
+    cache = PageCache(max_bytes=250)
+    paths = [tmp_dir / f'example-{i}.md' for i in range(3)]
+    for path in paths:
+        write_md_content(path, 'x' * 100)
+
+    # Perform function action under testing
+    cache.read_text(paths[0])
+    cache.read_text(paths[1])
+    cache.read_text(paths[0]) # now most recently used
+    cache.read_text(paths[2]) # should push out `paths[1]`
+    cache.read_text(paths[0])
+
+    # Verify results
+    stats = cache.stats()
+    assert stats.evictions == 1
+    assert stats.entries == 2
+    assert stats.size_bytes == 200
+    assert stats.hits == 2
+
+def test_page_cache__missing_file_raises_file_not_found(tmp_dir):
+    with pytest.raises(FileNotFoundError):
+        PageCache().read_text(tmp_dir / 'does not exist.md')
@@ -0,0 +1,35 @@
+import pytest
+
+from ..database.db_api import create_users_engine, SQLITE_BUSY_TIMEOUT_MS
+
+@pytest.fixture
+def tmp_dir(tmp_path):
+    return tmp_path
+
+def read_pragma(engine, name):
+    with engine.connect() as connection:
+        return connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+
+def test_create_users_engine__sets_pragmas(tmp_dir):
+    # Perform function action under testing
+    engine = create_users_engine(f'sqlite:///{tmp_dir / "users.db"}', mmap_size=1024 * 1024)
+
+    # Verify results
+    assert read_pragma(engine, 'journal_mode') == 'wal'
+    assert read_pragma(engine, 'synchronous') == 1 # NORMAL
+    assert read_pragma(engine, 'busy_timeout') == SQLITE_BUSY_TIMEOUT_MS
+    assert read_pragma(engine, 'mmap_size') == 1024 * 1024
+    engine.dispose()
+
+def test_create_users_engine__in_memory_is_shared():
+    # Setup environment
+    engine = create_users_engine('sqlite://')
+    with engine.begin() as connection:
+        connection.exec_driver_sql('CREATE TABLE example (id INTEGER)')
+
+    # Perform function action under testing
+    with engine.connect() as connection:
+        tables = connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'").scalars().all()
+
+    # Verify results
+    assert tables == ['example']
@@ -0,0 +1,78 @@
+import asyncio
+import threading
+
+import pytest
+
+from ..config import (
+    set_scan_executor_workers,
+    DEFAULT_SCAN_EXECUTOR_WORKERS,
+)
+from ..utilities.executor_utils import run_io, run_scan, iterate_in_scan_executor, shutdown_executors
+
+@pytest.fixture
+def single_scan_worker():
+    set_scan_executor_workers(1)
+    yield
+    set_scan_executor_workers(DEFAULT_SCAN_EXECUTOR_WORKERS)
+    shutdown_executors()
+
+def test_run_io_and_run_scan_use_their_own_threads():
+    # Perform function action under testing
+    async def thread_names():
+        return await run_io(lambda: threading.current_thread().name), await run_scan(lambda: threading.current_thread().name)
+    io_thread_name, scan_thread_name = asyncio.run(thread_names())
+
+    # Verify results
+    assert io_thread_name.startswith('io-executor')
+    assert scan_thread_name.startswith('scan-executor')
+
+def test_run_io_does_not_wait_behind_scans(single_scan_worker):
+    # Setup environment
+    scan_may_finish = threading.Event()
+
+    async def busy_scans_then_read():
+        # two scans with a single scan worker - the second one has to wait for the first
+        scans = [asyncio.ensure_future(run_scan(scan_may_finish.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        read = await asyncio.wait_for(run_io(lambda: 'page content'), timeout=5)
+        scans_done_before_read = any(scan.done() for scan in scans)
+        scan_may_finish.set()
+        await asyncio.gather(*scans)
+        return read, scans_done_before_read
+
+    # Perform function action under testing
+    read, scans_done_before_read = asyncio.run(busy_scans_then_read())
+
+    # Verify results
+    assert read == 'page content'
+    assert not scans_done_before_read
+
+def test_iterate_in_scan_executor__closes_iterator_when_stopped_early():
+    # Setup environment
+    produced = []
+    closed = threading.Event()
+    def numbers():
+        try:
+            for number in range(1000):
+                produced.append(number)
+                yield number
+        finally:
+            closed.set()
+
+    async def take_three():
+        taken = []
+        items = iterate_in_scan_executor(numbers())
+        async for number in items:
+            taken.append(number)
+            if len(taken) == 3:
+                break
+        await items.aclose() # what cancelling a streaming response does
+        return taken
+
+    # Perform function action under testing
+    taken = asyncio.run(take_three())
+
+    # Verify results
+    assert taken == [0, 1, 2]
+    assert closed.wait(timeout=5)
+    assert len(produced) == 3
@@ -0,0 +1,130 @@
+import uuid
+
+import pytest
+
+from ..utilities.index_utils import (
+    BlockLocation,
+    ReferenceIndex,
+    get_reference_index,
+    on_page_written,
+    on_page_removed,
+    on_page_renamed,
+)
+from .utils import (
+    generate_and_write_n_md_files,
+    write_md_content,
+)
+
+@pytest.fixture
+def tmp_dir(tmp_path):
+    return tmp_path
+
+##
+## Reference index
+##
+
+@pytest.mark.parametrize('ref_file_count,non_ref_file_count', [
+    (0, 5),
+    (5, 0),
+    (25, 100),
+])
+def test_reference_index__sources_linking_to_x_files_in_y_files(tmp_dir, ref_file_count, non_ref_file_count):
+    # Setup environment
+    generate_and_write_n_md_files(tmp_dir, non_ref_file_count)
+    expected_sources = []
+    for i in range(ref_file_count):
+        path = tmp_dir / f'example-{i}.md'
+        write_md_content(path, '- [[other]]\n- [[actual]]\n    - [[actual]]')
+        expected_sources.append(path)
+
+    # Perform function action under testing
+    actual_sources = ReferenceIndex(tmp_dir).sources_linking_to('actual')
+
+    # Verify results
+    assert actual_sources == sorted(expected_sources)
+
+def test_reference_index__nested_folders_are_indexed(tmp_dir):
+    # Setup environment
+    journal_path = tmp_dir / 'journals' / 'Jan'
+    journal_path.mkdir(parents=True)
+    write_md_content(journal_path / 'Jan 1.md', '- [[actual]]')
+
+    # Perform function action under testing
+    actual_sources = ReferenceIndex(tmp_dir).sources_linking_to('actual')
+
+    # Verify results
+    assert actual_sources == [journal_path / 'Jan 1.md']
+
+def test_reference_index__hooks_keep_index_up_to_date(tmp_dir):
+    # Setup environment
+    linking_page = tmp_dir / 'example.md'
+    write_md_content(linking_page, '- [[actual]]')
+    index = get_reference_index(tmp_dir)
+    assert index.sources_linking_to('actual') == [linking_page]
+
+    # Perform function action under testing (+ verify results after each step)
+    write_md_content(linking_page, '- [[something else]]')
+    on_page_written(linking_page)
+    assert index.sources_linking_to('actual') == []
+    assert index.sources_linking_to('something else') == [linking_page]
+
+    renamed_page = tmp_dir / 'renamed.md'
+    linking_page.rename(renamed_page)
+    on_page_renamed(linking_page, renamed_page)
+    assert index.sources_linking_to('something else') == [renamed_page]
+
+    renamed_page.unlink()
+    on_page_removed(renamed_page)
+    assert index.sources_linking_to('something else') == []
+
+def test_reference_index__hooks_ignore_pages_outside_of_repo(tmp_dir):
+    # Setup environment
+    repo_path = tmp_dir / 'repo'
+    repo_path.mkdir()
+    index = get_reference_index(repo_path)
+    assert index.sources_linking_to('actual') == []
+    outside_page = tmp_dir / 'outside.md'
+    write_md_content(outside_page, '- [[actual]]')
+
+    # Perform function action under testing
+    on_page_written(outside_page)
+
+    # Verify results
+    assert index.sources_linking_to('actual') == []
+
+def test_reference_index__block_ids_and_block_references(tmp_dir):
+    # Setup environment
+    block_id = str(uuid.uuid4())
+    other_block_id = str(uuid.uuid4())
+    generate_and_write_n_md_files(tmp_dir, 25)
+    write_md_content(tmp_dir / 'actual.md', f'- parent\n    - referenced block\n      id:: {block_id}\n')
+    write_md_content(tmp_dir / 'example-0.md', f'- (({block_id}))')
+    write_md_content(tmp_dir / 'example-1.md', f'- (({other_block_id})) and (({block_id}))')
+    write_md_content(tmp_dir / 'example-2.md', f'- (({other_block_id}))')
+
+    # Perform function action under testing
+    index = ReferenceIndex(tmp_dir)
+    location = index.lookup_block(block_id)
+    sources = index.sources_referencing_blocks([block_id])
+    all_sources = index.sources_referencing_blocks([block_id, other_block_id])
+
+    # Verify results
+    assert location == BlockLocation(tmp_dir / 'actual.md', 2, '    - referenced block')
+    assert index.lookup_block(other_block_id) is None
+    assert sources == [tmp_dir / 'example-0.md', tmp_dir / 'example-1.md']
+    assert all_sources == [tmp_dir / f'example-{i}.md' for i in range(3)]
+
+def test_reference_index__removed_block_id_is_no_longer_found(tmp_dir):
+    # Setup environment
+    block_id = str(uuid.uuid4())
+    page_path = tmp_dir / 'actual.md'
+    write_md_content(page_path, f'- referenced block\n  id:: {block_id}\n')
+    index = get_reference_index(tmp_dir)
+    assert index.lookup_block(block_id) is not None
+
+    # Perform function action under testing
+    write_md_content(page_path, '- referenced block\n')
+    on_page_written(page_path)
+
+    # Verify results
+    assert index.lookup_block(block_id) is None
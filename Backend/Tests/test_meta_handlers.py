@@ -2,19 +2,30 @@ import uuid
 
 import pytest
 from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 
 from ..handlers.meta_handler import (
     handle_get_all_references,
+    handle_get_all_references_json,
+    handle_get_references_batch,
+    handle_get_references_batch_json,
     handle_page_search,
     handle_block_search,
+    handle_block_search_json,
     handle_block_id_assignment,
+    iter_references,
+    iter_block_search,
 )
+from ..handlers.page_handler import handle_update_page
+from ..models.page_model import PageWithContentWithoutMetaData
 from ..models.meta_model import (
     BackLink,
     BackLinkReference,
     ReferencesRetrievalRequest,
     BlockSearchResult,
 )
+from ..utilities import json_utils
 from .utils import (
     generate_and_write_md_file,
     generate_and_write_n_md_files,
@@ -155,6 +166,23 @@ def test_handle_get_all_references__expected_child_block_structure_equals_actual
         actual_child = actual_reference.children[i].rstrip('\n')
         assert actual_child == expected_child
 
+def test_handle_get_all_references__page_updates_are_reflected_in_backlinks(tmp_dir):
+    # Setup environment
+    generate_and_write_n_md_files(tmp_dir, 10)
+    write_md_content(tmp_dir / 'example.md', '- nothing yet')
+    request = ReferencesRetrievalRequest(page_name='actual', block_ids=[])
+    assert len(handle_get_all_references(request, tmp_dir).backlinks) == 0
+
+    # Perform function action under testing
+    page_info = PageWithContentWithoutMetaData(name='example', content='- [[actual]]\n    - child')
+    handle_update_page(tmp_dir, page_info)
+    actual_backlinks = handle_get_all_references(request, tmp_dir).backlinks
+
+    # Verify results
+    assert len(actual_backlinks) == 1
+    assert actual_backlinks[0].page_name == 'example'
+    assert actual_backlinks[0].references[0].children == ['    - child']
+
 ##
 ## Block Reference Retrieval Tests
 ##
@@ -191,6 +219,66 @@ def test_handle_get_all_references__x_block_references_files_y_non_reference_fil
         assert block_ref.block_id == str(block_id)
         assert (block_ref.source + '.md') in file_names
 
+def test_iter_references__streams_same_references_with_cap(tmp_dir):
+    # Setup environment
+    block_id = str(uuid.uuid4())
+    for i in range(10):
+        write_md_content(tmp_dir / f'example-{i}.md', f'- [[actual]]\n- (({block_id}))')
+    generate_and_write_n_md_files(tmp_dir, 10)
+    request = ReferencesRetrievalRequest(page_name='actual', block_ids=[block_id])
+    expected = handle_get_all_references(request, tmp_dir)
+
+    # Perform function action under testing
+    streamed = list(iter_references(request, tmp_dir))
+    capped = list(iter_references(request, tmp_dir, limit=3))
+
+    # Verify results
+    assert sorted(record.backlink.page_name for record in streamed if record.backlink is not None) == \
+        sorted(backlink.page_name for backlink in expected.backlinks)
+    assert len([record for record in streamed if record.block_ref is not None]) == len(expected.block_refs)
+    assert capped == streamed[:3]
+
+@pytest.mark.parametrize('with_orjson', [True, False])
+def test_handle_get_all_references_json__same_bytes_as_default_response(tmp_dir, monkeypatch, with_orjson):
+    # Setup environment
+    if not with_orjson:
+        monkeypatch.setattr(json_utils, 'orjson', None)
+    block_id = str(uuid.uuid4())
+    for i in range(5):
+        write_md_content(tmp_dir / f'example-{i}.md', f'- [[actual]] "quoted" \\ caf\u00e9 \u2028 \x7f\n- (({block_id}))')
+    generate_and_write_n_md_files(tmp_dir, 5)
+    request = ReferencesRetrievalRequest(page_name='actual', block_ids=[block_id])
+
+    # Perform function action under testing
+    body = handle_get_all_references_json(request, tmp_dir)
+
+    # Verify results
+    assert body == JSONResponse(jsonable_encoder(handle_get_all_references(request, tmp_dir))).body
+
+def test_handle_get_references_batch__same_as_each_request_alone(tmp_dir):
+    # Setup environment
+    block_id = str(uuid.uuid4())
+    for i in range(10):
+        write_md_content(tmp_dir / f'example-{i}.md', f'- [[first]]\n  - child\n- (({block_id}))\n- [[second]] [[first]]')
+    write_md_content(tmp_dir / 'second.md', f'- [[first]]\n- block id:: {block_id}')
+    generate_and_write_n_md_files(tmp_dir, 10)
+    requests = [
+        ReferencesRetrievalRequest(page_name='first', block_ids=[]),
+        ReferencesRetrievalRequest(page_name='second', block_ids=[block_id]),
+        ReferencesRetrievalRequest(page_name='unlinked', block_ids=[str(uuid.uuid4())]),
+        ReferencesRetrievalRequest(page_name='first', block_ids=[block_id]),
+    ]
+
+    # Perform function action under testing
+    batch = handle_get_references_batch(requests, tmp_dir)
+    batch_json = handle_get_references_batch_json(requests, tmp_dir)
+
+    # Verify results
+    expected = [handle_get_all_references(request, tmp_dir) for request in requests]
+    assert batch == expected
+    assert batch_json == JSONResponse(jsonable_encoder(expected)).body
+    assert handle_get_references_batch([], tmp_dir) == []
+
 ## Block references will most likely have more information in the future, so there'll likely be more tests on it later
 
 ###
@@ -272,6 +360,18 @@ def test_handle_block_search__find_block_with_exact_text(tmp_dir):
     assert actual.line_number == 1
     assert actual.page_name == 'test.md'
 
+def test_handle_block_search__block_ids_stay_with_their_blocks(tmp_dir):
+    # Setup environment
+    content = '- find a\n  id:: id-a\n- skip\n  id:: id-skip\n- find b\n- find c\n    id:: id-c\n'
+    write_md_content(tmp_dir / 'test.md', content)
+
+    # Perform function action under testing
+    actual_results = handle_block_search('find', tmp_dir)
+
+    # Verify results
+    actual = [(result.block_text, result.block_id, result.line_number) for result in actual_results]
+    assert actual == [('- find a', 'id-a', 1), ('- find b', None, 5), ('- find c', 'id-c', 6)]
+
 @pytest.mark.parametrize('block_ref_count', [
     5,
     10,
@@ -306,6 +406,31 @@ def test_handle_block_search__find_x_blocks_with_case_insensitive_search(tmp_dir
         assert lowercase.page_name in page_names
         assert uppercase.page_name in page_names
 
+def test_iter_block_search__streams_with_offset_and_limit(tmp_dir):
+    # Setup environment
+    for i in range(10):
+        write_md_content(tmp_dir / f'example-{i}.md', '- find me\n- not me\n- find me too')
+    expected = handle_block_search('find', tmp_dir)
+
+    # Perform function action under testing
+    streamed = list(iter_block_search('find', tmp_dir))
+    window = list(iter_block_search('find', tmp_dir, limit=5, offset=3))
+
+    # Verify results
+    assert streamed == expected
+    assert window == expected[3:8]
+
+def test_handle_block_search_json__same_bytes_as_default_response(tmp_dir):
+    # Setup environment
+    for i in range(10):
+        write_md_content(tmp_dir / f'example-{i}.md', '- find "me" \\ caf\u00e9\n- not me\n- find me too')
+
+    # Perform function action under testing
+    body = handle_block_search_json('find', tmp_dir, limit=15, offset=2)
+
+    # Verify results
+    assert body == JSONResponse(jsonable_encoder(handle_block_search('find', tmp_dir, limit=15, offset=2))).body
+
 ##
 ## Block ID Assignment
 ##
@@ -452,3 +577,21 @@ def test_handle_block_id_assignment__block_text_mismatch_should_raise_text_misma
     # Verify results
     # (A part of the verification is in that `with pytest.raises(..)` part)
     assert str(e_info.value) == '409: Block in file does not match Block location given (text mismatch)'
+
+def test_handle_block_id_assignment__id_already_in_use_should_raise_id_in_use_error(tmp_dir):
+    # Setup environment
+    block_id_str = str(uuid.uuid4())
+    (tmp_dir / 'pages').mkdir(parents=True, exist_ok=True)
+    write_md_content(tmp_dir / 'pages' / 'other.md', f'- Already has the ID\n  id:: {block_id_str}\n')
+    write_md_content(tmp_dir / 'pages' / 'test.md', '- I need an ID!\n')
+
+    # Perform function action under testing
+    query = BlockSearchResult(
+        block_id=block_id_str, block_text='- I need an ID!',
+        line_number=1, page_name='test.md')
+    with pytest.raises(HTTPException) as e_info:
+        handle_block_id_assignment(query, tmp_dir)
+
+    # Verify results
+    # (A part of the verification is in that `with pytest.raises(..)` part)
+    assert str(e_info.value) == '409: Block ID is already assigned to another Block'
@@ -0,0 +1,98 @@
+import tempfile
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from ..handlers.metrics_handler import handle_get_metrics
+from ..utilities.cache_utils import PageCache
+from ..utilities.metrics_utils import MetricsRegistry, MetricsMiddleware, Sample, metrics
+
+@pytest.fixture
+def tmp_dir():
+    with tempfile.TemporaryDirectory() as tmp_dir_name:
+        yield Path(tmp_dir_name)
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+def make_client(registry):
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware, registry=registry)
+
+    @app.get('/page/get/{page_name}')
+    def get_page(page_name: str):
+        return {'name': page_name}
+
+    return TestClient(app)
+
+def test_metrics_registry__renders_counters_and_histograms(registry):
+    # Setup environment
+    registry.increment('page_files_read_total', 2, reader='page_cache')
+    registry.increment('page_files_read_total', reader='page_cache')
+    for value in (0.002, 0.02, 20):
+        registry.observe('http_request_duration_seconds', value, route='/a', method='GET')
+
+    # Perform function action under testing
+    rendered = registry.render([Sample('page_cache_entries', 5)])
+
+    # Verify results
+    lines = rendered.splitlines()
+    assert '# TYPE page_files_read_total counter' in lines
+    assert 'page_files_read_total{reader="page_cache"} 3' in lines
+    assert '# TYPE http_request_duration_seconds histogram' in lines
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/a",le="0.001"} 0' in lines
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/a",le="0.0025"} 1' in lines
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/a",le="0.025"} 2' in lines
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/a",le="+Inf"} 3' in lines
+    assert 'http_request_duration_seconds_count{method="GET",route="/a"} 3' in lines
+    assert 'page_cache_entries 5' in lines
+
+def test_metrics_middleware__records_requests_by_route_template(registry):
+    # Setup environment
+    client = make_client(registry)
+
+    # Perform function action under testing
+    first = client.get('/page/get/first')
+    second = client.get('/page/get/second')
+    missing = client.get('/does-not-exist')
+
+    # Verify results
+    assert first.headers['server-timing'].startswith('app;dur=')
+    assert missing.status_code == 404
+    route_labels = {'route': '/page/get/{page_name}', 'method': 'GET'}
+    assert registry.get_value('http_requests_total', status='200', **route_labels) == 2
+    assert registry.get_value('http_requests_total', status='404', route='unmatched', method='GET') == 1
+    assert registry.get_value('http_requests_in_flight') == 0
+    rendered = registry.render()
+    response_size = len(first.content) + len(second.content)
+    assert f'http_response_size_bytes_sum{{method="GET",route="/page/get/{{page_name}}"}} {response_size}' in rendered.splitlines()
+
+def test_page_cache__counts_files_read_from_disk(tmp_dir):
+    # Setup environment
+    cache = PageCache()
+    path = tmp_dir / 'page.md'
+    path.write_text('- some content\n')
+    files_before = metrics.get_value('page_files_read_total', reader='page_cache')
+    bytes_before = metrics.get_value('page_bytes_read_total', reader='page_cache')
+
+    # Perform function action under testing
+    cache.read_text(path)
+    cache.read_text(path) # cached, not read again
+
+    # Verify results
+    assert metrics.get_value('page_files_read_total', reader='page_cache') == files_before + 1
+    assert metrics.get_value('page_bytes_read_total', reader='page_cache') == bytes_before + len('- some content\n')
+
+def test_handle_get_metrics__reports_internal_state():
+    # Perform function action under testing
+    rendered = handle_get_metrics()
+
+    # Verify results
+    for name in ('page_cache_hits_total', 'auth_cache_entries', 'password_hashing_rejected_total',
+                 'page_saves_written_total', 'user_repositories_in_memory'):
+        assert f'\n{name} ' in rendered
+    assert 'index_entries{index="reference"} ' in rendered
+    assert 'index_entries{index="block_search"} ' in rendered
@@ -0,0 +1,42 @@
+from random import randint
+
+import pytest
+
+from ..utilities.meta_utils import extract_block_children
+from ..utilities.outline_utils import PageOutline
+from .utils import generate_line_content
+
+@pytest.mark.parametrize('lines,expected_children', [
+    ([], []),
+    (['- a'], [[]]),
+    (['- a\n', '    - b\n', '    - c\n', '- d'], [['    - b\n', '    - c\n'], [], [], []]),
+    (['- a\n', '\n', '    - b\n', '- c'], [['\n', '    - b\n'], ['    - b\n'], [], []]), # blank lines still count their newline as indention
+    (['- a\n', '    - b\n', '        - c\n', '    - d\n'], [['    - b\n', '        - c\n', '    - d\n'], ['        - c\n'], [], []]),
+    (['    - a\n', '- b\n', '    - c'], [[], ['    - c'], []]),
+])
+def test_page_outline__children_of_each_line(lines, expected_children):
+    outline = PageOutline(lines)
+    for line_index in range(len(lines)):
+        assert outline.children(line_index) == expected_children[line_index]
+        assert outline.has_children(line_index) == (len(expected_children[line_index]) > 0)
+
+@pytest.mark.parametrize('line_count', [
+    10,
+    100,
+    1000,
+])
+def test_page_outline__matches_extract_block_children(line_count):
+    # Setup environment
+    lines = []
+    indention_level = 0
+    for _ in range(line_count):
+        indention_level = randint(0, indention_level + 1)
+        lines.append(generate_line_content(indention_level, content_length=5) + '\n')
+
+    # Perform function action under testing
+    outline = PageOutline(lines)
+
+    # Verify results
+    for line_index in range(line_count):
+        expected = extract_block_children(lines[line_index], lines[line_index:])
+        assert outline.children(line_index) == expected
@@ -1,18 +1,36 @@
+import asyncio
 import os
+import threading
+import time
 import uuid
 
 import pytest
-from fastapi import HTTPException
+from fastapi import HTTPException, Response
 
-from ..models.page_model import NamedPage, PageWithContentWithoutMetaData, PageRenameInfo, PageReferenceToRename
+from ..models.page_model import (
+    NamedPage,
+    PageWithContentWithoutMetaData,
+    PageRenameInfo,
+    PageReferenceToRename,
+    PagePatch,
+    PagePatchOperation,
+)
 from ..models.user_model import User
+from ..handlers import page_handler
+from ..utilities import rename_utils
+from ..utilities.page_utils import apply_page_patch
+from ..utilities.etag_utils import etag_matches
+from ..config import set_save_coalesce_window, DEFAULT_SAVE_COALESCE_WINDOW
 
 from ..handlers.page_handler import (
     handle_get_all_pages,
     handle_get_page_by_name,
+    handle_get_pages_by_name,
+    PAGE_BATCH_MAX_NAMES,
     handle_new_page,
     handle_update_page,
     handle_page_rename,
+    handle_patch_page,
 )
 from .utils import (
     generate_and_write_md_file,
@@ -65,6 +83,37 @@ def test_get_page_by_name_with_nonexistant_file(tmp_dir, other_pages_count):
     with pytest.raises(HTTPException) as e_info:
         _ = handle_get_page_by_name(tmp_dir, 'actual')
 
+def test_get_pages_by_name(tmp_dir):
+    # Setup environment
+    for page_name in ['first', 'second', 'third']:
+        write_md_content(tmp_dir / f'{page_name}.md', f'- content of {page_name}')
+    generate_and_write_n_md_files(tmp_dir, 10)
+
+    # Perform function action under testing
+    batch = asyncio.run(handle_get_pages_by_name(tmp_dir, ['third', 'missing', 'first', 'third']))
+
+    # Verify results
+    assert batch.pages == [handle_get_page_by_name(tmp_dir, 'third'), handle_get_page_by_name(tmp_dir, 'first')]
+    assert batch.missing == ['missing']
+
+def test_get_pages_by_name_with_invalid_names(tmp_dir):
+    # Setup environment
+    pages_dir = tmp_dir / 'pages'
+    pages_dir.mkdir()
+    write_md_content(tmp_dir / 'outside.md', '- not a Page of this folder')
+    write_md_content(pages_dir / 'inside.md', '- a')
+    invalid_names = ['../outside', '..\\outside', 'in\0side', 'x' * 1000]
+
+    # Perform function action under testing
+    batch = asyncio.run(handle_get_pages_by_name(pages_dir, ['inside'] + invalid_names))
+    with pytest.raises(HTTPException) as e_info:
+        asyncio.run(handle_get_pages_by_name(pages_dir, ['inside'] * (PAGE_BATCH_MAX_NAMES + 1)))
+
+    # Verify results
+    assert [page.name for page in batch.pages] == ['inside']
+    assert batch.missing == invalid_names
+    assert e_info.value.status_code == 413
+
 @pytest.mark.parametrize('other_pages_count', [
     0,
     5,
@@ -108,11 +157,176 @@ def test_update_page_by_name(tmp_dir, content_before, content_after):
     actual = handle_get_page_by_name(tmp_dir, 'example')
     assert actual.content == content_after
 
+def test_get_page_by_name_not_modified(tmp_dir):
+    # Setup environment
+    write_md_content(tmp_dir / 'example.md', '- a')
+    response = Response()
+    handle_get_page_by_name(tmp_dir, 'example', response)
+    etag = response.headers['ETag']
+
+    # Perform function action under testing
+    with pytest.raises(HTTPException) as e_info:
+        handle_get_page_by_name(tmp_dir, 'example', Response(), if_none_match=f'W/"other", {etag}')
+    handle_update_page(tmp_dir, PageWithContentWithoutMetaData(name='example', content='- b'))
+    changed_response = Response()
+    changed = handle_get_page_by_name(tmp_dir, 'example', changed_response, if_none_match=etag)
+
+    # Verify results
+    assert e_info.value.status_code == 304
+    assert e_info.value.headers['ETag'] == etag
+    assert changed.content == '- b'
+    assert changed_response.headers['ETag'] == f'"{changed.version}"'
+    assert changed_response.headers['ETag'] != etag
+
+def test_get_all_pages_not_modified(tmp_dir):
+    # Setup environment
+    generate_and_write_n_md_files(tmp_dir, 5)
+    response = Response()
+    handle_get_all_pages(tmp_dir, limit=3, response=response)
+    etag = response.headers['ETag']
+
+    # Perform function action under testing
+    with pytest.raises(HTTPException) as e_info:
+        handle_get_all_pages(tmp_dir, limit=3, if_none_match=etag)
+    other_listing_response = Response()
+    handle_get_all_pages(tmp_dir, limit=3, cursor=response.headers['X-Next-Cursor'], response=other_listing_response, if_none_match=etag)
+    handle_new_page(tmp_dir, NamedPage(name='0-first'))
+    changed_response = Response()
+    handle_get_all_pages(tmp_dir, limit=3, response=changed_response, if_none_match=etag)
+
+    # Verify results
+    assert e_info.value.status_code == 304
+    assert e_info.value.headers['X-Next-Cursor'] == response.headers['X-Next-Cursor']
+    assert other_listing_response.headers['ETag'] != etag
+    assert changed_response.headers['ETag'] != etag
+
+def test_update_page_by_name_with_if_match(tmp_dir):
+    # Setup environment
+    write_md_content(tmp_dir / 'example.md', '- a')
+    response = Response()
+    handle_get_page_by_name(tmp_dir, 'example', response)
+    etag = response.headers['ETag']
+
+    # Perform function action under testing
+    update_response = Response()
+    handle_update_page(tmp_dir, PageWithContentWithoutMetaData(name='example', content='- b'), update_response, if_match=etag)
+    with pytest.raises(HTTPException) as e_info: # still the ETag of `- a`
+        handle_update_page(tmp_dir, PageWithContentWithoutMetaData(name='example', content='- c'), Response(), if_match=etag)
+    with pytest.raises(HTTPException) as weak_e_info:
+        handle_update_page(tmp_dir, PageWithContentWithoutMetaData(name='example', content='- c'), Response(), if_match=f'W/{update_response.headers["ETag"]}')
+
+    # Verify results
+    assert e_info.value.status_code == 412
+    assert weak_e_info.value.status_code == 412
+    actual = handle_get_page_by_name(tmp_dir, 'example')
+    assert actual.content == '- b'
+    assert update_response.headers['ETag'] == f'"{actual.version}"'
+
+def test_update_page_by_name_etag_matches_content_read_back(tmp_dir):
+    # Setup environment
+    write_md_content(tmp_dir / 'example.md', '- a')
+
+    # Perform function action under testing
+    update_response = Response()
+    handle_update_page(tmp_dir, PageWithContentWithoutMetaData(name='example', content='- a\r\n- b\r- c'), update_response)
+    get_response = Response()
+    handle_get_page_by_name(tmp_dir, 'example', get_response)
+
+    # Verify results
+    assert update_response.headers['ETag'] == get_response.headers['ETag']
+
+def test_update_page_concurrently_with_same_if_match(tmp_dir, monkeypatch):
+    # Setup environment
+    write_md_content(tmp_dir / 'example.md', '- a')
+    response = Response()
+    handle_get_page_by_name(tmp_dir, 'example', response)
+    etag = response.headers['ETag']
+    def slow_etag_matches(*args, **kwargs): # so both updates are checked before either is saved
+        time.sleep(0.2)
+        return etag_matches(*args, **kwargs)
+    monkeypatch.setattr(page_handler, 'etag_matches', slow_etag_matches)
+    status_codes = []
+    def update_page(content):
+        try:
+            handle_update_page(tmp_dir, PageWithContentWithoutMetaData(name='example', content=content), Response(), if_match=etag)
+            status_codes.append(200)
+        except HTTPException as e:
+            status_codes.append(e.status_code)
+
+    # Perform function action under testing
+    threads = [threading.Thread(target=update_page, args=(f'- from tab {i}',)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Verify results
+    assert sorted(status_codes) == [200, 412]
+    assert handle_get_page_by_name(tmp_dir, 'example').content in ['- from tab 0', '- from tab 1']
+
 def test_update_page_by_name_with_nonexistent_page(tmp_dir):
     page_info = PageWithContentWithoutMetaData(name='actual', content='- nothing here')
     with pytest.raises(HTTPException) as e_info:
         handle_update_page(tmp_dir, page_info)
 
+def test_patch_page(tmp_dir):
+    # Setup environment
+    write_md_content(tmp_dir / 'example.md', '- a\n    - b\n- c\n')
+    base_version = handle_get_page_by_name(tmp_dir, 'example').version
+
+    # Perform function action under testing
+    operations = [PagePatchOperation(op='replace', start=2, lines=['    - b (edited)', '    - new child'])]
+    result = handle_patch_page(tmp_dir, PagePatch(name='example', base_version=base_version, operations=operations))
+
+    # Verify results
+    actual = handle_get_page_by_name(tmp_dir, 'example')
+    assert actual.content == '- a\n    - b (edited)\n    - new child\n- c\n'
+    assert actual.version == result.version
+    assert result.version != base_version
+
+def test_patch_page_with_outdated_base_version(tmp_dir):
+    # Setup environment
+    write_md_content(tmp_dir / 'example.md', '- a')
+    base_version = handle_get_page_by_name(tmp_dir, 'example').version
+    handle_update_page(tmp_dir, PageWithContentWithoutMetaData(name='example', content='- changed elsewhere'))
+
+    # Perform function action under testing
+    operations = [PagePatchOperation(op='delete', start=1)]
+    with pytest.raises(HTTPException) as e_info:
+        handle_patch_page(tmp_dir, PagePatch(name='example', base_version=base_version, operations=operations))
+
+    # Verify results
+    assert e_info.value.status_code == 409
+    assert handle_get_page_by_name(tmp_dir, 'example').content == '- changed elsewhere'
+
+def test_patch_page_concurrently_with_same_base_version(tmp_dir, monkeypatch):
+    # Setup environment
+    write_md_content(tmp_dir / 'example.md', '- a')
+    base_version = handle_get_page_by_name(tmp_dir, 'example').version
+    def slow_apply_page_patch(content, operations): # so both patches are checked before either is saved
+        time.sleep(0.2)
+        return apply_page_patch(content, operations)
+    monkeypatch.setattr(page_handler, 'apply_page_patch', slow_apply_page_patch)
+    status_codes = []
+    def patch_page(line):
+        operations = [PagePatchOperation(op='insert', start=2, lines=[line])]
+        try:
+            handle_patch_page(tmp_dir, PagePatch(name='example', base_version=base_version, operations=operations))
+            status_codes.append(200)
+        except HTTPException as e:
+            status_codes.append(e.status_code)
+
+    # Perform function action under testing
+    threads = [threading.Thread(target=patch_page, args=(f'- from tab {i}',)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Verify results
+    assert sorted(status_codes) == [200, 409]
+    assert handle_get_page_by_name(tmp_dir, 'example').content in ['- a\n- from tab 0', '- a\n- from tab 1']
+
 @pytest.mark.parametrize('file_count,ref_count', [
     (0, 0),
     (20, 5),
@@ -172,3 +386,87 @@ def test_rename_page_reference_in_fs(tmp_dir, file_count, ref_count):
     # Verify other pages were not modified
     for full_path in original_file_timestamps_map:
         assert os.path.getmtime(full_path) == original_file_timestamps_map[full_path]
+
+def test_update_page_is_visible_before_being_written(tmp_dir):
+    # Setup environment
+    write_md_content(tmp_dir / 'example.md', '- before')
+    set_save_coalesce_window(60)
+
+    # Perform function action under testing
+    try:
+        handle_update_page(tmp_dir, PageWithContentWithoutMetaData(name='example', content='- after'))
+        page = handle_get_page_by_name(tmp_dir, 'example')
+    finally:
+        set_save_coalesce_window(DEFAULT_SAVE_COALESCE_WINDOW)
+
+    # Verify results
+    assert page.content == '- after'
+    assert (tmp_dir / 'example.md').read_text() == '- after'
+
+def test_rename_page_finds_references_without_client_list(tmp_dir):
+    # Setup environment
+    generate_and_write_md_file(tmp_dir / 'actual.md')
+    write_md_content(tmp_dir / 'linking.md', '- see [[actual]]\n    - and [[other]]')
+    write_md_content(tmp_dir / 'not-linking.md', '- see [[actual page]]')
+
+    # Perform function action under testing
+    actual = handle_page_rename(tmp_dir, PageRenameInfo(old_name='actual', new_name='renamed'))
+
+    # Verify results
+    assert 'Updated 1 reference(s)' in actual['msg']
+    assert (tmp_dir / 'linking.md').read_text() == '- see [[renamed]]\n    - and [[other]]'
+    assert (tmp_dir / 'not-linking.md').read_text() == '- see [[actual page]]'
+    assert (tmp_dir / 'renamed.md').exists()
+
+@pytest.mark.parametrize('content', ['- plain', '- links to [[example]] itself'])
+def test_rename_page_keeps_creation_time(tmp_dir, content):
+    # Setup environment
+    write_md_content(tmp_dir / 'example.md', content)
+    os.utime(tmp_dir / 'example.md', (100, 100))
+    creation = handle_get_all_pages(tmp_dir)[0].creation
+
+    # Perform function action under testing
+    handle_page_rename(tmp_dir, PageRenameInfo(old_name='example', new_name='renamed'))
+
+    # Verify results
+    pages = handle_get_all_pages(tmp_dir)
+    assert [page.name for page in pages] == ['renamed']
+    assert pages[0].creation == creation
+    assert (tmp_dir / 'renamed.md').read_text() == content.replace('[[example]]', '[[renamed]]')
+
+def test_rename_page_to_existing_name(tmp_dir):
+    # Setup environment
+    generate_and_write_md_file(tmp_dir / 'actual.md')
+    generate_and_write_md_file(tmp_dir / 'taken.md')
+    write_md_content(tmp_dir / 'linking.md', '- [[actual]]')
+
+    # Perform function action under testing
+    with pytest.raises(HTTPException) as e:
+        handle_page_rename(tmp_dir, PageRenameInfo(old_name='actual', new_name='taken'))
+
+    # Verify results
+    assert e.value.status_code == 409
+    assert (tmp_dir / 'linking.md').read_text() == '- [[actual]]'
+
+def test_rename_page_rolls_back_on_failure(tmp_dir, monkeypatch):
+    # Setup environment
+    generate_and_write_md_file(tmp_dir / 'actual.md')
+    for i in range(20):
+        write_md_content(tmp_dir / f'linking-{i}.md', f'- {i} [[actual]]')
+    os.chmod(tmp_dir / 'linking-0.md', 0o640)
+    files_before = sorted(os.listdir(tmp_dir))
+    def failing_rename(src, dst):
+        raise OSError('disk on fire')
+    monkeypatch.setattr(rename_utils.os, 'rename', failing_rename)
+
+    # Perform function action under testing
+    with pytest.raises(HTTPException) as e:
+        handle_page_rename(tmp_dir, PageRenameInfo(old_name='actual', new_name='renamed'))
+
+    # Verify results
+    assert e.value.status_code == 500
+    assert sorted(os.listdir(tmp_dir)) == files_before # no staged files left behind either
+    for i in range(20):
+        assert (tmp_dir / f'linking-{i}.md').read_text() == f'- {i} [[actual]]'
+    assert handle_get_page_by_name(tmp_dir, 'linking-0').content == '- 0 [[actual]]'
+    assert os.stat(tmp_dir / 'linking-0.md').st_mode & 0o777 == 0o640 # restored atomically, with its permissions
@@ -0,0 +1,108 @@
+import os
+
+import pytest
+
+from ..utilities.page_metadata_utils import PageMetadataIndex
+from ..utilities.write_queue_utils import write_page_atomically
+from .utils import write_md_content
+
+@pytest.fixture
+def tmp_dir(tmp_path):
+    return tmp_path
+
+def write_page(path, content, modified):
+    write_md_content(path, content)
+    os.utime(path, (modified, modified))
+
+def names(listing):
+    return [page.name for page in listing.pages]
+
+def test_page_metadata_index__sorts_by_each_key(tmp_dir):
+    # Setup environment
+    write_page(tmp_dir / 'b.md', '- longest of them', 300)
+    write_page(tmp_dir / 'a.md', '- a', 200)
+    write_page(tmp_dir / 'c.md', '- medium', 100)
+    index = PageMetadataIndex(tmp_dir)
+
+    # Perform function action under testing, Verify results
+    assert names(index.list_pages()) == ['a', 'b', 'c']
+    assert names(index.list_pages('last_modified')) == ['c', 'a', 'b']
+    assert names(index.list_pages('last_modified', descending=True)) == ['b', 'a', 'c']
+    assert names(index.list_pages('size')) == ['a', 'c', 'b']
+    assert index.list_pages().pages[0].size == 3
+    with pytest.raises(ValueError):
+        index.list_pages('color')
+
+@pytest.mark.parametrize('descending', [False, True])
+def test_page_metadata_index__cursor_walks_through_all_pages(tmp_dir, descending):
+    # Setup environment
+    for i in range(25):
+        write_page(tmp_dir / f'page-{i:02}.md', '- a', 1000 + i % 5) # plenty of ties
+    index = PageMetadataIndex(tmp_dir)
+    expected = names(index.list_pages('last_modified', descending))
+
+    # Perform function action under testing
+    found = []
+    cursor = None
+    while True:
+        listing = index.list_pages('last_modified', descending, limit=7, cursor=cursor)
+        found.extend(names(listing))
+        cursor = listing.next_cursor
+        if cursor is None:
+            break
+
+    # Verify results
+    assert found == expected
+    assert len(found) == 25
+
+def test_page_metadata_index__since_and_cursor_errors(tmp_dir):
+    # Setup environment
+    write_page(tmp_dir / 'old.md', '- a', 100)
+    write_page(tmp_dir / 'new.md', '- a', 200)
+    index = PageMetadataIndex(tmp_dir)
+
+    # Perform function action under testing, Verify results
+    assert names(index.list_pages(since=150)) == ['new']
+    name_cursor = index.list_pages(limit=1).next_cursor
+    with pytest.raises(ValueError):
+        index.list_pages('size', cursor=name_cursor)
+    with pytest.raises(ValueError):
+        index.list_pages(cursor='not a cursor')
+
+def test_page_metadata_index__follows_changes(tmp_dir):
+    # Setup environment
+    write_page(tmp_dir / 'a.md', '- a', 100)
+    index = PageMetadataIndex(tmp_dir)
+    assert names(index.list_pages()) == ['a']
+
+    # Perform function action under testing
+    write_page(tmp_dir / 'a.md', '- a, but longer', 500)
+    index.update_page(tmp_dir / 'a.md') # what the `on_page_written` hook does
+    write_md_content(tmp_dir / 'b.md', '- b') # outside of the API
+
+    # Verify results
+    pages = index.list_pages().pages
+    assert [page.name for page in pages] == ['a', 'b']
+    assert pages[0].last_modified == 500
+    assert pages[0].size == len('- a, but longer')
+
+def test_page_metadata_index__creation_survives_saves_renames_and_restarts(tmp_dir):
+    # Setup environment
+    write_page(tmp_dir / 'a.md', '- a', 100)
+    write_page(tmp_dir / 'b.md', '- b', 200)
+    index = PageMetadataIndex(tmp_dir)
+    creation = {page.name: page.creation for page in index.list_pages().pages}
+
+    # Perform function action under testing
+    write_page_atomically(tmp_dir / 'a.md', '- a, saved again') # a new file, created just now
+    os.utime(tmp_dir / 'a.md', (300, 300))
+    index.update_page(tmp_dir / 'a.md')
+    os.rename(tmp_dir / 'b.md', tmp_dir / 'c.md')
+    index.rename_page(tmp_dir / 'b.md', tmp_dir / 'c.md')
+    restarted_index = PageMetadataIndex(tmp_dir)
+    pages = restarted_index.list_pages('creation').pages
+
+    # Verify results
+    assert [page.name for page in pages] == ['a', 'c']
+    assert [page.creation for page in pages] == [creation['a'], creation['b']]
+    assert pages[0].last_modified == 300
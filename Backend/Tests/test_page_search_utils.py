@@ -0,0 +1,84 @@
+import pytest
+
+from ..utilities.index_utils import on_page_written, on_page_renamed
+from ..utilities.page_search_utils import COMPACT_MIN_REMOVED, PageNameIndex, get_page_name_index
+from .utils import write_md_content
+
+@pytest.fixture
+def tmp_dir(tmp_path):
+    return tmp_path
+
+@pytest.fixture
+def pages_dir(tmp_path):
+    pages_path = tmp_path / 'pages'
+    pages_path.mkdir()
+    for name in ['Planning', 'Plan B', 'Airplane', 'The plan', 'Cleaning Tasks', 'Tasty foods']:
+        write_md_content(pages_path / f'{name}.md', '- something')
+    return pages_path
+
+@pytest.mark.parametrize('query,expected_results', [
+    ('plan', ['/pages/Plan B.md', '/pages/Planning.md', '/pages/The plan.md', '/pages/Airplane.md']),
+    ('PLAN', ['/pages/Plan B.md', '/pages/Planning.md', '/pages/The plan.md', '/pages/Airplane.md']),
+    ('tas', ['/pages/Tasty foods.md', '/pages/Cleaning Tasks.md']),
+    ('p', ['/pages/Plan B.md', '/pages/Planning.md', '/pages/The plan.md', '/pages/Airplane.md']),
+    ('does not exist', []),
+])
+def test_page_name_index__ranked_results(tmp_dir, pages_dir, query, expected_results):
+    actual_results = PageNameIndex(tmp_dir).search(query)
+    assert actual_results == expected_results
+
+@pytest.mark.parametrize('limit', [
+    0,
+    1,
+    3,
+    10,
+])
+def test_page_name_index__limit_keeps_best_results(tmp_dir, pages_dir, limit):
+    index = PageNameIndex(tmp_dir)
+    assert index.search('plan', limit=limit) == index.search('plan')[:limit]
+
+def test_page_name_index__fuzzy_matches_come_after_exact_matches(tmp_dir, pages_dir):
+    # Perform function action under testing
+    index = PageNameIndex(tmp_dir)
+    exact_results = index.search('planing')
+    fuzzy_results = index.search('planing', fuzzy=True)
+
+    # Verify results
+    assert exact_results == []
+    assert fuzzy_results[0] == '/pages/Planning.md'
+
+def test_page_name_index__page_creation_and_rename_are_reflected(tmp_dir, pages_dir):
+    # Setup environment
+    index = get_page_name_index(tmp_dir)
+    assert index.search('groceries') == []
+
+    # Perform function action under testing (+ verify results after each step)
+    new_page = pages_dir / 'Groceries.md'
+    write_md_content(new_page, '')
+    on_page_written(new_page)
+    assert index.search('groceries') == ['/pages/Groceries.md']
+
+    renamed_page = pages_dir / 'Shopping list.md'
+    new_page.rename(renamed_page)
+    on_page_renamed(new_page, renamed_page)
+    assert index.search('groceries') == []
+    assert index.search('shopping') == ['/pages/Shopping list.md']
+    assert len(index) == 7
+
+def test_page_name_index__renames_dont_grow_the_index(tmp_dir, pages_dir):
+    # Setup environment
+    index = PageNameIndex(tmp_dir)
+    expected_results = {query: index.search(query, fuzzy=True) for query in ['plan', 'tas', 'plna']}
+    page = pages_dir / 'Draft 0.md'
+    write_md_content(page, '')
+    index.update_page(page)
+
+    # Perform function action under testing
+    for i in range(1, 500):
+        index.rename_page(page, pages_dir / f'Draft {i}.md')
+        page = pages_dir / f'Draft {i}.md'
+
+    # Verify results
+    assert len(index._paths) < 2 * COMPACT_MIN_REMOVED + len(index)
+    assert index.search('draft') == ['/pages/Draft 499.md']
+    assert {query: index.search(query, fuzzy=True) for query in expected_results} == expected_results
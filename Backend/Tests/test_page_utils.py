@@ -1,7 +1,8 @@
 
 import pytest
 
-from ..utilities.page_utils import rename_page_references_in_str
+from ..models.page_model import PagePatchOperation
+from ..utilities.page_utils import rename_page_references_in_str, apply_page_patch
 
 @pytest.fixture
 def tmp_dir(tmp_path):
@@ -25,3 +26,33 @@ def test_rename_page_reference_in_str(tmp_dir, old_name, new_name, original_cont
     actual = rename_page_references_in_str(old_name, new_name, original_content)
     assert actual == replaced_content
 
+
+@pytest.mark.parametrize('original_content,operations,patched_content', [
+    ('- a\n- b\n- c', [], '- a\n- b\n- c'),
+    ('- a\n- b\n- c', [PagePatchOperation(op='replace', start=2, lines=['- B'])], '- a\n- B\n- c'),
+    ('- a\n- b\n- c', [PagePatchOperation(op='replace', start=1, end=2, lines=['- x'])], '- x\n- c'),
+    ('- a\n- c', [PagePatchOperation(op='insert', start=2, lines=['- b', '    - b1'])], '- a\n- b\n    - b1\n- c'),
+    ('- a', [PagePatchOperation(op='insert', start=2, lines=['- b'])], '- a\n- b'),
+    ('- a\n- b\n- c', [PagePatchOperation(op='delete', start=2)], '- a\n- c'),
+    ('- a\n- b\n    - b1\n- c', [PagePatchOperation(op='move', start=2, end=3, to=1)], '- b\n    - b1\n- a\n- c'),
+    ('- a\n- b\n    - b1\n- c', [PagePatchOperation(op='move', start=2, end=3, to=5)], '- a\n- c\n- b\n    - b1'),
+    ('- a\n- b', [
+        PagePatchOperation(op='insert', start=1, lines=['- first']),
+        PagePatchOperation(op='replace', start=3, lines=['- second to last']), # line numbers after the insert
+    ], '- first\n- a\n- second to last'),
+    ('- a\n', [PagePatchOperation(op='replace', start=1, lines=['- b'])], '- b\n'),
+])
+def test_apply_page_patch(original_content, operations, patched_content):
+    assert apply_page_patch(original_content, operations) == patched_content
+
+@pytest.mark.parametrize('operation', [
+    PagePatchOperation(op='replace', start=0, lines=['- x']),
+    PagePatchOperation(op='replace', start=3, end=5, lines=['- x']),
+    PagePatchOperation(op='insert', start=5, lines=['- x']),
+    PagePatchOperation(op='delete', start=2, end=1),
+    PagePatchOperation(op='move', start=1, end=2),
+    PagePatchOperation(op='move', start=1, end=2, to=2),
+])
+def test_apply_page_patch__invalid_operation_raises_value_error(operation):
+    with pytest.raises(ValueError):
+        apply_page_patch('- a\n- b\n- c', [operation])
@@ -0,0 +1,64 @@
+import uuid
+
+import pytest
+
+from ..config import set_reference_scan_workers, DEFAULT_REFERENCE_SCAN_WORKERS
+from ..utilities.meta_utils import ReferenceLocator, BacklinkExtractor, BlockReferenceExtractor
+from ..utilities.index_utils import ReferenceIndex
+from ..utilities.parallel_utils import split_into_shards
+from .utils import (
+    generate_and_write_n_md_files,
+    write_md_content,
+)
+
+@pytest.fixture
+def tmp_dir(tmp_path):
+    return tmp_path
+
+@pytest.fixture
+def two_workers():
+    set_reference_scan_workers(2)
+    yield
+    set_reference_scan_workers(DEFAULT_REFERENCE_SCAN_WORKERS)
+
+@pytest.mark.parametrize('item_count,shard_count', [
+    (0, 4),
+    (1, 4),
+    (10, 1),
+    (10, 3),
+    (100, 7),
+])
+def test_split_into_shards__keeps_order_and_sizes_even(item_count, shard_count):
+    items = list(range(item_count))
+    shards = split_into_shards(items, shard_count)
+    assert [item for shard in shards for item in shard] == items
+    assert max(len(shard) for shard in shards) - min(len(shard) for shard in shards) <= 1
+
+def test_parallel_scan__results_are_identical_to_serial_scan(tmp_dir, two_workers):
+    # Setup environment
+    block_id = str(uuid.uuid4())
+    generate_and_write_n_md_files(tmp_dir, 100)
+    for i in range(60):
+        write_md_content(tmp_dir / f'example-{i}.md', f'- [[actual]]\n    - child {i}\n- (({block_id}))\n- [[actual]]')
+    write_md_content(tmp_dir / 'actual.md', f'- referenced\n  id:: {block_id}\n')
+
+    def locate():
+        locator = ReferenceLocator(tmp_dir, tmp_dir / 'actual.md', [block_id])
+        locator.add_extractor(BacklinkExtractor('actual.md'))
+        locator.add_extractor(BlockReferenceExtractor([block_id]))
+        return locator.retrieve_all_relationships()
+
+    # Perform function action under testing
+    parallel_result = locate()
+    parallel_index = ReferenceIndex(tmp_dir)
+    parallel_sources = parallel_index.sources_linking_to('actual')
+    parallel_location = parallel_index.lookup_block(block_id)
+    set_reference_scan_workers(1)
+    serial_result = locate()
+    serial_index = ReferenceIndex(tmp_dir)
+
+    # Verify results
+    assert len(parallel_result.backlinks) == 60
+    assert parallel_result.model_dump() == serial_result.model_dump()
+    assert parallel_sources == serial_index.sources_linking_to('actual')
+    assert parallel_location == serial_index.lookup_block(block_id)
@@ -0,0 +1,58 @@
+import asyncio
+import threading
+
+import pytest
+
+from ..config import (
+    set_bcrypt_rounds,
+    set_password_hash_queue_limit,
+    DEFAULT_BCRYPT_ROUNDS,
+    DEFAULT_PASSWORD_HASH_QUEUE_LIMIT,
+)
+from ..utilities.password_pool_utils import PasswordHashingPool, PasswordHashingBusyError
+
+@pytest.fixture
+def pool():
+    set_bcrypt_rounds(4) # as cheap as bcrypt gets
+    pool = PasswordHashingPool()
+    yield pool
+    pool.shutdown()
+    set_bcrypt_rounds(DEFAULT_BCRYPT_ROUNDS)
+    set_password_hash_queue_limit(DEFAULT_PASSWORD_HASH_QUEUE_LIMIT)
+
+def test_password_pool__hash_and_verify(pool):
+    async def hash_and_verify():
+        hashed = await pool.hash('abc123')
+        return hashed, await pool.verify(hashed, 'abc123'), await pool.verify(hashed, 'wrong')
+
+    # Perform function action under testing
+    hashed, correct_matches, wrong_matches = asyncio.run(hash_and_verify())
+
+    # Verify results
+    assert hashed.startswith('$2b$04$')
+    assert correct_matches
+    assert not wrong_matches
+    assert pool.stats().completed == 3
+    assert pool.stats().in_flight == 0
+
+def test_password_pool__rejects_when_queue_is_full(pool):
+    # Setup environment
+    set_password_hash_queue_limit(1) # one running (single worker) and one waiting
+    release = threading.Event()
+
+    async def fill_and_overflow():
+        running = asyncio.ensure_future(pool.run(release.wait))
+        waiting = asyncio.ensure_future(pool.run(release.wait))
+        await asyncio.sleep(0) # let both get submitted
+        with pytest.raises(PasswordHashingBusyError):
+            await pool.run(release.wait)
+        release.set()
+        return await asyncio.gather(running, waiting)
+
+    # Perform function action under testing
+    results = asyncio.run(fill_and_overflow())
+
+    # Verify results
+    assert results == [True, True]
+    assert pool.stats().rejected == 1
+    assert pool.stats().completed == 2
@@ -0,0 +1,160 @@
+import uuid
+
+import pytest
+
+from ..config import set_block_search_db_path
+from ..handlers.meta_handler import handle_block_search
+from ..utilities.index_utils import on_page_written
+from ..utilities.meta_utils import search_blocks
+from ..utilities.search_index_utils import (
+    BlockSearchIndex,
+    get_block_search_index,
+    is_fts5_available,
+    parse_blocks,
+)
+from .utils import (
+    generate_and_write_n_md_files,
+    write_md_content,
+)
+
+pytestmark = pytest.mark.skipif(not is_fts5_available(), reason='SQLite was built without FTS5 (trigram) support')
+
+@pytest.fixture
+def tmp_dir(tmp_path):
+    return tmp_path
+
+@pytest.fixture
+def search_db_path(tmp_path):
+    db_path = tmp_path / 'elegant-notes-search.db'
+    set_block_search_db_path(db_path)
+    yield db_path
+    set_block_search_db_path(None)
+
+@pytest.mark.parametrize('content,expected_blocks', [
+    ('', []),
+    ('- a\n- b', [(1, '- a', None), (2, '- b', None)]),
+    ('- a\n  id:: 123\n    - b\n', [(1, '- a', '  id:: 123'), (2, '  id:: 123', None), (3, '    - b', None)]),
+    ('- a\n\n  id:: 123\n', [(1, '- a', None), (2, '', '  id:: 123'), (3, '  id:: 123', None)]),
+])
+def test_parse_blocks(content, expected_blocks):
+    assert parse_blocks(content) == expected_blocks
+
+@pytest.mark.parametrize('query', ['a', 'A', 'é', 'É', 'block', 'BLOCK ÉTÉ', 'id::', '123', ' ', 'ß'])
+def test_block_search_index__finds_same_blocks_as_scan(tmp_dir, search_db_path, query):
+    # Setup environment
+    write_md_content(tmp_dir / 'first.md', '- a block\n  id:: 123\n\n- Block été\n    - child été\n  id:: 456\n- ÉTÉ\n- STRASSE straße')
+    write_md_content(tmp_dir / 'second.md', '- another block\n  id:: 789\n  id:: 123\n   \n- nothing')
+    expected = sorted(result.model_dump_json() for page in ['first', 'second'] for result in search_blocks(query, tmp_dir / f'{page}.md'))
+
+    # Perform function action under testing
+    actual = sorted(result.model_dump_json() for result in BlockSearchIndex(tmp_dir, search_db_path).search(query))
+
+    # Verify results
+    assert actual == expected
+
+def test_block_search_index__repositories_are_searched_separately(tmp_dir, search_db_path):
+    # Setup environment
+    for user in ['first', 'second']:
+        (tmp_dir / user).mkdir()
+        write_md_content(tmp_dir / user / 'page.md', f'- shared text of {user}')
+
+    # Perform function action under testing
+    results = {user: BlockSearchIndex(tmp_dir / user, search_db_path).search('shared text') for user in ['first', 'second']}
+
+    # Verify results
+    assert [result.block_text for result in results['first']] == ['- shared text of first']
+    assert [result.block_text for result in results['second']] == ['- shared text of second']
+
+@pytest.mark.parametrize('block_ref_count', [
+    5,
+    25,
+])
+def test_block_search_index__find_x_blocks_with_case_insensitive_search(tmp_dir, search_db_path, block_ref_count):
+    # Setup environment
+    repo_path = tmp_dir / 'repo'
+    repo_path.mkdir()
+    block_ids = set()
+    for i in range(block_ref_count):
+        block_id = str(uuid.uuid4())
+        block_ids.add(block_id)
+        write_md_content(repo_path / f'example-{i}.md', f'- Check out: this block\n  id:: {block_id}\n')
+    generate_and_write_n_md_files(repo_path, block_ref_count * 2)
+
+    # Perform function action under testing
+    index = BlockSearchIndex(repo_path, search_db_path)
+    actual_results_lowercase = index.search('check out')
+    actual_results_uppercase = index.search('CHECK OUT')
+    actual_results_short = index.search('k o')
+
+    # Verify results
+    for results in [actual_results_lowercase, actual_results_uppercase]:
+        assert len(results) == block_ref_count
+        assert set(result.block_id for result in results) == block_ids
+        for result in results:
+            assert result.block_text == '- Check out: this block'
+            assert result.line_number == 1
+    assert len(actual_results_short) >= block_ref_count
+
+def test_block_search_index__pagination(tmp_dir, search_db_path):
+    # Setup environment
+    write_md_content(tmp_dir / 'example.md', '\n'.join(f'- match {i}' for i in range(20)))
+
+    # Perform function action under testing
+    index = BlockSearchIndex(tmp_dir, search_db_path)
+    all_results = index.search('match')
+    pages = [index.search('match', limit=5, offset=offset) for offset in range(0, 20, 5)]
+
+    # Verify results
+    assert len(all_results) == 20
+    assert [result for page in pages for result in page] == all_results
+
+def test_block_search_index__stays_in_sync_with_page_writes(tmp_dir, search_db_path):
+    # Setup environment
+    page_path = tmp_dir / 'example.md'
+    write_md_content(page_path, '- old text')
+    index = get_block_search_index(tmp_dir)
+    assert len(index.search('old text')) == 1
+
+    # Perform function action under testing
+    write_md_content(page_path, '- new text')
+    on_page_written(page_path)
+
+    # Verify results
+    assert len(index.search('old text')) == 0
+    assert len(index.search('new text')) == 1
+
+def test_block_search_index__reopened_index_only_reindexes_changed_pages(tmp_dir, search_db_path):
+    # Setup environment
+    write_md_content(tmp_dir / 'kept.md', '- kept text')
+    write_md_content(tmp_dir / 'changed.md', '- old text')
+    BlockSearchIndex(tmp_dir, search_db_path).search('text')
+    write_md_content(tmp_dir / 'changed.md', '- new text, longer than before')
+    (tmp_dir / 'kept.md').rename(tmp_dir / 'moved.md')
+
+    # Perform function action under testing
+    actual_results = BlockSearchIndex(tmp_dir, search_db_path).search('text')
+
+    # Verify results
+    assert sorted((result.page_name, result.block_text) for result in actual_results) == [
+        ('changed.md', '- new text, longer than before'),
+        ('moved.md', '- kept text'),
+    ]
+
+def test_handle_block_search__uses_index_when_enabled(tmp_dir, search_db_path):
+    # Setup environment
+    block_id_str = str(uuid.uuid4())
+    block_text = 'This is a Block that has an ID assigned to it but nothing actually referencing it!'
+    write_md_content(tmp_dir / 'test.md', f'- {block_text}\n  id:: {block_id_str}\n')
+    generate_and_write_n_md_files(tmp_dir, 25)
+
+    # Perform function action under testing
+    actual_results = handle_block_search(block_text, tmp_dir)
+
+    # Verify results
+    assert get_block_search_index(tmp_dir) is not None
+    assert len(actual_results) == 1
+    actual = actual_results[0]
+    assert actual.block_id == block_id_str
+    assert actual.block_text == f'- {block_text}'
+    assert actual.line_number == 1
+    assert actual.page_name == 'test.md'
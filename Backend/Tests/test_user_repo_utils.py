@@ -0,0 +1,105 @@
+import threading
+import time
+import uuid
+
+import pytest
+
+from ..config import set_watch_repositories
+from ..models.user_model import User
+from ..utilities import user_repo_utils, watch_utils
+from ..utilities.user_repo_utils import (
+    UserRepository,
+    get_user_repository,
+    evict_idle_user_repositories,
+    start_user_repository_evictor,
+    stop_user_repository_evictor,
+)
+from ..utilities.index_utils import get_reference_index
+from ..utilities.watch_utils import stop_repo_watchers
+
+@pytest.fixture
+def tmp_dir(tmp_path):
+    return tmp_path
+
+def make_user():
+    return User(id=str(uuid.uuid4()), username='example@email.com', password='abc123', name='Test User')
+
+def test_get_user_repository__resolves_paths_once(tmp_dir, monkeypatch):
+    # Setup environment
+    user = make_user()
+    created_paths = []
+    monkeypatch.setattr(user_repo_utils, 'create_path_if_not_exit', created_paths.append)
+
+    # Perform function action under testing
+    repositories = [get_user_repository(user, tmp_dir) for _ in range(3)]
+
+    # Verify results
+    assert repositories[0] is repositories[1] is repositories[2]
+    assert repositories[0].repo_path == tmp_dir / 'users' / user.id
+    assert repositories[0].pages_path == tmp_dir / 'users' / user.id / 'pages'
+    assert created_paths == [repositories[0].pages_path]
+
+def test_evict_idle_user_repositories__drops_in_memory_state(tmp_dir):
+    # Setup environment
+    user = make_user()
+    repository = get_user_repository(user, tmp_dir)
+    index = repository.reference_index
+    assert get_reference_index(repository.repo_path) is index
+
+    # Perform function action under testing
+    evicted_count = evict_idle_user_repositories(max_idle_seconds=0)
+
+    # Verify results
+    assert evicted_count >= 1
+    assert get_user_repository(user, tmp_dir) is not repository
+    assert get_reference_index(repository.repo_path) is not index
+
+def test_evict_idle_user_repositories__user_coming_back_keeps_new_state(tmp_dir, monkeypatch):
+    # Setup environment
+    set_watch_repositories(True)
+    user = make_user()
+    repository = get_user_repository(user, tmp_dir)
+    new_repositories = []
+    coming_back = threading.Thread(target=lambda: new_repositories.append(get_user_repository(user, tmp_dir)))
+    release = UserRepository.release
+    def release_while_user_comes_back(self):
+        if self is repository:
+            coming_back.start()
+            coming_back.join(0.2) # gets its handle right now, unless it has to wait for the release
+        release(self)
+    monkeypatch.setattr(UserRepository, 'release', release_while_user_comes_back)
+
+    # Perform function action under testing
+    try:
+        evict_idle_user_repositories(max_idle_seconds=0)
+        coming_back.join()
+        new_repository = new_repositories[0]
+        watcher = watch_utils._watchers.get(new_repository.repo_path)
+        index = new_repository.reference_index
+        watching = watcher is not None and not watcher._stop_event.is_set()
+    finally:
+        stop_repo_watchers()
+        set_watch_repositories(False)
+
+    # Verify results
+    assert new_repository is not repository
+    assert watching
+    assert get_reference_index(new_repository.repo_path) is index
+
+def test_start_user_repository_evictor__releases_idle_repositories_in_the_background(tmp_dir):
+    # Setup environment
+    user = make_user()
+    repository = get_user_repository(user, tmp_dir)
+
+    # Perform function action under testing
+    start_user_repository_evictor(interval_seconds=0.01, max_idle_seconds=0)
+    try:
+        deadline = time.monotonic() + 5
+        while user.id in user_repo_utils._user_repositories and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        stop_user_repository_evictor()
+
+    # Verify results
+    assert user.id not in user_repo_utils._user_repositories
+    assert get_user_repository(user, tmp_dir) is not repository
@@ -0,0 +1,123 @@
+import os
+import time
+
+import pytest
+
+from ..utilities.cache_utils import page_cache
+from ..utilities.index_utils import get_reference_index, drop_reference_index, on_page_written, register_page_listener
+from ..utilities.watch_utils import RepoWatcher, start_repo_watcher, stop_repo_watcher
+from .utils import write_md_content
+
+@pytest.fixture
+def tmp_dir(tmp_path):
+    yield tmp_path
+    drop_reference_index(tmp_path) # unregisters the watchers of the tests as well
+
+def make_watcher(repo_path):
+    watcher = RepoWatcher(repo_path)
+    register_page_listener(watcher)
+    watcher._record_baseline()
+    return watcher
+
+def write_externally(path, content):
+    # like a sync tool would: no hooks, and a modification time the manifest hasn't seen
+    write_md_content(path, content)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+def test_repo_watcher__external_edit_updates_indexes_and_cache(tmp_dir):
+    # Setup environment
+    pages_path = tmp_dir / 'pages'
+    pages_path.mkdir()
+    page_path = pages_path / 'example.md'
+    write_md_content(page_path, '- nothing yet')
+    index = get_reference_index(tmp_dir)
+    assert index.sources_linking_to('target') == []
+    assert page_cache.read_text(page_path) == '- nothing yet'
+    watcher = make_watcher(tmp_dir)
+
+    # Perform function action under testing
+    write_externally(page_path, '- [[target]]')
+    changed_count = watcher.apply_changes([page_path])
+
+    # Verify results
+    assert changed_count == 1
+    assert index.sources_linking_to('target') == [page_path]
+    assert page_cache.read_text(page_path) == '- [[target]]'
+
+def test_repo_watcher__removed_folder_removes_its_pages(tmp_dir):
+    # Setup environment
+    journals_path = tmp_dir / 'journals'
+    journals_path.mkdir()
+    paths = [journals_path / f'2025_01_0{day}.md' for day in range(1, 4)]
+    for path in paths:
+        write_md_content(path, '- [[target]]')
+    index = get_reference_index(tmp_dir)
+    assert index.sources_linking_to('target') == paths
+    watcher = make_watcher(tmp_dir)
+
+    # Perform function action under testing
+    for path in paths:
+        path.unlink()
+    journals_path.rmdir()
+    changed_count = watcher.apply_changes([journals_path])
+
+    # Verify results
+    assert changed_count == 3
+    assert index.sources_linking_to('target') == []
+
+def test_repo_watcher__ignores_pages_written_through_the_api(tmp_dir):
+    # Setup environment
+    page_path = tmp_dir / 'example.md'
+    write_md_content(page_path, '- first')
+    watcher = make_watcher(tmp_dir)
+
+    # Perform function action under testing
+    write_externally(page_path, '- saved through the API')
+    on_page_written(page_path) # what the API does after every save
+    changed_count = watcher.apply_changes([page_path])
+
+    # Verify results
+    assert changed_count == 0
+
+def test_repo_watcher__rescan_finds_missed_changes(tmp_dir):
+    # Setup environment
+    changed_path = tmp_dir / 'changed.md'
+    removed_path = tmp_dir / 'removed.md'
+    added_path = tmp_dir / 'added.md'
+    write_md_content(changed_path, '- before')
+    write_md_content(removed_path, '- [[target]]')
+    index = get_reference_index(tmp_dir)
+    assert index.sources_linking_to('target') == [removed_path]
+    watcher = make_watcher(tmp_dir)
+
+    # Perform function action under testing
+    write_externally(changed_path, '- after [[target]]')
+    removed_path.unlink()
+    write_md_content(added_path, '- [[target]]')
+    changed_count = watcher.rescan() # no events at all
+
+    # Verify results
+    assert changed_count == 3
+    assert index.sources_linking_to('target') == [added_path, changed_path]
+
+def test_start_repo_watcher__picks_up_external_edits(tmp_dir):
+    # Setup environment
+    page_path = tmp_dir / 'example.md'
+    write_md_content(page_path, '- nothing yet')
+    index = get_reference_index(tmp_dir)
+    assert index.sources_linking_to('target') == []
+    start_repo_watcher(tmp_dir)
+    time.sleep(0.5) # the watcher starts watching on its own thread
+
+    # Perform function action under testing
+    try:
+        write_externally(page_path, '- [[target]]')
+        deadline = time.monotonic() + 10
+        while index.sources_linking_to('target') == [] and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        stop_repo_watcher(tmp_dir)
+
+    # Verify results
+    assert index.sources_linking_to('target') == [page_path]
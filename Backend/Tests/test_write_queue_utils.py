@@ -0,0 +1,163 @@
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from ..config import set_save_coalesce_window, DEFAULT_SAVE_COALESCE_WINDOW
+from ..utilities import write_queue_utils
+from ..utilities.write_queue_utils import PageWriteQueue, write_page_atomically
+from .utils import write_md_content
+
+@pytest.fixture
+def tmp_dir(tmp_path):
+    return tmp_path
+
+@pytest.fixture
+def long_coalesce_window():
+    # long enough that only flushes write anything during a test
+    set_save_coalesce_window(60)
+    yield
+    set_save_coalesce_window(DEFAULT_SAVE_COALESCE_WINDOW)
+
+def read(path):
+    with open(path, 'r') as f:
+        return f.read()
+
+def test_write_page_atomically__replaces_content_without_leftovers(tmp_dir):
+    # Setup environment
+    path = tmp_dir / 'example.md'
+    write_md_content(path, '- before')
+    os.chmod(path, 0o640)
+
+    # Perform function action under testing
+    write_page_atomically(path, '- after', fsync=True)
+
+    # Verify results
+    assert read(path) == '- after'
+    assert os.stat(path).st_mode & 0o777 == 0o640
+    assert os.listdir(tmp_dir) == ['example.md']
+
+def test_page_write_queue__without_window_writes_right_away(tmp_dir):
+    # Setup environment
+    path = tmp_dir / 'example.md'
+    write_md_content(path, '')
+    queue = PageWriteQueue()
+
+    # Perform function action under testing
+    queue.submit(path, '- a')
+
+    # Verify results
+    assert read(path) == '- a'
+    assert queue.stats().written == 1
+    assert queue.stats().pending == 0
+
+def test_page_write_queue__coalesces_saves_within_window(tmp_dir, long_coalesce_window):
+    # Setup environment
+    path = tmp_dir / 'example.md'
+    write_md_content(path, '')
+    queue = PageWriteQueue()
+
+    # Perform function action under testing
+    for content in ['- a', '- ab', '- abc']:
+        queue.submit(path, content)
+    assert read(path) == ''
+    assert queue.pending_content(path) == '- abc'
+    queue.flush(path)
+
+    # Verify results
+    assert read(path) == '- abc'
+    stats = queue.stats()
+    assert stats.submitted == 3
+    assert stats.coalesced == 2
+    assert stats.written == 1
+    assert stats.pending == 0
+
+def test_page_write_queue__flush_under_only_writes_pages_in_directory(tmp_dir, long_coalesce_window):
+    # Setup environment
+    (tmp_dir / 'a').mkdir()
+    (tmp_dir / 'b').mkdir()
+    path_a = tmp_dir / 'a' / 'example.md'
+    path_b = tmp_dir / 'b' / 'example.md'
+    queue = PageWriteQueue()
+    queue.submit(path_a, '- a')
+    queue.submit(path_b, '- b')
+
+    # Perform function action under testing
+    queue.flush_under(tmp_dir / 'a')
+
+    # Verify results
+    assert read(path_a) == '- a'
+    assert not path_b.exists()
+    queue.shutdown()
+    assert read(path_b) == '- b'
+
+def test_page_write_queue__writes_once_window_ends(tmp_dir):
+    # Setup environment
+    path = tmp_dir / 'example.md'
+    queue = PageWriteQueue()
+    set_save_coalesce_window(0.01)
+
+    # Perform function action under testing
+    try:
+        queue.submit(path, '- a')
+        queue.submit(path, '- b')
+        for _ in range(500): # wait for the background thread
+            if queue.stats().written:
+                break
+            time.sleep(0.01)
+    finally:
+        set_save_coalesce_window(DEFAULT_SAVE_COALESCE_WINDOW)
+
+    # Verify results
+    assert read(path) == '- b'
+    assert queue.stats().written == 1
+
+def test_page_write_queue__failing_listener_doesnt_lose_saves(tmp_dir, long_coalesce_window, monkeypatch):
+    # Setup environment
+    paths = [tmp_dir / 'a.md', tmp_dir / 'b.md']
+    queue = PageWriteQueue()
+    for path in paths:
+        write_md_content(path, '- before')
+        queue.submit(path, '- after')
+    def fail_to_update_index(path):
+        raise sqlite3.OperationalError('database is locked')
+    monkeypatch.setattr(write_queue_utils, 'on_page_written', fail_to_update_index)
+
+    # Perform function action under testing
+    queue.flush_all()
+    queue.submit(paths[0], '- after again')
+    flushing = threading.Thread(target=queue.flush, args=(paths[0],), daemon=True)
+    flushing.start()
+    flushing.join(5)
+
+    # Verify results
+    assert not flushing.is_alive()
+    assert [read(path) for path in paths] == ['- after again', '- after']
+    assert queue.stats().pending == 0
+    assert queue.stats().failed == 0
+
+def test_page_write_queue__failed_save_is_kept_and_reported(tmp_dir, long_coalesce_window, monkeypatch):
+    # Setup environment
+    path = tmp_dir / 'example.md'
+    write_md_content(path, '- before')
+    queue = PageWriteQueue()
+    queue.submit(path, '- after')
+    def fail_to_write(path, content, fsync=False):
+        raise OSError(28, 'No space left on device')
+    monkeypatch.setattr(write_queue_utils, 'write_page_atomically', fail_to_write)
+
+    # Perform function action under testing
+    with pytest.raises(OSError):
+        queue.flush(path)
+    monkeypatch.undo()
+    failed_stats = queue.stats()
+    queue.flush(path)
+
+    # Verify results
+    assert failed_stats.failed == 1
+    assert failed_stats.pending == 1
+    assert read(path) == '- after'
+    assert queue.stats().written == 1
+    assert queue.stats().pending == 0
@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Optional
 import os
 
 from .utilities.path_utils import create_path_if_not_exit
@@ -6,6 +7,40 @@ from .utilities.path_utils import create_path_if_not_exit
 DEFAULT_DB_PATH = Path.home() / 'elegant-notes-db'
 _db_path = DEFAULT_DB_PATH
 
+# lives next to the users database (`elegant-notes.db`); `None` (the default) disables the Block
+#   search index, `main.py` enables it with `ELEGANT_NOTES_BLOCK_SEARCH_INDEX=1`
+DEFAULT_BLOCK_SEARCH_DB_PATH = Path('elegant-notes-search.db')
+_block_search_db_path: Optional[Path] = None
+
+# worker processes for scanning a whole repository (reference lookups, index builds); 1 = no pool
+DEFAULT_REFERENCE_SCAN_WORKERS = 1
+_reference_scan_workers = DEFAULT_REFERENCE_SCAN_WORKERS
+
+# saves to the same Page within this many seconds are merged into one write; 0 = write every save
+DEFAULT_SAVE_COALESCE_WINDOW = 0.0
+_save_coalesce_window = DEFAULT_SAVE_COALESCE_WINDOW
+_save_fsync = False
+
+# threads doing the file work of requests: cheap Page reads/writes, and expensive repository scans
+#   (references, Block search, renames) - separate so Page reads never wait behind scans
+DEFAULT_IO_EXECUTOR_WORKERS = 16
+_io_executor_workers = DEFAULT_IO_EXECUTOR_WORKERS
+DEFAULT_SCAN_EXECUTOR_WORKERS = 4
+_scan_executor_workers = DEFAULT_SCAN_EXECUTOR_WORKERS
+
+# cost factor (log2 of the iterations) for new password hashes; existing hashes keep their own
+DEFAULT_BCRYPT_ROUNDS = 12
+_bcrypt_rounds = DEFAULT_BCRYPT_ROUNDS
+# threads hashing/verifying passwords, and how many more requests may wait for one before
+#   getting a 503 instead
+DEFAULT_PASSWORD_HASH_WORKERS = 1
+_password_hash_workers = DEFAULT_PASSWORD_HASH_WORKERS
+DEFAULT_PASSWORD_HASH_QUEUE_LIMIT = 16
+_password_hash_queue_limit = DEFAULT_PASSWORD_HASH_QUEUE_LIMIT
+
+# watch the repositories of active users for edits made outside the API (sync tools, other editors)
+_watch_repositories = False
+
 def get_pages_path() -> Path:
     path = _db_path / 'pages'
     create_path_if_not_exit(path)
@@ -18,3 +53,73 @@ def set_db_path(new_path: Path) -> None:
 def reset_db_path() -> None:
     global _db_path
     _db_path = DEFAULT_DB_PATH
+
+def get_block_search_db_path() -> Optional[Path]:
+    return _block_search_db_path
+
+def set_block_search_db_path(new_path: Optional[Path]) -> None:
+    global _block_search_db_path
+    _block_search_db_path = new_path
+
+def get_reference_scan_workers() -> int:
+    return _reference_scan_workers
+
+def set_reference_scan_workers(worker_count: int) -> None:
+    global _reference_scan_workers
+    _reference_scan_workers = max(1, worker_count)
+
+def get_save_coalesce_window() -> float:
+    return _save_coalesce_window
+
+def set_save_coalesce_window(seconds: float) -> None:
+    global _save_coalesce_window
+    _save_coalesce_window = seconds
+
+def get_save_fsync() -> bool:
+    return _save_fsync
+
+def set_save_fsync(enabled: bool) -> None:
+    global _save_fsync
+    _save_fsync = enabled
+
+def get_io_executor_workers() -> int:
+    return _io_executor_workers
+
+def set_io_executor_workers(worker_count: int) -> None:
+    global _io_executor_workers
+    _io_executor_workers = max(1, worker_count)
+
+def get_scan_executor_workers() -> int:
+    return _scan_executor_workers
+
+def set_scan_executor_workers(worker_count: int) -> None:
+    global _scan_executor_workers
+    _scan_executor_workers = max(1, worker_count)
+
+def get_bcrypt_rounds() -> int:
+    return _bcrypt_rounds
+
+def set_bcrypt_rounds(rounds: int) -> None:
+    global _bcrypt_rounds
+    _bcrypt_rounds = min(31, max(4, rounds)) # what bcrypt supports
+
+def get_password_hash_workers() -> int:
+    return _password_hash_workers
+
+def set_password_hash_workers(worker_count: int) -> None:
+    global _password_hash_workers
+    _password_hash_workers = max(1, worker_count)
+
+def get_password_hash_queue_limit() -> int:
+    return _password_hash_queue_limit
+
+def set_password_hash_queue_limit(limit: int) -> None:
+    global _password_hash_queue_limit
+    _password_hash_queue_limit = max(0, limit)
+
+def get_watch_repositories() -> bool:
+    return _watch_repositories
+
+def set_watch_repositories(enabled: bool) -> None:
+    global _watch_repositories
+    _watch_repositories = enabled
@@ -1,12 +1,77 @@
-from sqlalchemy import create_engine
+from typing import AsyncIterator
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, StaticPool
 
 # this should be in a config file and loaded whenever an admin changes it, along with a
 #   system that moves all entries to the new database; this is a long ways away, though
 SQLALCHEMY_DATABASE_URL = 'sqlite:///elegant-notes.db'
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# how long a connection waits for another one's write lock before failing with `database is locked`
+SQLITE_BUSY_TIMEOUT_MS = 5000
+SQLITE_MMAP_SIZE = 64 * 1024 * 1024
+# connections kept open, and how many more may be opened when all of them are in use (FastAPI
+#   runs sync routes on a thread pool of 40 threads)
+DB_POOL_SIZE = 8
+DB_POOL_MAX_OVERFLOW = 32
+DB_POOL_TIMEOUT_SECONDS = 30
+
+def create_users_engine(database_url: str = SQLALCHEMY_DATABASE_URL,
+                        busy_timeout_ms: int = SQLITE_BUSY_TIMEOUT_MS,
+                        mmap_size: int = SQLITE_MMAP_SIZE,
+                        pool_size: int = DB_POOL_SIZE,
+                        max_overflow: int = DB_POOL_MAX_OVERFLOW) -> Engine:
+    '''## Create an engine for the users database, tuned for concurrent requests
+    Every connection uses WAL (readers don't block the writer and the other way around),
+    `synchronous=NORMAL` (safe with WAL, only the last commits may be lost on power loss), waits
+    for locks instead of failing right away and memory maps the database file.'''
+    if _is_in_memory(database_url):
+        # every connection would get its own empty database, so share a single one
+        engine = create_engine(database_url, connect_args={'check_same_thread': False}, poolclass=StaticPool)
+    else:
+        engine = create_engine(database_url,
+                               connect_args={'check_same_thread': False},
+                               poolclass=QueuePool,
+                               pool_size=pool_size,
+                               max_overflow=max_overflow,
+                               pool_timeout=DB_POOL_TIMEOUT_SECONDS)
+    _set_sqlite_pragmas_on_connect(engine, database_url, busy_timeout_ms, mmap_size)
+    return engine
+
+def create_async_users_engine(database_url: str = SQLALCHEMY_DATABASE_URL,
+                              busy_timeout_ms: int = SQLITE_BUSY_TIMEOUT_MS,
+                              mmap_size: int = SQLITE_MMAP_SIZE):
+    '''## Async version of `create_users_engine`, or `None` if `aiosqlite` isn't installed'''
+    try:
+        import aiosqlite # noqa: F401 - only checking that it's there
+        from sqlalchemy.ext.asyncio import create_async_engine
+    except ImportError:
+        return None
+    async_url = database_url.replace('sqlite://', 'sqlite+aiosqlite://', 1)
+    engine = create_async_engine(async_url, connect_args={'check_same_thread': False})
+    _set_sqlite_pragmas_on_connect(engine.sync_engine, database_url, busy_timeout_ms, mmap_size)
+    return engine
+
+def _set_sqlite_pragmas_on_connect(engine: Engine, database_url: str, busy_timeout_ms: int, mmap_size: int) -> None:
+    in_memory = _is_in_memory(database_url)
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not in_memory: # in-memory databases can't use WAL
+            cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute(f'PRAGMA busy_timeout={int(busy_timeout_ms)}')
+        cursor.execute(f'PRAGMA mmap_size={int(mmap_size)}')
+        cursor.close()
+
+def _is_in_memory(database_url: str) -> bool:
+    return database_url.rstrip('/') in ('sqlite:', 'sqlite:/') or database_url.endswith(':memory:')
+
+engine = create_users_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -17,3 +82,22 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async_engine = create_async_users_engine()
+AsyncSessionLocal = None
+if async_engine is not None:
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def get_login_db() -> AsyncIterator[object]:
+    '''## The one session of a login: async when `aiosqlite` is installed, the sync one of `get_db` otherwise
+    (see `auth_handler.handle_user_login`, which runs sync lookups on the thread pool)'''
+    if AsyncSessionLocal is None:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+        return
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,6 +1,7 @@
 from pathlib import Path
 
 from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 
@@ -15,41 +16,67 @@ from ..models.user_model import (
 )
 from ..utilities.db_utils import (
     db_get_user_by_username,
+    async_db_get_user_by_username,
     db_add_user,
 )
 from ..utilities.auth_utils import (
-    hash_equals_plaintext,
     create_access_token,
+    decode_access_token,
 )
+from ..utilities.password_pool_utils import password_hashing_pool, PasswordHashingBusyError
+from ..utilities.auth_cache_utils import auth_cache
 from ..utilities.user_repo_utils import create_user_repo
 
-def handle_user_registration(user_info: User, db: Session, repo_path: Path = get_repo_path()) -> UserTokens:
-    user_with_same_username = db_get_user_by_username(db, user_info.username)
+async def handle_user_registration(user_info: User, db: Session, repo_path: Path = get_repo_path()) -> UserTokens:
+    # the database and file system work runs on the thread pool too: a locked database (writes
+    #   wait up to the busy timeout) would otherwise hold up every other request
+    user_with_same_username = await run_in_threadpool(db_get_user_by_username, db, user_info.username)
     if user_with_same_username is not None:
         raise HTTPException(status_code=400, detail="Username already registered")
     
-    db_add_user(db, user_info)
+    hashed_password = await _run_password_hashing(password_hashing_pool.hash(user_info.password))
+    await run_in_threadpool(_add_user_with_repo, db, user_info, hashed_password, repo_path)
+    return _create_tokens(user_info.username)
+
+def _add_user_with_repo(db: Session, user_info: User, hashed_password: str, repo_path: Path) -> None:
+    db_add_user(db, user_info, hashed_password)
     create_user_repo(repo_path, user_info)
-    return handle_user_login(user_info, db) # generates JWT token for us
 
-def handle_user_login(user_info: UserCredentials, db: Session) -> UserTokens:
-    user = db_get_user_by_username(db, user_info.username)
-    if user is None or not hash_equals_plaintext(user.password, user_info.password):
+async def handle_user_login(user_info: UserCredentials, db) -> UserTokens:
+    '''`db` is either a sync `Session` or an async one (see `db_api.get_login_db`)'''
+    if isinstance(db, Session):
+        user = await run_in_threadpool(db_get_user_by_username, db, user_info.username)
+    else:
+        user = await async_db_get_user_by_username(db, user_info.username)
+    if user is None or not await _run_password_hashing(password_hashing_pool.verify(user.password, user_info.password)):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Username or password is incorrect",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    data = {'sub': user.username}
-    access_token = create_access_token(data)
-    return UserTokens(access_token=access_token, token_type='bearer')
+    return _create_tokens(user.username)
 
 def handle_token_refresh(user_info: User, db: Session) -> UserTokens:
-    data = {'sub': user_info.username}
-    access_token = create_access_token(data)
-    return UserTokens(access_token=access_token, token_type='bearer')
+    return _create_tokens(user_info.username)
 
 def handle_user_logout(user_info: UserTokens, db: Session) -> UserLogOutInfo:
-    # TODO implement this
+    payload = decode_access_token(user_info.access_token)
+    if payload is not None:
+        auth_cache.revoke(user_info.access_token, payload.get('exp', float('inf')))
     return UserLogOutInfo(log_out_successful=True)
+
+def _create_tokens(username: str) -> UserTokens:
+    data = {'sub': username}
+    access_token = create_access_token(data)
+    return UserTokens(access_token=access_token, token_type='bearer')
+
+async def _run_password_hashing(operation):
+    try:
+        return await operation
+    except PasswordHashingBusyError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many logins at once, try again shortly",
+            headers={"Retry-After": "1"},
+        )
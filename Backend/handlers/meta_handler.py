@@ -1,15 +1,24 @@
-from typing import List
+from itertools import islice
+from typing import Iterator, List, Optional, Set
 from pathlib import Path
 
 from fastapi import HTTPException, status
 
 from ..utilities.meta_utils import (
     ReferenceLocator,
+    ReferenceExtractor,
     BacklinkExtractor,
     BlockReferenceExtractor,
-    search_blocks,
+    References,
+    collect_references_for_each,
+    find_blocks,
 )
-from ..utilities.user_repo_utils import get_page_objects
+from ..utilities.user_repo_utils import UserRepository, get_page_objects
+from ..utilities.index_utils import ReferenceIndex, get_reference_index
+from ..utilities.search_index_utils import get_block_search_index
+from ..utilities.page_search_utils import get_page_name_index
+from ..utilities.write_queue_utils import page_write_queue
+from ..utilities.json_utils import dump_models_json
 from ..models.status_model import (
     OperationResponse,
     SuccessResponse,
@@ -17,37 +26,95 @@ from ..models.status_model import (
 from ..models.meta_model import (
     PageLinkage,
     ReferencesRetrievalRequest,
-    BlockSearchResult
+    BlockSearchResult,
+    StreamedReference,
 )
 
-def handle_get_all_references(retrieval_request: ReferencesRetrievalRequest, user_path: Path) -> PageLinkage:
+def handle_get_all_references(retrieval_request: ReferencesRetrievalRequest, user_path: Path, repository: Optional[UserRepository] = None) -> PageLinkage:
+    return _create_reference_locator(retrieval_request, user_path, repository).retrieve_all_relationships()
+
+def handle_get_all_references_json(retrieval_request: ReferencesRetrievalRequest, user_path: Path, repository: Optional[UserRepository] = None) -> bytes:
+    '''## `handle_get_all_references`, serialized as the response body (see `json_utils`)'''
+    return _create_reference_locator(retrieval_request, user_path, repository).retrieve_all_relationships_json()
+
+def iter_references(retrieval_request: ReferencesRetrievalRequest, user_path: Path, limit: Optional[int] = None, repository: Optional[UserRepository] = None) -> Iterator[StreamedReference]:
+    '''## Streaming version of `handle_get_all_references`, stopping after `limit` records'''
+    references = _create_reference_locator(retrieval_request, user_path, repository).iter_relationships()
+    return references if limit is None else islice(references, max(0, limit))
+
+def handle_get_references_batch(retrieval_requests: List[ReferencesRetrievalRequest], user_path: Path, repository: Optional[UserRepository] = None) -> List[PageLinkage]:
+    '''## `handle_get_all_references` for each request, in one pass over the files they're found in'''
+    return [refs.to_model() for refs in _collect_references_batch(retrieval_requests, user_path, repository)]
+
+def handle_get_references_batch_json(retrieval_requests: List[ReferencesRetrievalRequest], user_path: Path, repository: Optional[UserRepository] = None) -> bytes:
+    '''## `handle_get_references_batch`, serialized as the response body (see `json_utils`)'''
+    return References.to_json_list(_collect_references_batch(retrieval_requests, user_path, repository))
+
+def _collect_references_batch(retrieval_requests: List[ReferencesRetrievalRequest], user_path: Path, repository: Optional[UserRepository]) -> List[References]:
+    page_write_queue.flush_under(user_path)
+    index = _reference_index(user_path, repository)
+    searches = [(_create_extractors(request, user_path), _find_page_files(index, request)) for request in retrieval_requests]
+    return collect_references_for_each(searches)
+
+def _create_reference_locator(retrieval_request: ReferencesRetrievalRequest, user_path: Path, repository: Optional[UserRepository]) -> ReferenceLocator:
+    page_write_queue.flush_under(user_path) # the indexes only see saves once they're written
     page_path = user_path / (retrieval_request.page_name + '.md')
-    ref_locator = ReferenceLocator(user_path, page_path, retrieval_request.block_ids)
-    ref_locator.add_extractor(BacklinkExtractor(page_path.name))
-    ref_locator.add_extractor(BlockReferenceExtractor(retrieval_request.block_ids))
-    return ref_locator.retrieve_all_relationships()
-
-def handle_page_search(partial_page_name: str, user_path: Path) -> List[str]:
-    # cheap dumb version that can most definitely be updated later
-    all_files = []
-    cut_len = len(str(user_path))
-    for file in get_page_objects(user_path):
-        if partial_page_name.lower() in file.name.lower():
-            # `file` is a full path, so we cut everything before the user repo path
-            final = str(file)[cut_len:]
-            all_files.append(final)
-    return all_files
-
-def handle_block_search(given_text: str, user_path: Path) -> List[BlockSearchResult]:
-    found: List[BlockSearchResult] = []
-    for page_obj in get_page_objects(user_path):
-        found.extend(search_blocks(given_text, page_obj))
-    return found
-
-def handle_block_id_assignment(query: BlockSearchResult, user_repo_path: Path) -> OperationResponse:
+    page_files = _find_page_files(_reference_index(user_path, repository), retrieval_request)
+    ref_locator = ReferenceLocator(user_path, page_path, retrieval_request.block_ids, sorted(page_files))
+    for extractor in _create_extractors(retrieval_request, user_path):
+        ref_locator.add_extractor(extractor)
+    return ref_locator
+
+def _find_page_files(index: ReferenceIndex, retrieval_request: ReferencesRetrievalRequest) -> Set[Path]:
+    page_files = set(index.sources_linking_to(retrieval_request.page_name))
+    page_files.update(index.sources_referencing_blocks(retrieval_request.block_ids))
+    return page_files
+
+def _reference_index(user_path: Path, repository: Optional[UserRepository]) -> ReferenceIndex:
+    # the handle is what the routers have (see `user_repo_utils`); tests and scripts pass the path alone
+    return get_reference_index(user_path) if repository is None else repository.reference_index
+
+def _create_extractors(retrieval_request: ReferencesRetrievalRequest, user_path: Path) -> List[ReferenceExtractor]:
+    page_path = user_path / (retrieval_request.page_name + '.md')
+    return [BacklinkExtractor(page_path.name), BlockReferenceExtractor(retrieval_request.block_ids)]
+
+def handle_page_search(partial_page_name: str, user_path: Path, limit: Optional[int] = None, fuzzy: bool = False, repository: Optional[UserRepository] = None) -> List[str]:
+    # paths are relative to the user repo, e.g. `/pages/<name>.md`
+    index = get_page_name_index(user_path) if repository is None else repository.page_name_index
+    return index.search(partial_page_name, limit, fuzzy)
+
+def handle_block_search(given_text: str, user_path: Path, limit: Optional[int] = None, offset: int = 0, repository: Optional[UserRepository] = None) -> List[BlockSearchResult]:
+    return list(iter_block_search(given_text, user_path, limit, offset, repository))
+
+def handle_block_search_json(given_text: str, user_path: Path, limit: Optional[int] = None, offset: int = 0, repository: Optional[UserRepository] = None) -> bytes:
+    '''## `handle_block_search`, serialized as the response body (see `json_utils`)'''
+    return dump_models_json(handle_block_search(given_text, user_path, limit, offset, repository), List[BlockSearchResult])
+
+def iter_block_search(given_text: str, user_path: Path, limit: Optional[int] = None, offset: int = 0, repository: Optional[UserRepository] = None) -> Iterator[BlockSearchResult]:
+    '''## Streaming version of `handle_block_search`
+    Without the search index, results come out Page by Page while the repository is scanned.'''
+    page_write_queue.flush_under(user_path)
+    search_index = get_block_search_index(user_path) if repository is None else repository.block_search_index
+    if search_index is not None:
+        return iter(search_index.search(given_text, limit, offset))
+
+    # no index available - scan every Page instead
+    found = ((matches, index)
+             for page_obj in get_page_objects(user_path)
+             for matches in (find_blocks(given_text, page_obj),)
+             for index in range(len(matches)))
+    offset = max(0, offset)
+    end = None if limit is None else offset + max(0, limit)
+    return (matches.to_model(index) for matches, index in islice(found, offset, end)) # only what's sent becomes a model
+
+def handle_block_id_assignment(query: BlockSearchResult, user_repo_path: Path, repository: Optional[UserRepository] = None) -> OperationResponse:
     if query.block_id is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='New Block ID (in UUID V4 format) is required - none given')
     
+    page_write_queue.flush_under(user_repo_path)
+    if _reference_index(user_repo_path, repository).lookup_block(query.block_id) is not None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail='Block ID is already assigned to another Block')
+
     path = user_repo_path / 'pages' / query.page_name # TODO update this to use other folders when we fully support that feature
     if not path.exists():
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Path to Page does not exist')
@@ -66,6 +133,5 @@ def handle_block_id_assignment(query: BlockSearchResult, user_repo_path: Path) -
     id_line = f'{indention}id:: {query.block_id}'
     lines.insert(query.line_number, id_line)
     new_content = '\n'.join(line.rstrip() for line in lines)
-    with path.open('w') as f:
-        f.write(new_content + '\n')
+    page_write_queue.submit(path, new_content + '\n')
     return SuccessResponse(msg='Block ID assignment successful')
@@ -0,0 +1,56 @@
+from typing import List
+
+from ..utilities.metrics_utils import metrics, Sample, IndexStats
+from ..utilities.cache_utils import page_cache
+from ..utilities.auth_cache_utils import auth_cache
+from ..utilities.password_pool_utils import password_hashing_pool
+from ..utilities.write_queue_utils import page_write_queue
+from ..utilities.index_utils import get_reference_index_stats
+from ..utilities.page_search_utils import get_page_name_index_stats
+from ..utilities.page_metadata_utils import get_page_metadata_index_stats
+from ..utilities.search_index_utils import get_block_search_index_stats
+from ..utilities.user_repo_utils import get_user_repository_count
+from ..utilities.watch_utils import get_repo_watcher_count
+
+def handle_get_metrics() -> str:
+    '''## Everything recorded so far plus the current state of the caches, queues and indexes
+    In the Prometheus text format. Only totals are reported, nothing per user.'''
+    return metrics.render(_collect_internal_samples())
+
+def _collect_internal_samples() -> List[Sample]:
+    cache = page_cache.stats()
+    auth = auth_cache.stats()
+    pool = password_hashing_pool.stats()
+    queue = page_write_queue.stats()
+    samples = [
+        Sample('page_cache_hits_total', cache.hits),
+        Sample('page_cache_misses_total', cache.misses),
+        Sample('page_cache_evictions_total', cache.evictions),
+        Sample('page_cache_entries', cache.entries),
+        Sample('page_cache_size_bytes', cache.size_bytes),
+        Sample('page_cache_max_bytes', cache.max_bytes),
+        Sample('auth_cache_hits_total', auth.hits),
+        Sample('auth_cache_misses_total', auth.misses),
+        Sample('auth_cache_evictions_total', auth.evictions),
+        Sample('auth_cache_entries', auth.entries),
+        Sample('password_hashing_in_flight', pool.in_flight),
+        Sample('password_hashing_completed_total', pool.completed),
+        Sample('password_hashing_rejected_total', pool.rejected),
+        Sample('page_saves_submitted_total', queue.submitted),
+        Sample('page_saves_written_total', queue.written),
+        Sample('page_saves_coalesced_total', queue.coalesced),
+        Sample('page_saves_failed_total', queue.failed),
+        Sample('page_saves_pending', queue.pending),
+        Sample('user_repositories_in_memory', get_user_repository_count()),
+        Sample('repo_watchers_running', get_repo_watcher_count()),
+    ]
+    for index_name, stats in (('reference', get_reference_index_stats()),
+                              ('page_name', get_page_name_index_stats()),
+                              ('page_metadata', get_page_metadata_index_stats()),
+                              ('block_search', get_block_search_index_stats())):
+        samples.extend(_index_samples(index_name, stats))
+    return samples
+
+def _index_samples(index_name: str, stats: IndexStats) -> List[Sample]:
+    labels = (('index', index_name),)
+    return [Sample('index_instances', stats.indexes, labels), Sample('index_entries', stats.entries, labels)]
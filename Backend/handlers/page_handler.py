@@ -1,25 +1,72 @@
-import os
+import asyncio
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Annotated
+from typing import Annotated, List, Optional
 
-from fastapi import HTTPException, status, Depends
+from fastapi import HTTPException, status, Depends, Response
 
 from ..models.page_model import (
     PageMetaData,
     PageWithContentWithoutMetaData,
     NamedPage,
     PageWithContent,
+    PageBatch,
     PageRenameInfo,
     PageReferenceToRename,
+    PagePatch,
+    PageVersion,
 )
-from ..utilities.page_utils import rename_page_references_in_str
+from ..utilities.page_utils import (
+    apply_page_patch,
+    compute_page_version,
+    normalize_line_endings,
+)
+from ..utilities.index_utils import on_page_written, get_reference_index
+from ..utilities.cache_utils import page_cache
+from ..utilities.write_queue_utils import page_write_queue, page_locks
+from ..utilities.page_metadata_utils import get_page_metadata_index
+from ..utilities.user_repo_utils import UserRepository
+from ..utilities.rename_utils import PageRenameTransaction, RenameFailedError
+from ..utilities.executor_utils import run_io
+from ..utilities.etag_utils import ETAG_CACHE_CONTROL, format_etag, etag_matches
+
+# Each name is a read of its own on the IO executor, so a batch can't be any size
+PAGE_BATCH_MAX_NAMES = 100
+
+def handle_get_all_pages(page_path: Path,
+                         sort: str = 'name',
+                         descending: bool = False,
+                         limit: Optional[int] = None,
+                         cursor: Optional[str] = None,
+                         since: Optional[datetime] = None,
+                         response: Optional[Response] = None,
+                         if_none_match: Optional[str] = None,
+                         repository: Optional[UserRepository] = None) -> List[PageMetaData]:
+    '''## List the Pages in `page_path` (see `PageMetadataIndex.list_pages`)
+    When there are more Pages than `limit`, the cursor for the next ones is sent back in the
+    `X-Next-Cursor` header of `response`, along with an `ETag` for the listing. Raises a `304` if
+    that matches `if_none_match` (the listing the client already has is still current).'''
+    page_write_queue.flush_under(page_path) # so `last_modified` is up to date
+    index = get_page_metadata_index(page_path) if repository is None else repository.page_metadata_index
+    try:
+        listing = index.list_pages(sort, descending, limit, cursor,
+                                                                None if since is None else since.timestamp())
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    headers = {'ETag': format_etag(listing.compute_version()), 'Cache-Control': ETAG_CACHE_CONTROL}
+    if listing.next_cursor is not None:
+        headers['X-Next-Cursor'] = listing.next_cursor
+    if etag_matches(if_none_match, headers['ETag']):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if response is not None:
+        response.headers.update(headers)
 
-def handle_get_all_pages(page_path: Path):
-    # TODO add file metadata implementation
-    file_names = os.listdir(str(page_path))
     pages = []
-    for file_name in file_names:
-        page = PageMetaData(name=file_name.replace('.md', ''), creation='n/a', last_modified='n/a')
+    for page_file in listing.pages:
+        page = PageMetaData(name=page_file.name,
+                            creation=_format_timestamp(page_file.creation),
+                            last_modified=_format_timestamp(page_file.last_modified),
+                            size=page_file.size)
         pages.append(page)
     return pages
 
@@ -28,47 +75,123 @@ def handle_new_page(page_path: Path, page_info: NamedPage):
     if new_file_path.exists():
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail='File already exists.')
     open(str(new_file_path), 'a').close() # TODO find a better way to create an empty file
+    on_page_written(new_file_path)
     return True
 
-def handle_get_page_by_name(page_path: Path, page_name: str):
-    full_path = page_path / (page_name + '.md')
-    if not full_path.exists():
+def handle_get_page_by_name(page_path: Path, page_name: str, response: Optional[Response] = None, if_none_match: Optional[str] = None):
+    '''## Content of a Page, along with its version
+    The version is also sent back as the `ETag` header of `response`. Raises a `304` if that
+    matches `if_none_match` (the content the client already has is still current).'''
+    try:
+        page = _read_page(page_path, page_name)
+    except FileNotFoundError:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='File not found')
+    headers = {'ETag': format_etag(page.version), 'Cache-Control': ETAG_CACHE_CONTROL}
+    if etag_matches(if_none_match, headers['ETag']):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if response is not None:
+        response.headers.update(headers)
+    return page
+
+async def handle_get_pages_by_name(page_path: Path, page_names: List[str]) -> PageBatch:
+    '''## Several Pages with their content, read concurrently on the IO executor
+    Pages that don't exist, can't be read or whose names aren't plain Page names (e.g. a path
+    leading out of `page_path`) are listed in `missing` instead of failing the whole batch. Raises
+    a `413` for more than `PAGE_BATCH_MAX_NAMES` names.'''
+    if len(page_names) > PAGE_BATCH_MAX_NAMES:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f'At most {PAGE_BATCH_MAX_NAMES} Pages can be asked for at once')
+    page_names = list(dict.fromkeys(page_names)) # each Page once, in the order first asked for
+    pages = await asyncio.gather(*(run_io(_read_page_if_exists, page_path, page_name) for page_name in page_names))
+    return PageBatch(pages=[page for page in pages if page is not None],
+                     missing=[page_name for page_name, page in zip(page_names, pages) if page is None])
+
+def handle_update_page(page_path: Path, page_info: PageWithContentWithoutMetaData, response: Optional[Response] = None, if_match: Optional[str] = None):
+    '''## Replace the content of a Page
+    With `if_match` (the `ETag` the client last got for the Page), a `412` is raised instead if
+    the Page was changed since. The `ETag` of the new content is sent back in `response`.'''
+    full_path = page_path / (page_info.name + '.md')
+    if not full_path.exists():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Page not found')
+    with page_locks.hold(full_path): # so no other save gets in between checking the version and submitting
+        if if_match is not None:
+            page_write_queue.flush(full_path)
+            _, version = page_cache.read_text_and_version(full_path)
+            if not etag_matches(if_match, format_etag(version), weak=False):
+                raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail='Page was modified since the given version')
+
+        page_write_queue.submit(full_path, page_info.content)
+    if response is not None:
+        # the version of the content as `/get` will read it back
+        response.headers['ETag'] = format_etag(compute_page_version(normalize_line_endings(page_info.content)))
+    return True
+
+def handle_patch_page(page_path: Path, patch: PagePatch) -> PageVersion:
+    full_path = page_path / (patch.name + '.md')
+    with page_locks.hold(full_path): # so no other save gets in between checking the version and submitting
+        page_write_queue.flush(full_path)
+        try:
+            content, version = page_cache.read_text_and_version(full_path)
+        except FileNotFoundError:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Page not found')
+        if version != patch.base_version:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail='Page was modified since the given base version')
 
-    with open(str(full_path), 'r') as f:
-        content = f.read()
+        try:
+            new_content = apply_page_patch(content, patch.operations)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+        page_write_queue.submit(full_path, new_content)
+    return PageVersion(name=patch.name, version=compute_page_version(normalize_line_endings(new_content)))
+
+def handle_page_rename(page_path: Path, rename_info: PageRenameInfo, repo_path: Optional[Path] = None, repository: Optional[UserRepository] = None):
+    '''## Rename a Page and update every reference to it
+    The Pages referencing it come from the reference index of `repo_path` (the user repository,
+    defaults to `page_path`, or the one of `repository`), along with any `references_to_update`
+    sent by the client.'''
+    repo_path = page_path if repo_path is None else repo_path
+    page_write_queue.flush_under(repo_path)
+
+    index = get_reference_index(repo_path) if repository is None else repository.reference_index
+    referencing_paths = set(index.sources_linking_to(rename_info.old_name))
+    referencing_paths.update(page_path / (reference.page_name + '.md') for reference in rename_info.references_to_update)
+
+    old_file_path = page_path / (rename_info.old_name + '.md')
+    new_file_path = page_path / (rename_info.new_name + '.md')
+    transaction = PageRenameTransaction(old_file_path, new_file_path, rename_info.old_name, rename_info.new_name)
+    try:
+        updated_paths = transaction.run(referencing_paths)
+    except FileNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Page not found')
+    except FileExistsError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail='A Page with the new name already exists')
+    except RenameFailedError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+    return {'msg': f'Updated {len(updated_paths)} reference(s) and changed {rename_info.old_name} to {rename_info.new_name}'}
+
+def _read_page(page_path: Path, page_name: str) -> PageWithContent:
+    full_path = page_path / (page_name + '.md')
+    page_write_queue.flush(full_path) # a save might still be waiting in the queue
+    content, version = page_cache.read_text_and_version(full_path)
     page = PageWithContent(
         name=page_name,
         creation='n/a',
         last_modified='n/a',
-        content=content
+        content=content,
+        version=version,
     )
     return page
 
-def handle_update_page(page_path: Path, page_info: PageWithContentWithoutMetaData):
-    full_path = page_path / (page_info.name + '.md')
-    if not full_path.exists():
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Page not found')
-
-    with open(str(full_path), 'w') as f:
-        f.write(page_info.content)
-    return True
+def _read_page_if_exists(page_path: Path, page_name: str) -> Optional[PageWithContent]:
+    # unlike a name in the URL path, one from a request body can be anything
+    if '/' in page_name or '\\' in page_name or '\0' in page_name:
+        return None
+    try:
+        return _read_page(page_path, page_name)
+    except (OSError, ValueError): # missing, or unreadable (e.g. too long a name, or not UTF-8)
+        return None
 
-def handle_page_rename(page_path: Path, rename_info: PageRenameInfo):
-    # Update the references to the source Page
-    for reference in rename_info.references_to_update:
-        # TODO run these operations in parallel
-        path = page_path / (reference.page_name + '.md') # TODO handle folders - wayyyyy later down the road
-        with open(path, 'r') as f:
-            content = f.read()
-        replaced_references = rename_page_references_in_str(rename_info.old_name, rename_info.new_name, content)
-        if replaced_references != content: # Only write to the file if something changed - prevents weird file metadata changes
-            with open(path, 'w') as f:
-                f.write(replaced_references)
-
-    # Rename the source Page file
-    old_file_name = f'{page_path / rename_info.old_name}.md'
-    new_file_name = f'{page_path / rename_info.new_name}.md'
-    os.rename(old_file_name, new_file_name) # TODO should we throw a specific error if this fails?
-
-    return {'msg': f'Updated {len(rename_info.references_to_update)} reference(s) and changed {rename_info.old_name} to {rename_info.new_name}'}
+def _format_timestamp(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat()
@@ -1,3 +1,6 @@
+import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from starlette.responses import RedirectResponse
@@ -5,14 +8,49 @@ from starlette.responses import RedirectResponse
 from .routers.page_router import router as page_router_obj
 from .routers.meta_router import router as meta_router_obj
 from .routers.auth_router import router as auth_router_obj
+from .routers.metrics_router import router as metrics_router_obj
 
+from .config import (
+    set_block_search_db_path,
+    set_reference_scan_workers,
+    set_save_coalesce_window,
+    set_password_hash_workers,
+    set_watch_repositories,
+    DEFAULT_BLOCK_SEARCH_DB_PATH,
+)
 from .utilities.db_utils import init_users_db
+from .utilities.parallel_utils import shutdown_scan_pool
+from .utilities.write_queue_utils import page_write_queue
+from .utilities.password_pool_utils import password_hashing_pool
+from .utilities.executor_utils import shutdown_executors
+from .utilities.metrics_utils import MetricsMiddleware
+from .utilities.watch_utils import stop_repo_watchers
+from .utilities.user_repo_utils import start_user_repository_evictor, stop_user_repository_evictor
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_user_repository_evictor()
+    yield
+    stop_user_repository_evictor()
+    stop_repo_watchers()
+    shutdown_executors()
+    page_write_queue.shutdown() # write out any saves still waiting in the queue
+    shutdown_scan_pool()
+    password_hashing_pool.shutdown()
 
 init_users_db()
-app = FastAPI()
+if os.environ.get('ELEGANT_NOTES_BLOCK_SEARCH_INDEX') == '1': # opt-in, Block search scans the Pages otherwise
+    set_block_search_db_path(DEFAULT_BLOCK_SEARCH_DB_PATH)
+set_reference_scan_workers(os.cpu_count() or 1)
+set_save_coalesce_window(0.5) # the editors save at most every 500ms while typing
+set_password_hash_workers(max(1, (os.cpu_count() or 1) // 2)) # leave the other half for everything else
+set_watch_repositories(True)
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
 app.include_router(page_router_obj)
 app.include_router(meta_router_obj)
 app.include_router(auth_router_obj)
+app.include_router(metrics_router_obj)
 
 # to fix some frustrations
 @app.router.get('/page-create')
@@ -19,12 +19,20 @@ class PageLinkage(BaseModel):
     backlinks: List[BackLink]
     block_refs: List[BlockRef]
 
+class StreamedReference(BaseModel):
+    '''A single line of a streamed `PageLinkage`: either a backlink or a Block reference'''
+    backlink: Optional[BackLink] = None
+    block_ref: Optional[BlockRef] = None
+
 class ReferencesRetrievalRequest(BaseModel):
     page_name: str
     block_ids: List[str]
 
 class ReferenceSearchQuery(BaseModel):
     query: str
+    limit: Optional[int] = None
+    offset: int = 0
+    fuzzy: bool = False # Page search only
 
 class BlockSearchResult(BaseModel):
     block_id: Optional[str]
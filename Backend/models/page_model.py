@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Literal, Optional
 
 from pydantic import BaseModel
 
@@ -8,9 +8,15 @@ class NamedPage(BaseModel):
 class PageMetaData(NamedPage):
     creation: str
     last_modified: str
+    size: Optional[int] = None # in bytes
 
 class PageWithContent(PageMetaData):
     content: str
+    version: Optional[str] = None
+
+class PageBatch(BaseModel):
+    pages: List[PageWithContent] # in the order they were asked for
+    missing: List[str] = [] # names of the Pages that don't exist
 
 class PageWithContentWithoutMetaData(NamedPage):
     content: str
@@ -21,4 +27,26 @@ class PageReferenceToRename(BaseModel):
 class PageRenameInfo(BaseModel):
     old_name: str
     new_name: str
-    references_to_update: List[PageReferenceToRename]
+    references_to_update: List[PageReferenceToRename] = [] # found by the server as well
+
+class PagePatchOperation(BaseModel):
+    '''## A single Block-level change to a Page
+    Line numbers are 1-based and refer to the Page after any previous operations in the same patch
+    (lines are the Page content split on newlines, without the newline characters):
+      - `replace`: lines `start`..`end` (inclusive) become `lines`
+      - `insert`: `lines` are inserted before line `start` (one past the last line appends)
+      - `delete`: lines `start`..`end` are removed
+      - `move`: lines `start`..`end` (e.g. a Block with its children) are moved before line `to`
+    '''
+    op: Literal['replace', 'insert', 'delete', 'move']
+    start: int
+    end: Optional[int] = None
+    lines: List[str] = []
+    to: Optional[int] = None
+
+class PagePatch(NamedPage):
+    base_version: str # `version` of the Page content the operations were made against
+    operations: List[PagePatchOperation]
+
+class PageVersion(NamedPage):
+    version: str
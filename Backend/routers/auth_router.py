@@ -4,7 +4,7 @@ from fastapi import APIRouter, Depends
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 
-from ..database.db_api import get_db
+from ..database.db_api import get_db, get_login_db
 from ..utilities.db_utils import get_current_user
 from ..models.user_model import (
     User,
@@ -26,14 +26,14 @@ router = APIRouter(
 )
 
 @router.post('/register', response_model=UserTokens)
-def register_user(user_info: User, db: Session = Depends(get_db)):
+async def register_user(user_info: User, db: Session = Depends(get_db)):
     # TODO add documentation for SwaggerUI/in general
-    return handle_user_registration(user_info, db)
+    return await handle_user_registration(user_info, db)
 
 @router.post('/login', response_model=UserTokens)
-def login_user(login_info: UserCredentials, db: Session = Depends(get_db)):
+async def login_user(login_info: UserCredentials, db = Depends(get_login_db)):
     # TODO add documentation for SwaggerUI/in general
-    return handle_user_login(login_info, db)
+    return await handle_user_login(login_info, db)
 
 @router.post('/logout', response_model=UserLogOutInfo)
 def log_user_out(logout_info: UserTokens, db: Session = Depends(get_db)) -> UserLogOutInfo:
@@ -53,9 +53,9 @@ def test_auth_token(current_user: Annotated[User, Depends(get_current_user)]):
     return {'detail': 'User is valid'}
 
 @router.post('/token')
-def log_user_in(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)) -> UserTokens:
+async def log_user_in(form_data: OAuth2PasswordRequestForm = Depends(), db = Depends(get_login_db)) -> UserTokens:
     info = UserCredentials(username=form_data.username, password=form_data.password)
-    return handle_user_login(info, db)
+    return await handle_user_login(info, db)
 
 @router.get('/refresh')
 def refresh_jwt_token(current_user: Annotated[User, Depends(get_current_user)], db: Session = Depends(get_db)):
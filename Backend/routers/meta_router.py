@@ -1,16 +1,23 @@
-from typing import Annotated
+from typing import Annotated, AsyncIterator, List, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 
 from ..models.user_model import User
 from ..utilities.db_utils import get_current_user
-from ..utilities.user_repo_utils import get_user_repo_path
-from ..models.meta_model import ReferencesRetrievalRequest, ReferenceSearchQuery, BlockSearchResult
+from ..utilities.user_repo_utils import get_user_repository
+from ..utilities.executor_utils import run_io, run_scan, iterate_in_scan_executor
+from ..utilities.json_utils import JSONBytesResponse
+from ..models.meta_model import ReferencesRetrievalRequest, ReferenceSearchQuery, BlockSearchResult, PageLinkage
 from ..handlers.meta_handler import (
-    handle_get_all_references,
+    handle_get_all_references_json,
+    handle_get_references_batch_json,
     handle_page_search,
-    handle_block_search,
+    handle_block_search_json,
     handle_block_id_assignment,
+    iter_references,
+    iter_block_search,
 )
 
 router = APIRouter(
@@ -19,22 +26,52 @@ router = APIRouter(
     responses={404: {'description': 'Not found'}},
 )
 
-@router.post('/references')
-def get_all_references(request: ReferencesRetrievalRequest, current_user: Annotated[User, Depends(get_current_user)]):
-    user_repo_path = get_user_repo_path(current_user)
-    return handle_get_all_references(request, user_repo_path)
+@router.post('/references', response_model=PageLinkage)
+async def get_all_references(request: ReferencesRetrievalRequest,
+                             current_user: Annotated[User, Depends(get_current_user)],
+                             stream: bool = False,
+                             limit: Optional[int] = Query(default=None, ge=0)):
+    '''## Find the backlinks to a Page and the references to its Blocks
+    With `stream`, the results are sent as they are found: one `StreamedReference` per line
+    (NDJSON), at most `limit` of them.
+    '''
+    repository = get_user_repository(current_user)
+    if stream:
+        references = await run_scan(iter_references, request, repository.repo_path, limit, repository)
+        return _stream_ndjson(iterate_in_scan_executor(references))
+    return JSONBytesResponse(await run_scan(handle_get_all_references_json, request, repository.repo_path, repository))
+
+@router.post('/references/batch', response_model=List[PageLinkage])
+async def get_references_batch(requests: List[ReferencesRetrievalRequest], current_user: Annotated[User, Depends(get_current_user)]):
+    '''## `/references` for several Pages at once, in the order asked for
+    The files are scanned once for all of them.
+    '''
+    repository = get_user_repository(current_user)
+    return JSONBytesResponse(await run_scan(handle_get_references_batch_json, requests, repository.repo_path, repository))
 
 @router.post('/search-page')
-def get_page_results_by_query(search_request: ReferenceSearchQuery, current_user: Annotated[User, Depends(get_current_user)]):
-    user_repo_path = get_user_repo_path(current_user)
-    return handle_page_search(search_request.query, user_repo_path)
+async def get_page_results_by_query(search_request: ReferenceSearchQuery, current_user: Annotated[User, Depends(get_current_user)]):
+    repository = get_user_repository(current_user)
+    return await run_io(handle_page_search, search_request.query, repository.repo_path, search_request.limit, search_request.fuzzy, repository)
 
-@router.post('/search-block')
-def get_block_results_by_text(search_request: ReferenceSearchQuery, current_user: Annotated[User, Depends(get_current_user)]):
-    user_repo_path = get_user_repo_path(current_user)
-    return handle_block_search(search_request.query, user_repo_path)
+@router.post('/search-block', response_model=List[BlockSearchResult])
+async def get_block_results_by_text(search_request: ReferenceSearchQuery, current_user: Annotated[User, Depends(get_current_user)], stream: bool = False):
+    '''## Find Blocks containing some text
+    With `stream`, the results are sent as they are found: one `BlockSearchResult` per line (NDJSON).
+    '''
+    repository = get_user_repository(current_user)
+    if stream:
+        results = await run_scan(iter_block_search, search_request.query, repository.repo_path, search_request.limit, search_request.offset, repository)
+        return _stream_ndjson(iterate_in_scan_executor(results))
+    return JSONBytesResponse(await run_scan(handle_block_search_json, search_request.query, repository.repo_path, search_request.limit, search_request.offset, repository))
 
 @router.post('/assign-block-id')
-def assign_id_to_block_search_result(search_result: BlockSearchResult, current_user: Annotated[User, Depends(get_current_user)]):
-    user_repo_path = get_user_repo_path(current_user)
-    return handle_block_id_assignment(search_result, user_repo_path)
+async def assign_id_to_block_search_result(search_result: BlockSearchResult, current_user: Annotated[User, Depends(get_current_user)]):
+    repository = get_user_repository(current_user)
+    return await run_io(handle_block_id_assignment, search_result, repository.repo_path, repository)
+
+def _stream_ndjson(records: AsyncIterator[BaseModel]) -> StreamingResponse:
+    async def lines():
+        async for record in records:
+            yield record.model_dump_json() + '\n'
+    return StreamingResponse(lines(), media_type='application/x-ndjson')
@@ -0,0 +1,15 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from ..utilities.executor_utils import run_io
+from ..handlers.metrics_handler import handle_get_metrics
+
+router = APIRouter(
+    tags=['metrics'],
+)
+
+@router.get('/metrics', response_class=PlainTextResponse)
+async def get_metrics():
+    '''## Request latencies, cache hit rates, index sizes and more, for Prometheus to scrape'''
+    # asking an index for its size waits for any build of it in progress
+    return PlainTextResponse(await run_io(handle_get_metrics), media_type='text/plain; version=0.0.4')
@@ -1,22 +1,23 @@
-from typing import Annotated
+from datetime import datetime
+from typing import Annotated, List, Literal, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Body, Depends, Header, Query, Response
 
 from ..config import get_pages_path
-from ..models.page_model import NamedPage, PageWithContentWithoutMetaData, PageRenameInfo
+from ..models.page_model import NamedPage, PageBatch, PageWithContentWithoutMetaData, PageRenameInfo, PagePatch, PageVersion
 from ..handlers.page_handler import (
     handle_get_all_pages,
     handle_get_page_by_name,
+    handle_get_pages_by_name,
     handle_new_page,
     handle_update_page,
     handle_page_rename,
+    handle_patch_page,
 )
 from ..models.user_model import User
 from ..utilities.db_utils import get_current_user
-from ..utilities.user_repo_utils import (
-    get_user_repo_path, 
-    get_user_pages_path,
-)
+from ..utilities.executor_utils import run_io, run_scan
+from ..utilities.user_repo_utils import get_user_repository
 
 router = APIRouter(
     prefix='/page',
@@ -25,27 +26,72 @@ router = APIRouter(
 )
 
 @router.get('/all')
-def get_all_pages(current_user: Annotated[User, Depends(get_current_user)]):
-    path = get_user_pages_path(current_user)
-    print(str(path))
-    return handle_get_all_pages(path)
+async def get_all_pages(current_user: Annotated[User, Depends(get_current_user)],
+                        response: Response,
+                        sort: Literal['name', 'last_modified', 'creation', 'size'] = 'name',
+                        descending: bool = False,
+                        limit: Optional[int] = Query(default=None, ge=1),
+                        cursor: Optional[str] = None,
+                        since: Optional[datetime] = None,
+                        if_none_match: Annotated[Optional[str], Header()] = None):
+    '''## List the user's Pages
+    Pages are ordered by `sort` (ties by name). With `limit`, the `X-Next-Cursor` response header
+    holds the `cursor` for the next Pages (missing on the last ones). With `since`, only Pages
+    modified after it are listed. Sending the `ETag` of a previous listing as `If-None-Match`
+    gets a `304` without a body if it's still the same.
+    '''
+    repository = get_user_repository(current_user)
+    return await run_io(handle_get_all_pages, repository.pages_path, sort, descending, limit, cursor, since, response, if_none_match, repository)
 
 @router.post('/create')
-def new_page(page_info: NamedPage, current_user: Annotated[User, Depends(get_current_user)]):
-    path = get_user_pages_path(current_user)
-    return handle_new_page(path, page_info)
+async def new_page(page_info: NamedPage, current_user: Annotated[User, Depends(get_current_user)]):
+    path = get_user_repository(current_user).pages_path
+    return await run_io(handle_new_page, path, page_info)
 
 @router.get('/get/{page_name}')
-def get_page_by_name(page_name: str, current_user: Annotated[User, Depends(get_current_user)]):
-    path = get_user_pages_path(current_user)
-    return handle_get_page_by_name(path, page_name)
+async def get_page_by_name(page_name: str,
+                           current_user: Annotated[User, Depends(get_current_user)],
+                           response: Response,
+                           if_none_match: Annotated[Optional[str], Header()] = None):
+    '''## Get a Page with its content
+    The `ETag` response header identifies the content; sending it back as `If-None-Match` gets a
+    `304` without a body as long as the Page didn't change.
+    '''
+    path = get_user_repository(current_user).pages_path
+    return await run_io(handle_get_page_by_name, path, page_name, response, if_none_match)
+
+@router.post('/batch-get', response_model=PageBatch)
+async def get_pages_by_name(page_names: Annotated[List[str], Body()], current_user: Annotated[User, Depends(get_current_user)]):
+    '''## Get several Pages with their content at once
+    Saves a round trip per Page, e.g. for the Pages linking to the one being opened. Names of Pages
+    that don't exist (or aren't valid Page names) come back in `missing`. At most
+    `PAGE_BATCH_MAX_NAMES` names per request, a `413` otherwise.
+    '''
+    path = get_user_repository(current_user).pages_path
+    return await handle_get_pages_by_name(path, page_names)
 
 @router.post('/update')
-def update_page(page_info: PageWithContentWithoutMetaData, current_user: Annotated[User, Depends(get_current_user)]):
-    path = get_user_pages_path(current_user)
-    return handle_update_page(path, page_info)
+async def update_page(page_info: PageWithContentWithoutMetaData,
+                      current_user: Annotated[User, Depends(get_current_user)],
+                      response: Response,
+                      if_match: Annotated[Optional[str], Header()] = None):
+    '''## Replace the content of a Page
+    With `If-Match` (the `ETag` from `/get`), the save fails with a `412` if the Page changed in
+    the meantime. The `ETag` of the new content is sent back.
+    '''
+    path = get_user_repository(current_user).pages_path
+    return await run_io(handle_update_page, path, page_info, response, if_match)
+
+@router.post('/patch', response_model=PageVersion)
+async def patch_page(patch: PagePatch, current_user: Annotated[User, Depends(get_current_user)]):
+    '''## Apply Block-level changes to a Page
+    Cheaper than `/update` for large Pages since only the changed lines are sent. Fails with a 409
+    if the Page changed since `base_version` (the `version` from `/get` or a previous patch).
+    '''
+    path = get_user_repository(current_user).pages_path
+    return await run_io(handle_patch_page, path, patch)
 
 @router.post('/rename')
-def rename_page(rename_meta: PageRenameInfo, current_user: Annotated[User, Depends(get_current_user)]):
-    path = get_user_pages_path(current_user)
-    return handle_page_rename(path, rename_meta)
+async def rename_page(rename_meta: PageRenameInfo, current_user: Annotated[User, Depends(get_current_user)]):
+    repository = get_user_repository(current_user)
+    return await run_scan(handle_page_rename, repository.pages_path, rename_meta, repository.repo_path, repository)
@@ -0,0 +1,121 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, NamedTuple, Optional, Set
+
+from ..models.user_model import User
+
+AUTH_CACHE_MAX_ENTRIES = 1024
+# Upper bound on how long a User stays cached; changes made to it outside of the API (straight
+#   in the database) show up after at most this long
+AUTH_CACHE_TTL_SECONDS = 5 * 60
+
+class AuthCacheStats(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    max_entries: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+class _CachedToken:
+    __slots__ = ('user', 'expires_at')
+
+    def __init__(self, user: User, expires_at: float):
+        self.user: User = user
+        self.expires_at: float = expires_at
+
+class AuthCache:
+    '''## TTL-bounded LRU cache of verified access tokens and the Users they belong to
+    Lets authenticated requests skip the token signature check and the database lookup of the User.
+    An entry is dropped once the token expires or the TTL ends (whichever comes first), when the
+    token is revoked (logging out) and when the User changes (`invalidate_user`).
+    Revoked tokens are remembered until they expire, so they can't be used to log back in.'''
+    def __init__(self,
+                 max_entries: int = AUTH_CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = AUTH_CACHE_TTL_SECONDS,
+                 clock: Callable[[], float] = time.time):
+        self._max_entries: int = max_entries
+        self._ttl_seconds: float = ttl_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, _CachedToken]' = OrderedDict()
+        self._tokens_by_username: Dict[str, Set[str]] = {}
+        self._revoked: Dict[str, float] = {} # token -> when it expires
+        self._hits: int = 0
+        self._misses: int = 0
+        self._evictions: int = 0
+
+    def get(self, token: str) -> Optional[User]:
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None and entry.expires_at > now:
+                self._entries.move_to_end(token)
+                self._hits += 1
+                return entry.user
+            if entry is not None:
+                self._remove(token)
+            self._misses += 1
+            return None
+
+    def put(self, token: str, user: User, token_expiration: float) -> None:
+        '''## Cache the User of a verified token
+        `token_expiration` is the token's `exp` claim (seconds since the epoch)'''
+        expires_at = min(token_expiration, self._clock() + self._ttl_seconds)
+        with self._lock:
+            if self._max_entries <= 0 or token in self._revoked:
+                return
+            self._remove(token)
+            self._entries[token] = _CachedToken(user, expires_at)
+            self._tokens_by_username.setdefault(user.username, set()).add(token)
+            while len(self._entries) > self._max_entries:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+
+    def is_revoked(self, token: str) -> bool:
+        with self._lock:
+            return token in self._revoked
+
+    def revoke(self, token: str, token_expiration: float) -> None:
+        now = self._clock()
+        with self._lock:
+            self._remove(token)
+            # forget the tokens that expired on their own by now, so this doesn't grow forever
+            for expired_token in [t for t, expiration in self._revoked.items() if expiration <= now]:
+                del self._revoked[expired_token]
+            if token_expiration > now:
+                self._revoked[token] = token_expiration
+
+    def invalidate_user(self, username: str) -> None:
+        with self._lock:
+            for token in list(self._tokens_by_username.get(username, ())):
+                self._remove(token)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_username.clear()
+            self._revoked.clear()
+
+    def stats(self) -> AuthCacheStats:
+        with self._lock:
+            return AuthCacheStats(self._hits, self._misses, self._evictions, len(self._entries), self._max_entries)
+
+    def _remove(self, token: str) -> None:
+        # caller holds the lock
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        tokens = self._tokens_by_username.get(entry.user.username)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_username[entry.user.username]
+
+# shared by every authenticated request in this process
+auth_cache = AuthCache()
@@ -1,17 +1,25 @@
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Union
 
 from passlib.context import CryptContext
 import jwt
 
+from ..config import get_bcrypt_rounds
+
 SECRET_KEY = 'yup, change this to something logical like pulling from an env variable'
 TOKEN_EXPIRATION_MINUTES = 30
 ENCRYPTION_ALGORITHM = 'HS256'
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+@lru_cache
+def _get_pwd_context(rounds: int) -> CryptContext:
+    return pwd_context.copy(bcrypt__rounds=rounds)
+
 def hash_str(plain_text: str) -> str:
-    return pwd_context.hash(plain_text)
+    '''**NOTE:** slow on purpose (bcrypt) - use `password_pool_utils` in request handlers'''
+    return _get_pwd_context(get_bcrypt_rounds()).hash(plain_text)
 
 def hash_equals_plaintext(hash: str, plaintext: str) -> bool:
     return pwd_context.verify(plaintext, hash)
@@ -23,11 +31,13 @@ def create_access_token(data: dict) -> str:
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ENCRYPTION_ALGORITHM)
     return encoded_jwt
 
-def verify_access_token(token: str) -> Union[None, str]:
-    username = None
+def decode_access_token(token: str) -> Union[None, dict]:
+    '''Claims of a token, or `None` if the token is invalid (bad signature, expired, ...)'''
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ENCRYPTION_ALGORITHM])
-        username = payload.get('sub')
+        return jwt.decode(token, SECRET_KEY, algorithms=[ENCRYPTION_ALGORITHM])
     except jwt.PyJWTError:
-        pass
-    return username
+        return None
+
+def verify_access_token(token: str) -> Union[None, str]:
+    payload = decode_access_token(token)
+    return None if payload is None else payload.get('sub')
@@ -0,0 +1,114 @@
+import os
+from typing import List, Optional, Tuple
+from pathlib import Path
+
+from .metrics_utils import metrics
+
+# Besides `\n`, `str.splitlines` also breaks lines at these (the others are outside ASCII, as UTF-8)
+ASCII_LINE_BREAKS = b'\r\x0b\x0c\x1c\x1d\x1e'
+OTHER_LINE_BREAKS = (b'\xc2\x85', b'\xe2\x80\xa8', b'\xe2\x80\xa9')
+# The only characters outside ASCII that `str.lower` turns into ASCII ('İ' into 'i̇', the Kelvin sign into 'k')
+LOWERED_TO_ASCII = (b'\xc4\xb0', b'\xe2\x84\xaa')
+# Deleting every other byte is the quickest way to tell whether any of `ASCII_LINE_BREAKS` is there
+_ALL_BUT_ASCII_LINE_BREAKS = bytes(byte for byte in range(256) if byte not in ASCII_LINE_BREAKS)
+
+BLOCK_ID_MARKER = b'id::'
+
+# Once at least this many lines matched, and one in `DENSE_MATCH_RATIO` of the lines so far, the
+#   rest of the Page is decoded and searched line by line instead (cheaper when almost every line matches)
+DENSE_MATCH_MIN_COUNT = 64
+DENSE_MATCH_RATIO = 4
+
+BlockLine = Tuple[int, str, Optional[str]] # (line number, line, Block ID)
+
+def find_block_lines(query: str, page_path: Path) -> List[BlockLine]:
+    '''## Lines of a Page containing `query` (case-insensitive), with the Block ID on the lines after them
+    The same as checking `query.lower() in line.lower()` for every line of the decoded Page, but done
+    on the raw bytes with a single lowered copy to search in, so only matching lines and their
+    `id::` lines get decoded. (Memory-mapping large Pages wouldn't save anything: the lowered copy
+    has to be made of the whole Page either way.)
+    Where bytes and text could disagree (line breaks other than `\\n`, the two characters of
+    `LOWERED_TO_ASCII`, or a query outside ASCII on a Page that isn't), the Page is searched as text.
+    Raises `FileNotFoundError` if the Page does not exist.'''
+    query = query.lower()
+    fd = os.open(str(page_path), os.O_RDONLY)
+    try:
+        size = os.fstat(fd).st_size
+        metrics.increment('page_files_read_total', reader='block_search_scan')
+        metrics.increment('page_bytes_read_total', size, reader='block_search_scan')
+        return _search_bytes(query, _read_all(fd, size))
+    finally:
+        os.close(fd)
+
+def _read_all(fd: int, size: int) -> bytes:
+    content = os.read(fd, size)
+    while len(content) >= size: # grew since checking its size (a short read is the end already)
+        chunk = os.read(fd, size)
+        if not chunk:
+            break
+        content += chunk
+    return content
+
+def _search_bytes(query: str, content: bytes) -> List[BlockLine]:
+    lowered = content.lower() # ASCII letters only
+    is_ascii = lowered.isascii()
+    if not query.isascii():
+        if is_ascii:
+            return [] # lowering ASCII text never results in anything else
+        return _search_text(query, str(content, 'utf-8'))
+    if lowered.translate(None, _ALL_BUT_ASCII_LINE_BREAKS) or (
+            not is_ascii and any(marker in lowered for marker in OTHER_LINE_BREAKS + LOWERED_TO_ASCII)):
+        return _search_text(query, str(content, 'utf-8'))
+
+    # From here on, an (ASCII) query is in a lowered line exactly where it is in its lowered bytes
+    if '\n' in query:
+        return [] # would match across lines
+    pattern = query.encode()
+    has_block_ids = content.find(BLOCK_ID_MARKER) >= 0
+    found: List[BlockLine] = []
+    size = len(lowered)
+    line_number = 1
+    counted_until = 0
+    position = 0 # always at the start of a line
+    while position < size:
+        hit = lowered.find(pattern, position)
+        if hit < 0:
+            break
+        start = lowered.rfind(b'\n', 0, hit) + 1
+        end = lowered.find(b'\n', hit)
+        if end < 0:
+            end = size
+        line_number += lowered.count(b'\n', counted_until, start)
+        counted_until = start
+        position = end + 1
+
+        # `id::` lines right after a match belong to it, unless they match themselves
+        block_id = None
+        while has_block_ids and position < size:
+            next_end = lowered.find(b'\n', position)
+            if next_end < 0:
+                next_end = size
+            if content.find(BLOCK_ID_MARKER, position, next_end) < 0 or lowered.find(pattern, position, next_end) >= 0:
+                break
+            block_id = str(content[position:next_end], 'utf-8').split('id::')[1].strip()
+            position = next_end + 1
+        found.append((line_number, str(content[start:end], 'utf-8'), block_id))
+
+        if len(found) >= DENSE_MATCH_MIN_COUNT and len(found) * DENSE_MATCH_RATIO > line_number and position < size:
+            line_number += lowered.count(b'\n', counted_until, position)
+            _search_text(query, str(content[position:], 'utf-8'), line_number, found)
+            break
+    return found
+
+def _search_text(query: str, content: str, first_line_number: int = 1, found: Optional[List[BlockLine]] = None) -> List[BlockLine]:
+    found = [] if found is None else found
+    last_line_matched = False
+    for line_number, line in enumerate(content.splitlines(), start=first_line_number):
+        if query in line.lower():
+            found.append((line_number, line, None))
+            last_line_matched = True
+        elif 'id::' in line and last_line_matched:
+            found[-1] = (found[-1][0], found[-1][1], line.split('id::')[1].strip())
+        else:
+            last_line_matched = False
+    return found
@@ -0,0 +1,135 @@
+import io
+import os
+import threading
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional, Tuple
+from pathlib import Path
+
+from .page_utils import compute_page_version
+from .metrics_utils import metrics
+
+PAGE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+class CacheStats(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    size_bytes: int
+    max_bytes: int
+
+class _CachedPage:
+    __slots__ = ('file_stamp', 'text', 'lines', 'content_version', 'size_bytes')
+
+    def __init__(self, file_stamp: Tuple[int, int], text: str):
+        self.file_stamp: Tuple[int, int] = file_stamp
+        self.text: str = text
+        self.lines: Optional[List[str]] = None
+        self.content_version: Optional[str] = None
+        self.size_bytes: int = file_stamp[1]
+
+class PageCache:
+    '''## Size-bounded LRU cache of Page file contents
+    Entries are validated against the file's modification time and size on every read, so edits
+    made outside of the API are picked up as well. Writes through the API also invalidate the
+    entry directly (see the hooks in `index_utils`), since two writes within the same mtime tick
+    would otherwise look identical.
+    The size bound is in bytes of cached content (the text, plus again as much for split lines).'''
+    def __init__(self, max_bytes: int = PAGE_CACHE_MAX_BYTES):
+        self._max_bytes: int = max_bytes
+        self._entries: 'OrderedDict[Path, _CachedPage]' = OrderedDict()
+        self._size_bytes: int = 0
+        self._lock = threading.Lock()
+        self._hits: int = 0
+        self._misses: int = 0
+        self._evictions: int = 0
+
+    def read_text(self, path: Path) -> str:
+        '''## Content of a Page file (like `open(path).read()`)
+        Raises `FileNotFoundError` if the file does not exist.'''
+        return self._get(path).text
+
+    def read_text_and_version(self, path: Path) -> Tuple[str, str]:
+        '''## Content of a Page file along with its version (see `page_utils.compute_page_version`)'''
+        entry = self._get(path)
+        if entry.content_version is None:
+            entry.content_version = compute_page_version(entry.text)
+        return entry.text, entry.content_version
+
+    def read_lines(self, path: Path) -> List[str]:
+        '''## Lines of a Page file, including line endings (like `open(path).readlines()`)
+        **NOTE:** the list is shared with other callers, so don't modify it'''
+        entry = self._get(path)
+        if entry.lines is None:
+            lines = io.StringIO(entry.text, newline='\n').readlines()
+            with self._lock:
+                if entry.lines is None:
+                    entry.lines = lines
+                    if self._entries.get(path) is entry:
+                        self._size_bytes += entry.size_bytes
+                        self._evict_if_needed()
+        return entry.lines
+
+    def invalidate(self, path: Path) -> None:
+        with self._lock:
+            entry = self._entries.pop(path, None)
+            if entry is not None:
+                self._size_bytes -= self._entry_size(entry)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size_bytes = 0
+
+    def set_max_bytes(self, max_bytes: int) -> None:
+        '''`0` turns caching off (reads still work, they just always go to disk)'''
+        with self._lock:
+            self._max_bytes = max_bytes
+            self._evict_if_needed()
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(self._hits, self._misses, self._evictions, len(self._entries), self._size_bytes, self._max_bytes)
+
+    def _get(self, path: Path) -> _CachedPage:
+        file_stamp = _file_stamp(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.file_stamp == file_stamp:
+                self._entries.move_to_end(path)
+                self._hits += 1
+                return entry
+            self._misses += 1
+
+        with open(str(path), 'r') as f:
+            text = f.read()
+        entry = _CachedPage(file_stamp, text)
+        metrics.increment('page_files_read_total', reader='page_cache')
+        metrics.increment('page_bytes_read_total', entry.size_bytes, reader='page_cache')
+        if _file_stamp(path) != file_stamp:
+            return entry # changed while reading; fine to return but not to keep
+        with self._lock:
+            old_entry = self._entries.pop(path, None)
+            if old_entry is not None:
+                self._size_bytes -= self._entry_size(old_entry)
+            if entry.size_bytes <= self._max_bytes:
+                self._entries[path] = entry
+                self._size_bytes += entry.size_bytes
+                self._evict_if_needed()
+        return entry
+
+    def _evict_if_needed(self) -> None:
+        while self._size_bytes > self._max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self._size_bytes -= self._entry_size(entry)
+            self._evictions += 1
+
+    def _entry_size(self, entry: _CachedPage) -> int:
+        return entry.size_bytes * (1 if entry.lines is None else 2)
+
+def _file_stamp(path: Path) -> Tuple[int, int]:
+    stat = os.stat(str(path))
+    return stat.st_mtime_ns, stat.st_size
+
+# shared by everything reading Page files in this process
+page_cache = PageCache()
@@ -1,6 +1,7 @@
-from typing import Union
+from typing import Optional, Union
 import uuid
 
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
@@ -10,7 +11,8 @@ from ..models.user_model import (
     User,
     DBUser,
 )
-from .auth_utils import hash_str, verify_access_token
+from .auth_utils import hash_str, decode_access_token
+from .auth_cache_utils import auth_cache
 from ..database.db_api import engine, get_db
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
@@ -19,18 +21,17 @@ def init_users_db():
     Base.metadata.create_all(bind=engine)
 
 def db_get_user_by_username(db: Session, username: str) -> Union[None, User]:
-    user: Union[None, User] = None
     user_from_db = db.query(DBUser).filter(DBUser.username == username).first()
-    if user_from_db is not None:
-        # do we need to share the ID field on the database here?
-        user = User(id=str(user_from_db.id),
-                    username=user_from_db.username,
-                    password=user_from_db.password,
-                    name=user_from_db.name)
-    return user
+    return _to_user(user_from_db)
 
-def db_add_user(db: Session, new_user: User) -> None:
-    hashed_password = hash_str(new_user.password)
+async def async_db_get_user_by_username(db, username: str) -> Union[None, User]:
+    '''Same as `db_get_user_by_username`, for an async session (see `db_api.get_login_db`)'''
+    result = await db.execute(select(DBUser).filter(DBUser.username == username))
+    return _to_user(result.scalars().first())
+
+def db_add_user(db: Session, new_user: User, hashed_password: Optional[str] = None) -> None:
+    if hashed_password is None:
+        hashed_password = hash_str(new_user.password)
     db_user: DBUser = DBUser(id=uuid.uuid4(),
                              username=new_user.username,
                              password=hashed_password,
@@ -39,10 +40,27 @@ def db_add_user(db: Session, new_user: User) -> None:
     db.commit()
     db.refresh(db_user)
     new_user.id = str(db_user.id)
+    auth_cache.invalidate_user(new_user.username)
+
+def _to_user(user_from_db: Union[None, DBUser]) -> Union[None, User]:
+    user: Union[None, User] = None
+    if user_from_db is not None:
+        # do we need to share the ID field on the database here?
+        user = User(id=str(user_from_db.id),
+                    username=user_from_db.username,
+                    password=user_from_db.password,
+                    name=user_from_db.name)
+    return user
 
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    username = verify_access_token(token)
-    if username is None:
+    # fast path: a token we've already verified (see `auth_cache_utils`)
+    user = auth_cache.get(token)
+    if user is not None:
+        return user
+
+    payload = decode_access_token(token)
+    username = None if payload is None else payload.get('sub')
+    if username is None or auth_cache.is_revoked(token):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials",
@@ -53,4 +71,5 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
     
+    auth_cache.put(token, user, payload.get('exp', float('inf')))
     return user
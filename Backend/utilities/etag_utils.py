@@ -0,0 +1,27 @@
+from typing import Optional
+
+# Responses with an ETag are only for the user who asked for them, and always checked with the
+#   server before being reused (which is cheap: a `304` without a body when nothing changed)
+ETAG_CACHE_CONTROL = 'private, no-cache'
+
+def format_etag(version: str) -> str:
+    '''## Strong entity tag (`"..."`) for a version (see `page_utils.compute_page_version`)'''
+    return f'"{version}"'
+
+def etag_matches(header: Optional[str], etag: str, weak: bool = True) -> bool:
+    '''## Whether an `If-None-Match` / `If-Match` header value matches `etag`
+    `If-None-Match` uses the weak comparison (a `W/` prefix is ignored), `If-Match` the strong one
+    (`weak=False`, weak tags never match). `*` matches any tag. No header matches nothing.'''
+    if header is None:
+        return False
+    for tag in header.split(','):
+        tag = tag.strip()
+        if tag == '*':
+            return True
+        if tag.startswith('W/'):
+            if not weak:
+                continue
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
@@ -0,0 +1,71 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Iterator, Optional, Tuple, TypeVar
+
+from ..config import get_io_executor_workers, get_scan_executor_workers
+
+T = TypeVar('T')
+
+IO_EXECUTOR = 'io'
+SCAN_EXECUTOR = 'scan'
+
+_executors: Dict[str, Tuple[ThreadPoolExecutor, int]] = {} # name -> (executor, worker count)
+_executors_lock = threading.Lock()
+
+def _get_executor(name: str, worker_count: int) -> ThreadPoolExecutor:
+    with _executors_lock:
+        executor, size = _executors.get(name, (None, 0))
+        if executor is None or size != worker_count:
+            if executor is not None:
+                executor.shutdown(wait=False) # anything already submitted still runs
+            executor = ThreadPoolExecutor(max_workers=worker_count, thread_name_prefix=f'{name}-executor')
+            _executors[name] = (executor, worker_count)
+        return executor
+
+async def run_io(func: Callable[..., T], *args, **kwargs) -> T:
+    '''## Run blocking Page file work (reading, writing) without blocking the event loop
+    On a thread pool of its own, so it never waits behind repository scans (`run_scan`).'''
+    return await _run(_get_executor(IO_EXECUTOR, get_io_executor_workers()), func, *args, **kwargs)
+
+async def run_scan(func: Callable[..., T], *args, **kwargs) -> T:
+    '''## Run work going through (a lot of) the repository, like reference lookups and Block search
+    The pool size limits how many scans run at once; the scans themselves may still spread the
+    parsing over worker processes (see `parallel_utils`).'''
+    return await _run(_get_executor(SCAN_EXECUTOR, get_scan_executor_workers()), func, *args, **kwargs)
+
+async def iterate_in_scan_executor(iterator: Iterator[T]) -> AsyncIterator[T]:
+    '''## Pull items from a blocking iterator (e.g. a repository scan) on the scan executor
+    One item at a time, so the first ones can be sent while the rest are still being found. When
+    the consumer stops early (a client disconnecting cancels the streaming response) the iterator
+    is closed and no more of it runs.'''
+    executor = _get_executor(SCAN_EXECUTOR, get_scan_executor_workers())
+    done = object()
+    pending: Optional[Future] = None
+    try:
+        while True:
+            pending = executor.submit(next, iterator, done)
+            item = await asyncio.wrap_future(pending)
+            if item is done:
+                return
+            yield item
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            if pending is not None and not pending.done():
+                # still busy getting the next item (can't close a running generator), so do it after
+                pending.add_done_callback(lambda _: close())
+            else:
+                close()
+
+async def _run(executor: ThreadPoolExecutor, func: Callable[..., T], *args, **kwargs) -> T:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+def shutdown_executors() -> None:
+    with _executors_lock:
+        executors = [executor for executor, _ in _executors.values()]
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown()
@@ -0,0 +1,238 @@
+import re
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional, Protocol, Sequence, Set, Tuple
+from pathlib import Path
+
+from .page_utils import extract_page_link_names
+from .parallel_utils import map_shards
+from .cache_utils import page_cache
+from .metrics_utils import metrics, IndexStats
+
+BLOCK_REF_PATTERN = re.compile(r'\(\(([^()]+)\)\)')
+BLOCK_ID_PROPERTY = 'id::'
+
+class BlockLocation(NamedTuple):
+    '''Where a Block with an ID is defined (the line before its `id::` property)'''
+    path: Path
+    line_number: int
+    block_text: str
+
+class ParsedPage(NamedTuple):
+    '''Everything the reference index needs to know about a single Page file'''
+    path: Path
+    targets: Set[str]
+    block_refs: Set[str]
+    block_locations: List[Tuple[str, BlockLocation]]
+    size: int # characters read
+
+def parse_page_file(path: Path) -> Optional[ParsedPage]:
+    try:
+        content = path.read_text()
+    except FileNotFoundError:
+        return None # removed in the meantime; nothing to index
+    block_locations = []
+    if BLOCK_ID_PROPERTY in content:
+        lines = content.split('\n')
+        for line_index in range(1, len(lines)):
+            stripped = lines[line_index].strip()
+            if not stripped.startswith(BLOCK_ID_PROPERTY):
+                continue
+            block_id = stripped[len(BLOCK_ID_PROPERTY):].strip()
+            # the Block the ID belongs to is the line right before it (line numbers are 1-based)
+            block_locations.append((block_id, BlockLocation(path, line_index, lines[line_index - 1].rstrip())))
+    return ParsedPage(path, set(extract_page_link_names(content)), set(BLOCK_REF_PATTERN.findall(content)), block_locations, len(content))
+
+def parse_page_files(paths: Sequence[Path]) -> List[ParsedPage]:
+    '''Module level so shards of a repository can be parsed in worker processes (see `parallel_utils`)'''
+    return [parsed for parsed in map(parse_page_file, paths) if parsed is not None]
+
+class ReferenceIndex:
+    '''## Reference index for a single user repository
+    Keeps track of, for every Page file in the repository:
+      - the Pages it links to (`[[name]]`)
+      - the Blocks it references (`((block id))`)
+      - the Block IDs it defines (`id:: <block id>`)
+
+    The index is built the first time it's used and kept up to date afterwards through the
+    `on_page_*` hooks below, so reference lookups only have to open the files that actually
+    reference what is asked for.'''
+    def __init__(self, repo_path: Path):
+        self._repo_path: Path = repo_path
+        self._lock = threading.RLock()
+        self._built: bool = False
+        self._targets_by_source: Dict[Path, Set[str]] = {}
+        self._sources_by_target: Dict[str, Set[Path]] = {}
+        self._block_refs_by_source: Dict[Path, Set[str]] = {}
+        self._sources_by_block_ref: Dict[str, Set[Path]] = {}
+        self._block_ids_by_source: Dict[Path, List[str]] = {}
+        self._block_locations: Dict[str, BlockLocation] = {}
+
+    @property
+    def repo_path(self) -> Path:
+        return self._repo_path
+
+    def sources_linking_to(self, page_name: str) -> List[Path]:
+        '''## Get every Page file linking to `page_name`
+        Sorted so callers process the files in a stable order.'''
+        with self._lock:
+            self._build_if_needed()
+            return sorted(self._sources_by_target.get(page_name, ()))
+
+    def sources_referencing_blocks(self, block_ids: Iterable[str]) -> List[Path]:
+        '''## Get every Page file referencing at least one of the given Blocks'''
+        with self._lock:
+            self._build_if_needed()
+            sources: Set[Path] = set()
+            for block_id in block_ids:
+                sources.update(self._sources_by_block_ref.get(block_id, ()))
+            return sorted(sources)
+
+    def lookup_block(self, block_id: str) -> Optional[BlockLocation]:
+        with self._lock:
+            self._build_if_needed()
+            return self._block_locations.get(block_id)
+
+    @property
+    def page_count(self) -> int:
+        '''Pages indexed so far (`0` until the index is built)'''
+        # no lock, so reporting metrics doesn't wait for a build to finish; `len` is atomic
+        return len(self._targets_by_source)
+
+    def update_page(self, path: Path) -> None:
+        with self._lock:
+            if not self._built:
+                return # the initial build reads the latest content anyway
+            self._remove_source(path)
+            self._add_source(path)
+
+    def remove_page(self, path: Path) -> None:
+        with self._lock:
+            if self._built:
+                self._remove_source(path)
+
+    def rename_page(self, old_path: Path, new_path: Path) -> None:
+        with self._lock:
+            if not self._built:
+                return
+            self._remove_source(old_path)
+            self._add_source(new_path)
+
+    def _build_if_needed(self) -> None:
+        if self._built:
+            return
+        page_files = sorted(self._repo_path.rglob('*.md'))
+        metrics.increment('page_files_scanned_total', len(page_files), index='reference')
+        for parsed_pages in map_shards(parse_page_files, page_files):
+            for parsed in parsed_pages:
+                self._apply(parsed)
+            _record_reads(parsed_pages)
+        self._built = True
+
+    def _add_source(self, path: Path) -> None:
+        parsed = parse_page_file(path)
+        if parsed is not None:
+            self._apply(parsed)
+            _record_reads([parsed])
+
+    def _apply(self, parsed: ParsedPage) -> None:
+        path = parsed.path
+        self._targets_by_source[path] = parsed.targets
+        for target in parsed.targets:
+            self._sources_by_target.setdefault(target, set()).add(path)
+
+        self._block_refs_by_source[path] = parsed.block_refs
+        for block_id in parsed.block_refs:
+            self._sources_by_block_ref.setdefault(block_id, set()).add(path)
+
+        if parsed.block_locations:
+            self._block_ids_by_source[path] = [block_id for block_id, _ in parsed.block_locations]
+            for block_id, location in parsed.block_locations:
+                self._block_locations[block_id] = location
+
+    def _remove_source(self, path: Path) -> None:
+        _remove_from_reverse_map(path, self._targets_by_source.pop(path, ()), self._sources_by_target)
+        _remove_from_reverse_map(path, self._block_refs_by_source.pop(path, ()), self._sources_by_block_ref)
+        for block_id in self._block_ids_by_source.pop(path, ()):
+            location = self._block_locations.get(block_id)
+            if location is not None and location.path == path:
+                del self._block_locations[block_id]
+
+def _record_reads(parsed_pages: List[ParsedPage]) -> None:
+    # counted here rather than while parsing, which may happen in another process
+    metrics.increment('page_files_read_total', len(parsed_pages), reader='reference_index')
+    metrics.increment('page_bytes_read_total', sum(parsed.size for parsed in parsed_pages), reader='reference_index')
+
+def _remove_from_reverse_map(path: Path, keys: Iterable[str], reverse_map: Dict[str, Set[Path]]) -> None:
+    for key in keys:
+        sources = reverse_map.get(key)
+        if sources is None:
+            continue
+        sources.discard(path)
+        if not sources:
+            del reverse_map[key]
+
+class PageListener(Protocol):
+    '''Anything (indexes, caches, ...) that needs to know when Pages under `repo_path` change'''
+    @property
+    def repo_path(self) -> Path: ...
+    def update_page(self, path: Path) -> None: ...
+    def remove_page(self, path: Path) -> None: ...
+    def rename_page(self, old_path: Path, new_path: Path) -> None: ...
+
+_indexes: Dict[Path, ReferenceIndex] = {}
+_page_listeners: List[PageListener] = []
+_indexes_lock = threading.Lock()
+
+def register_page_listener(listener: PageListener) -> None:
+    with _indexes_lock:
+        _page_listeners.append(listener)
+
+def get_reference_index(repo_path: Path) -> ReferenceIndex:
+    '''## Get the (shared) reference index of a user repository
+    **NOTE:** the index is only built on the first lookup, not here'''
+    with _indexes_lock:
+        index = _indexes.get(repo_path)
+        if index is None:
+            index = ReferenceIndex(repo_path)
+            _indexes[repo_path] = index
+            _page_listeners.append(index)
+        return index
+
+def get_reference_index_stats() -> IndexStats:
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+    return IndexStats(len(indexes), sum(index.page_count for index in indexes))
+
+def drop_reference_index(repo_path: Path) -> None:
+    '''## Forget the reference index and every other Page listener of a repository (or its folders)
+    Used to free the memory of repositories that aren't in use (see `user_repo_utils`); anything
+    dropped is rebuilt from the files on next use.'''
+    with _indexes_lock:
+        _indexes.pop(repo_path, None)
+        _page_listeners[:] = [listener for listener in _page_listeners if not listener.repo_path.is_relative_to(repo_path)]
+
+def _listeners_containing(path: Path) -> List[PageListener]:
+    with _indexes_lock:
+        return [listener for listener in _page_listeners if path.is_relative_to(listener.repo_path)]
+
+##
+## Hooks for anything that modifies Page files
+##
+
+def on_page_written(path: Path) -> None:
+    page_cache.invalidate(path)
+    if path.suffix != '.md':
+        return
+    for listener in _listeners_containing(path):
+        listener.update_page(path)
+
+def on_page_removed(path: Path) -> None:
+    page_cache.invalidate(path)
+    for listener in _listeners_containing(path):
+        listener.remove_page(path)
+
+def on_page_renamed(old_path: Path, new_path: Path) -> None:
+    page_cache.invalidate(old_path)
+    page_cache.invalidate(new_path)
+    for listener in _listeners_containing(old_path):
+        listener.rename_page(old_path, new_path)
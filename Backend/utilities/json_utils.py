@@ -0,0 +1,35 @@
+from functools import lru_cache
+from typing import Any
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+try:
+    import orjson
+except ImportError: # optional; without it plain data is validated into models and serialized by Pydantic
+    orjson = None
+
+class JSONBytesResponse(Response):
+    '''## Response for JSON that is already encoded (see `dump_models_json` and `dump_data_json`)
+    Returning models from an endpoint runs them through FastAPI's `jsonable_encoder`, which walks
+    every value in Python and easily takes longer than finding the results did.'''
+    media_type = 'application/json'
+
+def dump_models_json(value: Any, value_type: Any) -> bytes:
+    '''## JSON of models (or lists of them) of `value_type`, with Pydantic's compiled serializer
+    Byte for byte what FastAPI sends for them: compact, UTF-8, fields in declaration order.'''
+    return _get_type_adapter(value_type).dump_json(value)
+
+def dump_data_json(data: Any, value_type: Any) -> bytes:
+    '''## JSON of plain data (dicts, lists, strings, numbers, `None`) shaped like `value_type`
+    Serialized as is with `orjson` if it's installed, skipping the models altogether; otherwise
+    validated into `value_type` first. Either way the same bytes as `dump_models_json`, as long as
+    the keys of every dict are in the order the fields are declared.'''
+    if orjson is not None:
+        return orjson.dumps(data)
+    adapter = _get_type_adapter(value_type)
+    return adapter.dump_json(adapter.validate_python(data))
+
+@lru_cache
+def _get_type_adapter(value_type: Any) -> TypeAdapter:
+    return TypeAdapter(value_type) # building one compiles the (de)serializers, so they're kept
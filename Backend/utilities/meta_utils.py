@@ -1,96 +1,167 @@
-import re
-from typing import List, Dict, Optional
+import sys
+from array import array
+from functools import partial
+from typing import Iterable, Iterator, List, Dict, Optional, Sequence, Set, Tuple
 from pathlib import Path
 
 from ..models.meta_model import (
     BackLink,
-    BackLinkReference,
     PageLinkage,
     BlockRef,
-    BlockSearchResult
+    BlockSearchResult,
+    StreamedReference,
 )
+from .page_utils import extract_page_link_names
+from .outline_utils import PageOutline, get_indention_length
+from .index_utils import BLOCK_REF_PATTERN
+from .parallel_utils import map_shards
+from .cache_utils import page_cache
+from .byte_search_utils import find_block_lines
+from .json_utils import dump_data_json
+
+##
+## Compact records of what scans find
+## Scans can turn up a lot of matches, so they're collected as plain slotted objects and only turned
+## into response models at the very end, for what actually gets sent. (Validating plain values in a
+## single call is faster than `model_construct` with Pydantic 2, which runs in Python.)
+##
+
+class BacklinkMatch:
+    '''A line linking to the Page; its children are a span of the Page's lines (shared, not copied)'''
+    __slots__ = ('line_number', 'page_lines', 'child_start', 'child_end')
+
+    def __init__(self, line_number: int, page_lines: List[str], child_start: int, child_end: int):
+        self.line_number: int = line_number # 1-based
+        self.page_lines: List[str] = page_lines
+        self.child_start: int = child_start
+        self.child_end: int = child_end
+
+    def to_dict(self) -> dict:
+        '''Fields of the `BackLinkReference` it stands for'''
+        return {'line': self.page_lines[self.line_number - 1],
+                'line_number': self.line_number,
+                'children': self.page_lines[self.child_start:self.child_end]}
+
+class PageBlockMatches:
+    '''## The Blocks of a single Page found by `find_blocks`
+    Stored as columns (a list per field) rather than an object per Block: a search for something
+    common finds most of the repository, and that many small objects keep the garbage collector busy.'''
+    __slots__ = ('page_name', 'line_numbers', 'block_texts', 'block_ids')
+
+    def __init__(self, page_name: str):
+        self.page_name: str = page_name # file name, including `.md`
+        self.line_numbers = array('I')
+        self.block_texts: List[str] = []
+        self.block_ids: List[Optional[str]] = []
+
+    def __len__(self) -> int:
+        return len(self.block_texts)
+
+    def to_model(self, index: int) -> BlockSearchResult:
+        return BlockSearchResult(block_id=self.block_ids[index], block_text=self.block_texts[index],
+                                 line_number=self.line_numbers[index], page_name=self.page_name)
 
 class References:
     def __init__(self):
-        self._backlinks_map: Dict[str, BackLink] = {}
-        self._block_refs: List[BlockRef] = []
-        # TODO make this thread safe when we parallelize everything later - the whole point of abstracting this instead of using meta_model.PageLinkage directly
-    
-    def add_backlink(self, backlink: BackLink) -> None:
-        if backlink.page_name in self._backlinks_map:
-            self._backlinks_map[backlink.page_name].references.extend(backlink.references)
+        self._backlinks: Dict[str, List[BacklinkMatch]] = {} # Page name -> matches, in the order found
+        self._block_refs: List[tuple] = [] # (Block ID, source Page name)
+        # not thread safe: parallel scans collect into their own instance and `merge` them afterwards
+
+    def add_backlink(self, page_name: str, match: BacklinkMatch) -> None:
+        matches = self._backlinks.get(page_name)
+        if matches is None:
+            self._backlinks[page_name] = [match] # automatically groups references by page
         else:
-            self._backlinks_map[backlink.page_name] = backlink
-    
-    def add_block_ref(self, block_ref: BlockRef) -> None:
-        self._block_refs.append(block_ref)
-    
+            matches.append(match)
+
+    def add_block_ref(self, block_id: str, source: str) -> None:
+        self._block_refs.append((block_id, source))
+
+    def merge(self, other: 'References') -> None:
+        for page_name, matches in other._backlinks.items():
+            existing = self._backlinks.get(page_name)
+            if existing is None:
+                self._backlinks[page_name] = matches
+            else:
+                existing.extend(matches)
+        self._block_refs.extend(other._block_refs)
+
+    def iter_models(self) -> Iterator[StreamedReference]:
+        for backlink in self._backlink_dicts():
+            yield StreamedReference(backlink=BackLink.model_validate(backlink))
+        for block_ref in self._block_ref_dicts():
+            yield StreamedReference(block_ref=BlockRef.model_validate(block_ref))
+
     def to_model(self) -> PageLinkage:
-        return PageLinkage(backlinks=self._backlinks_map.values(), block_refs=self._block_refs)
+        return PageLinkage.model_validate(self._linkage_dict())
+
+    def to_json(self) -> bytes:
+        '''## Same as `to_model().model_dump_json()`, but without the models where possible (see `json_utils`)'''
+        return dump_data_json(self._linkage_dict(), PageLinkage)
+
+    @staticmethod
+    def to_json_list(collected: Sequence['References']) -> bytes:
+        '''## JSON list of the `PageLinkage` of each (see `to_json`)'''
+        return dump_data_json([refs._linkage_dict() for refs in collected], List[PageLinkage])
+
+    def _linkage_dict(self) -> dict:
+        return {'backlinks': self._backlink_dicts(), 'block_refs': self._block_ref_dicts()}
+
+    def _backlink_dicts(self) -> List[dict]:
+        return [{'page_name': page_name, 'references': [match.to_dict() for match in matches]}
+                for page_name, matches in self._backlinks.items()]
+
+    def _block_ref_dicts(self) -> List[dict]:
+        return [{'block_id': block_id, 'source': source} for block_id, source in self._block_refs]
 
 class ReferenceExtractor:
     '''## Base reference extraction class
     Used for extracting types of references (Backlink, Block, etc.) in inherited classes'''
-    def extract(self, text: str, active_page_name: str, line_index: int, remaining: List[str], collected: References) -> None:
+    def extract(self, text: str, active_page_name: str, line_index: int, outline: PageOutline, collected: References) -> None:
         '''## Reference Extraction
-        Extract a reference from text (if any) and add it to the collection'''
+        Extract a reference from text (if any) and add it to the collection. `line_index` is the
+        1-based line number of `text`, and `outline` the structure of the whole Page it is in.'''
         raise Exception('Use inherited classes instead of base')
 
 class BacklinkExtractor(ReferenceExtractor):
     def __init__(self, src_page_name: str):
         self._src_page_name: str = src_page_name.replace('.md', '')
 
-    def extract(self, text: str, active_page_name: str, line_index: int, remaining: List[str], collected: References) -> None:
-        matches = self._get_backlink_matches(text)
-        for match in matches:
-            backlink_name = self._get_backlink_name_from_match(match)
+    def extract(self, text: str, active_page_name: str, line_index: int, outline: PageOutline, collected: References) -> None:
+        if '[[' not in text: # most lines link to nothing; skip the regex for those
+            return
+        for backlink_name in extract_page_link_names(text):
             if backlink_name == self._src_page_name:
-                children = extract_block_children(text, remaining)
-                references = [BackLinkReference(line=text, line_number=line_index, children=children)]
-                backlink = BackLink(page_name=active_page_name, references=references)
-                collected.add_backlink(backlink) # automatically groups references by page
-    
-    def _get_backlink_matches(self, text: str):
-        return re.findall(r"\[\[.*?\]\]", text)
-    
-    def _get_backlink_name_from_match(self, match) -> str:
-        return re.sub(r"(\[\[|\]\])", "", match)
+                child_start, child_end = outline.child_span(line_index - 1)
+                collected.add_backlink(active_page_name, BacklinkMatch(line_index, outline.lines, child_start, child_end))
 
 class BlockReferenceExtractor(ReferenceExtractor):
     def __init__(self, block_ids: List[str]):
-        self._block_ids: List[str] = block_ids
-        self._match_pattern_str = self._generate_match_regex_str(block_ids)
+        self._block_ids: Set[str] = set(block_ids)
     
-    def extract(self, text: str, active_page_name: str, line_index: int, remaining: List[str], collected: References) -> None:
+    def extract(self, text: str, active_page_name: str, line_index: int, outline: PageOutline, collected: References) -> None:
         # TODO do we want to collect more information here, like the location and any children, or handle that on the frontend?
-        for match in self._get_block_matches(text):
-            block_id = self._extract_id(match)
+        if not self._block_ids:
+            return
+        for block_id in self._get_block_matches(text):
             if f'id:: {block_id}' in text:
                 return # just a line that indicates the reference assigned to a Block
             if block_id in self._block_ids:
-                ref = BlockRef(block_id=block_id, source=active_page_name)
-                collected.add_block_ref(ref)
-    
-    def _generate_match_regex_str(self, block_ids: List[str]) -> str:
-        # (
-        #   '((' <Block IDs separated by OR - "|" - characters> '))'
-        # )
-        # e.g. "(\(\(46d04659-f692-4ffc-b4ca-153a0b4468c8|41ef96b7-3dcd-425a-9312-7b47bebee7ec\)\))"gm
-        return r'(\(\(' + r'|'.join(block_ids) + r'\)\))'
+                collected.add_block_ref(block_id, active_page_name)
     
-    def _get_block_matches(self, text: str):
-        return re.findall(self._match_pattern_str, text)
-    
-    def _extract_id(self, match: str) -> str:
-        return re.sub(r'(\(\(|\)\))', '', match)
+    def _get_block_matches(self, text: str) -> List[str]:
+        # matches any `((<Block ID>))` and checks the IDs afterwards, so the cost does not depend on how many are requested
+        return BLOCK_REF_PATTERN.findall(text)
 
 ## TODO Add Tag reference extraction
 
 class ReferenceLocator:
-    def __init__(self, user_path: Path, page_path: Path, block_ids: List[str]):
+    def __init__(self, user_path: Path, page_path: Path, block_ids: List[str], page_files: Optional[Iterable[Path]] = None):
+        '''`page_files` limits the search to the given files (e.g. from an index) instead of the whole repo'''
         self._user_path: Path = user_path
         self._page_path: Path = page_path
         self._block_ids: List[str] = block_ids
+        self._page_files: Optional[Iterable[Path]] = page_files
         self._ref_extractors: List[ReferenceExtractor] = []
         self._refs = References()
     
@@ -98,50 +169,101 @@ class ReferenceLocator:
         self._ref_extractors.append(extractor)
     
     def retrieve_all_relationships(self) -> PageLinkage:
-        for page in self._get_all_files_in_repo():
-            self._process_file(page)
-        return self._refs.to_model()
+        return self._collect().to_model()
+
+    def retrieve_all_relationships_json(self) -> bytes:
+        '''## Same as `retrieve_all_relationships`, already serialized (see `References.to_json`)'''
+        return self._collect().to_json()
+
+    def _collect(self) -> References:
+        # sorted so the result is the same no matter how the files are split across workers
+        page_files = sorted(self._get_all_files_in_repo())
+        for refs in map_shards(partial(scan_page_files, self._ref_extractors), page_files):
+            self._refs.merge(refs)
+        return self._refs
     
+    def iter_relationships(self) -> Iterator[StreamedReference]:
+        '''## Same as `retrieve_all_relationships`, a file at a time
+        For streaming: nothing is collected, and the first references come out as soon as the file
+        they are in has been scanned.'''
+        for path in sorted(self._get_all_files_in_repo()):
+            refs = References()
+            _process_file(path, self._ref_extractors, refs)
+            yield from refs.iter_models()
+
     def _get_all_files_in_repo(self):
+        if self._page_files is not None:
+            return self._page_files
         return self._user_path.rglob('*.md')
-    
-    def _process_file(self, path: Path) -> None:
-        with open(str(path), 'r') as f:
-            lines = f.readlines()
-        line_index = 0
-        for line in lines:
-            for extractor in self._ref_extractors:
-                # TODO use a more efficient way when slicing `lines` that does not create a new list everything time
-                extractor.extract(line, path.name.replace('.md', ''), line_index + 1, lines[line_index:], self._refs)
-            line_index += 1
+
+def scan_page_files(extractors: List[ReferenceExtractor], paths: Sequence[Path]) -> References:
+    '''## Run every extractor over every line of the given files
+    Module level (and only taking picklable arguments) so it can run in a worker process.'''
+    refs = References()
+    for path in paths:
+        _process_file(path, extractors, refs)
+    return refs
+
+def collect_references_for_each(searches: Sequence[Tuple[List[ReferenceExtractor], Set[Path]]]) -> List[References]:
+    '''## The references of several searches (extractors, files to look in) in one pass
+    Every file is read and outlined once, however many searches look in it. Each search gets the
+    same references as a `ReferenceLocator` over its own files would find.'''
+    page_files = sorted(set().union(*(files for _, files in searches)))
+    collected = [References() for _ in searches]
+    for shard_refs in map_shards(partial(scan_page_files_for_each, searches), page_files):
+        for refs, found in zip(collected, shard_refs):
+            refs.merge(found)
+    return collected
+
+def scan_page_files_for_each(searches: Sequence[Tuple[List[ReferenceExtractor], Set[Path]]], paths: Sequence[Path]) -> List[References]:
+    '''## `scan_page_files` for several searches, each over the given files it looks in'''
+    collected = [References() for _ in searches]
+    for path in paths:
+        outline = None
+        for (extractors, files), refs in zip(searches, collected):
+            if path in files:
+                if outline is None:
+                    outline, page_name = PageOutline(page_cache.read_lines(path)), _get_page_name(path)
+                _process_outline(outline, page_name, extractors, refs)
+    return collected
+
+def _process_file(path: Path, extractors: List[ReferenceExtractor], refs: References) -> None:
+    _process_outline(PageOutline(page_cache.read_lines(path)), _get_page_name(path), extractors, refs)
+
+def _get_page_name(path: Path) -> str:
+    # every match in the file refers to this name, and interned it's shared with other scans too
+    return sys.intern(path.name.replace('.md', ''))
+
+def _process_outline(outline: PageOutline, page_name: str, extractors: List[ReferenceExtractor], refs: References) -> None:
+    line_index = 0
+    for line in outline.lines:
+        for extractor in extractors:
+            extractor.extract(line, page_name, line_index + 1, outline, refs)
+        line_index += 1
 
 def search_blocks(query: str, page_path: Path) -> List[BlockSearchResult]:
-    block_list: List[BlockSearchResult] = []
-    last_block: Optional[BlockSearchResult]
-    content = page_path.read_text()
-    line_number = 1
-    for line in content.splitlines():
-        if query.lower() in line.lower():
-            last_block = BlockSearchResult(block_id=None, block_text=line, line_number=line_number, page_name=page_path.name)
-            block_list.append(last_block)
-        elif 'id::' in line and last_block is not None:
-            last_block.block_id = line.split('id::')[1].strip()
-        else:
-            last_block = None
-        line_number += 1
-    return block_list
+    matches = find_blocks(query, page_path)
+    return [matches.to_model(index) for index in range(len(matches))]
+
+def find_blocks(query: str, page_path: Path) -> PageBlockMatches:
+    '''## Find the lines of a Page containing `query` (case-insensitive), along with their Block IDs
+    Searches the file itself (see `byte_search_utils`), so scans don't push everything else out of
+    the Page cache.'''
+    matches = PageBlockMatches(sys.intern(page_path.name))
+    found = find_block_lines(query, page_path)
+    if found:
+        line_numbers, block_texts, block_ids = zip(*found)
+        matches.line_numbers.extend(line_numbers)
+        matches.block_texts.extend(block_texts)
+        matches.block_ids.extend(block_ids)
+    return matches
 
 # should be generic enough for both Block and Page (back-link) references
 def extract_block_children(current_line: str, remaining_lines: List[str]) -> List[str]:
     children = []
-    indention_start = __extract_indention_start(current_line)
-    indention_start_length = len(indention_start)
+    indention_start_length = get_indention_length(current_line)
     for line in remaining_lines[1:]: # remaining_lines includes current_line, so we just skip it
-        child_indention = __extract_indention_start(line)
-        if len(child_indention) <= indention_start_length:
+        if get_indention_length(line) <= indention_start_length:
             break
         children.append(line)
     return children
-
-def __extract_indention_start(line: str) -> str:
-    return re.match(r'^\s*', line).group()
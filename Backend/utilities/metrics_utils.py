@@ -0,0 +1,181 @@
+import bisect
+import threading
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+# in seconds; from a cached Page read up to a scan of a large repository
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# in bytes
+SIZE_BUCKETS = (128, 1024, 8 * 1024, 64 * 1024, 512 * 1024, 4 * 1024 * 1024, 32 * 1024 * 1024)
+
+# name -> (type, help) of every metric this process records or reports
+METRIC_DESCRIPTIONS: Dict[str, Tuple[str, str]] = {
+    'http_requests_total': ('counter', 'Requests handled, by route, method and status code'),
+    'http_request_duration_seconds': ('histogram', 'Time from receiving a request to sending the last of its response'),
+    'http_response_size_bytes': ('histogram', 'Size of response bodies'),
+    'http_requests_in_flight': ('gauge', 'Requests being handled right now'),
+    'page_files_scanned_total': ('counter', 'Page files visited while building or refreshing an index, by index'),
+    'page_files_read_total': ('counter', 'Page files read from disk, by reader'),
+    'page_bytes_read_total': ('counter', 'Bytes of Page files read from disk, by reader'),
+    'repo_watch_events_total': ('counter', 'File system events about Pages received by the repository watchers'),
+    'repo_watch_rescans_total': ('counter', 'Full rescans of a repository by its watcher'),
+    'repo_watch_errors_total': ('counter', 'Times a repository watcher failed and had to start over'),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+class Sample(NamedTuple):
+    '''A single value reported by `/metrics`, e.g. a statistic of a cache'''
+    name: str
+    value: float
+    labels: Labels = ()
+
+class IndexStats(NamedTuple):
+    indexes: int # in memory right now (one per user repository or Page folder)
+    entries: int # Pages, or whatever else the index keeps, across all of them
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets: Sequence[float] = buckets
+        self.counts: List[int] = [0] * (len(buckets) + 1) # the last one is `+Inf`
+        self.sum: float = 0.0
+        self.count: int = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class MetricsRegistry:
+    '''## Counters, gauges and histograms of this process, in the Prometheus text format
+    Everything lives in plain dictionaries behind a single lock; recording a value is a dictionary
+    lookup and an addition, cheap enough for every request and every file read.'''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._gauges: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+
+    def increment(self, name: str, amount: float = 1, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def add_to_gauge(self, name: str, amount: float, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = LATENCY_BUCKETS, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = Histogram(buckets)
+                self._histograms[key] = histogram
+            histogram.observe(value)
+
+    def get_value(self, name: str, **labels: str) -> float:
+        '''## Current value of a counter or gauge (`0` if nothing was recorded yet)'''
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            return self._counters.get(key, self._gauges.get(key, 0))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    def render(self, extra_samples: Iterable[Sample] = ()) -> str:
+        '''## Everything recorded, plus `extra_samples`, in the Prometheus text exposition format'''
+        lines_by_name: Dict[str, List[str]] = {}
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()) + sorted(self._gauges.items()):
+                lines_by_name.setdefault(name, []).append(_format_sample(name, labels, value))
+            for (name, labels), histogram in sorted(self._histograms.items(), key=lambda item: item[0]):
+                lines_by_name.setdefault(name, []).extend(_format_histogram(name, labels, histogram))
+        for sample in extra_samples:
+            lines_by_name.setdefault(sample.name, []).append(_format_sample(sample.name, sample.labels, sample.value))
+
+        output = []
+        for name, lines in lines_by_name.items():
+            metric_type, help_text = METRIC_DESCRIPTIONS.get(name, ('counter' if name.endswith('_total') else 'gauge', None))
+            if help_text is not None:
+                output.append(f'# HELP {name} {help_text}')
+            output.append(f'# TYPE {name} {metric_type}')
+            output.extend(lines)
+        return '\n'.join(output) + '\n'
+
+def _format_sample(name: str, labels: Labels, value: float) -> str:
+    if labels:
+        label_text = ','.join(f'{key}="{_escape_label_value(str(label))}"' for key, label in labels)
+        return f'{name}{{{label_text}}} {_format_value(value)}'
+    return f'{name} {_format_value(value)}'
+
+def _format_histogram(name: str, labels: Labels, histogram: Histogram) -> List[str]:
+    lines = []
+    cumulative = 0
+    for bound, count in zip(list(histogram.buckets) + [float('inf')], histogram.counts):
+        cumulative += count
+        le = '+Inf' if bound == float('inf') else _format_value(bound)
+        lines.append(_format_sample(f'{name}_bucket', labels + (('le', le),), cumulative))
+    lines.append(_format_sample(f'{name}_sum', labels, histogram.sum))
+    lines.append(_format_sample(f'{name}_count', labels, histogram.count))
+    return lines
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+def _escape_label_value(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class MetricsMiddleware:
+    '''## ASGI middleware recording the latency, response size and status of every request
+    Requests are labelled with the path template of the route they matched (e.g. `/page/get/{name}`),
+    not the actual path, so the number of series stays fixed. Responses get a `Server-Timing`
+    header with the time taken until the response started (before any streamed body).'''
+    def __init__(self, app, registry: Optional[MetricsRegistry] = None):
+        self.app = app
+        self.registry: MetricsRegistry = metrics if registry is None else registry
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        registry = self.registry
+        start = time.perf_counter()
+        status_code = 500 # unless a response gets started
+        response_size = 0
+
+        async def send_with_metrics(message):
+            nonlocal status_code, response_size
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+                duration_ms = (time.perf_counter() - start) * 1000
+                message['headers'] = list(message.get('headers', [])) + [(b'server-timing', f'app;dur={duration_ms:.1f}'.encode())]
+            elif message['type'] == 'http.response.body':
+                response_size += len(message.get('body', b''))
+            await send(message)
+
+        registry.add_to_gauge('http_requests_in_flight', 1)
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            registry.add_to_gauge('http_requests_in_flight', -1)
+            labels = {'route': _route_label(scope), 'method': scope['method']}
+            registry.increment('http_requests_total', status=str(status_code), **labels)
+            registry.observe('http_request_duration_seconds', time.perf_counter() - start, **labels)
+            registry.observe('http_response_size_bytes', response_size, SIZE_BUCKETS, **labels)
+
+def _route_label(scope) -> str:
+    route = scope.get('route') # set by FastAPI once a route matched
+    if route is not None:
+        return route.path
+    return 'mount' if 'endpoint' in scope else 'unmatched' # e.g. the static files of the frontend
+
+# shared by everything recording metrics in this process
+metrics = MetricsRegistry()
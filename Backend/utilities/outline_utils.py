@@ -0,0 +1,50 @@
+from typing import List, Optional, Tuple
+
+def get_indention_length(line: str) -> int:
+    '''## Length of the whitespace a line starts with
+    This is what decides the Block structure of a Page: a line is a child of the closest line above
+    it with a shorter indention. Note that a blank line counts its newline as whitespace, so it
+    stays part of the Block it's in.'''
+    return len(line) - len(line.lstrip())
+
+class PageOutline:
+    '''## Block structure of a Page, computed in a single pass
+    Holds the lines of a Page along with where the children of each line end, so looking up the
+    children of a Block doesn't require scanning (or copying) the rest of the Page. Those are only
+    computed the first time they are needed, as most scanned Pages never need them.
+    All indices are 0-based.'''
+    def __init__(self, lines: List[str]):
+        self._lines: List[str] = lines
+        self._child_ends: Optional[List[int]] = None
+
+    @property
+    def lines(self) -> List[str]:
+        return self._lines
+
+    def child_span(self, line_index: int) -> Tuple[int, int]:
+        '''## Get the `[start, end)` range of lines that are children of the given line'''
+        if self._child_ends is None:
+            self._child_ends = self._compute_child_ends(self._lines)
+        return line_index + 1, self._child_ends[line_index]
+
+    def has_children(self, line_index: int) -> bool:
+        start, end = self.child_span(line_index)
+        return start < end
+
+    def children(self, line_index: int) -> List[str]:
+        start, end = self.child_span(line_index)
+        return self._lines[start:end]
+
+    def _compute_child_ends(self, lines: List[str]) -> List[int]:
+        # A line's children end at the first line below it with the same or shorter indention. Lines
+        #   still waiting on that line are kept in a stack (with growing indention), so every line
+        #   is pushed and popped exactly once.
+        line_count = len(lines)
+        child_ends = [line_count] * line_count
+        open_lines: List[Tuple[int, int]] = [] # (indention length, line index)
+        for index, line in enumerate(lines):
+            indention_length = get_indention_length(line)
+            while open_lines and open_lines[-1][0] >= indention_length:
+                child_ends[open_lines.pop()[1]] = index
+            open_lines.append((indention_length, index))
+        return child_ends
@@ -0,0 +1,261 @@
+import base64
+import bisect
+import json
+import logging
+import os
+import threading
+from hashlib import blake2b
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from pathlib import Path
+
+from .index_utils import register_page_listener
+from .metrics_utils import metrics, IndexStats
+from .write_queue_utils import write_page_atomically
+
+logger = logging.getLogger(__name__)
+
+SORT_KEYS = ('name', 'last_modified', 'creation', 'size')
+# Kept in the Page folder (hidden, so it's never listed as a Page); see `PageMetadataIndex`
+CREATION_TIMES_FILE = '.page-creation-times.json'
+
+class PageFileMetadata(NamedTuple):
+    name: str
+    creation: float      # seconds since the epoch
+    last_modified: float
+    size: int
+
+class PageListing(NamedTuple):
+    pages: List[PageFileMetadata]
+    next_cursor: Optional[str] # `None` once there's nothing left
+
+    def compute_version(self) -> str:
+        '''## Short hash identifying this listing (changes with any name, timestamp or size in it)'''
+        digest = blake2b(repr(self.next_cursor).encode(), digest_size=8)
+        for page in self.pages:
+            digest.update(f'\0{page.name}\0{page.creation!r}\0{page.last_modified!r}\0{page.size}'.encode())
+        return digest.hexdigest()
+
+class PageMetadataIndex:
+    '''## File metadata (timestamps and size) of every Page in a folder
+    Built with a single `os.scandir` of the folder and kept up to date by the Page hooks in
+    `index_utils`, so listing Pages doesn't `stat` each file on every request. Files added or
+    removed outside of the API change the folder's modification time, which is checked on every
+    listing (one `stat`) and triggers a rescan.
+
+    Most file systems (and Python on Linux) don't give the creation time of a file, and saves
+    replace the file anyway, so the creation time of a Page is recorded when it's first seen and
+    stored in `CREATION_TIMES_FILE`, to survive restarts.
+
+    Orders for each sort key are computed when first asked for and kept until something changes.'''
+    def __init__(self, pages_path: Path):
+        self._pages_path: Path = pages_path
+        self._lock = threading.Lock()
+        self._folder_stamp: Optional[int] = None
+        self._pages: Dict[str, PageFileMetadata] = {}
+        self._creation_times: Optional[Dict[str, float]] = None # file name -> creation time (loaded on first listing)
+        self._creation_times_changed: bool = False
+        self._sorted: Dict[str, Tuple[List[tuple], List[PageFileMetadata]]] = {} # sort key -> (keys, Pages)
+
+    @property
+    def repo_path(self) -> Path:
+        return self._pages_path # only Pages right in this folder are of interest
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._pages)
+
+    def list_pages(self,
+                   sort: str = 'name',
+                   descending: bool = False,
+                   limit: Optional[int] = None,
+                   cursor: Optional[str] = None,
+                   since: Optional[float] = None) -> PageListing:
+        '''## List Pages ordered by `sort` (ties broken by name), a page at a time
+        `cursor` is the `next_cursor` of the previous page; the listing continues right after the
+        last Page of it, even when Pages were added or removed in the meantime. With `since`, only
+        Pages modified after that time are listed (for refreshing a listing already fetched).
+        Raises `ValueError` for an unknown sort key or an invalid cursor.'''
+        if sort not in SORT_KEYS:
+            raise ValueError(f'Unknown sort key {sort!r}, expected one of {", ".join(SORT_KEYS)}')
+        with self._lock:
+            self._refresh_if_needed()
+            keys, ordered = self._get_sorted(sort)
+
+        try:
+            if descending:
+                end = len(ordered) if cursor is None else bisect.bisect_left(keys, _decode_cursor(cursor))
+                candidates = range(end - 1, -1, -1)
+            else:
+                start = 0 if cursor is None else bisect.bisect_right(keys, _decode_cursor(cursor))
+                candidates = range(start, len(ordered))
+        except TypeError as e: # a cursor for another sort key
+            raise ValueError('Invalid cursor') from e
+
+        pages: List[PageFileMetadata] = []
+        for position in candidates:
+            page = ordered[position]
+            if since is not None and page.last_modified <= since:
+                continue
+            if limit is not None and len(pages) >= limit:
+                return PageListing(pages, _encode_cursor(_sort_key(pages[-1], sort)))
+            pages.append(page)
+        return PageListing(pages, None)
+
+    def update_page(self, path: Path) -> None:
+        with self._lock:
+            if self._folder_stamp is not None and path.parent == self._pages_path:
+                self._stat_page(path)
+                self._save_creation_times_if_changed()
+                self._remember_folder_stamp()
+
+    def remove_page(self, path: Path) -> None:
+        with self._lock:
+            if self._folder_stamp is not None and path.parent == self._pages_path:
+                self._forget(path.name)
+                self._save_creation_times_if_changed()
+                self._remember_folder_stamp()
+
+    def rename_page(self, old_path: Path, new_path: Path) -> None:
+        with self._lock:
+            if self._folder_stamp is None:
+                return
+            creation = self._creation_times.get(old_path.name) if old_path.parent == self._pages_path else None
+            if old_path.parent == self._pages_path:
+                self._forget(old_path.name)
+            if new_path.parent == self._pages_path:
+                if creation is not None: # still the same Page
+                    self._set_creation_time(new_path.name, creation)
+                self._stat_page(new_path)
+            self._save_creation_times_if_changed()
+            self._remember_folder_stamp()
+
+    def _refresh_if_needed(self) -> None:
+        try:
+            folder_stamp = os.stat(str(self._pages_path)).st_mtime_ns
+        except FileNotFoundError:
+            folder_stamp = None
+        if folder_stamp is not None and folder_stamp == self._folder_stamp:
+            return
+        if self._creation_times is None:
+            self._creation_times = self._load_creation_times()
+        self._pages = {}
+        if folder_stamp is not None:
+            with os.scandir(str(self._pages_path)) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.') or not entry.is_file():
+                        continue # hidden, e.g. a save in progress (see `write_queue_utils`)
+                    self._add(entry.name, entry.stat())
+            metrics.increment('page_files_scanned_total', len(self._pages), index='page_metadata')
+            for file_name in [file_name for file_name in self._creation_times if file_name not in self._pages]:
+                self._set_creation_time(file_name, None) # removed by something else
+            # saving changes the folder's modification time, so the next listing scans once more
+            #   (and finds nothing new); keeping the stamp from before the scan means nothing changed
+            #   by someone else during the scan is missed
+            self._save_creation_times_if_changed()
+        self._sorted.clear()
+        self._folder_stamp = folder_stamp
+
+    def _remember_folder_stamp(self) -> None:
+        # our own writes change the folder's modification time too (atomic saves create files)
+        try:
+            self._folder_stamp = os.stat(str(self._pages_path)).st_mtime_ns
+        except FileNotFoundError:
+            self._folder_stamp = None
+
+    def _stat_page(self, path: Path) -> None:
+        try:
+            stat = os.stat(str(path))
+        except FileNotFoundError:
+            self._forget(path.name)
+            return
+        self._add(path.name, stat)
+        self._sorted.clear()
+
+    def _add(self, file_name: str, stat: os.stat_result) -> None:
+        creation = self._creation_times.get(file_name)
+        if creation is None: # first seen
+            # without a birth time, the earliest time the file is known to have existed at
+            creation = getattr(stat, 'st_birthtime', None) or min(stat.st_mtime, stat.st_ctime)
+            self._set_creation_time(file_name, creation)
+        self._pages[file_name] = PageFileMetadata(file_name.replace('.md', ''), creation, stat.st_mtime, stat.st_size)
+
+    def _forget(self, file_name: str) -> None:
+        self._set_creation_time(file_name, None)
+        if self._pages.pop(file_name, None) is not None:
+            self._sorted.clear()
+
+    def _set_creation_time(self, file_name: str, creation: Optional[float]) -> None:
+        if creation is None:
+            changed = self._creation_times.pop(file_name, None) is not None
+        else:
+            changed = self._creation_times.get(file_name) != creation
+            self._creation_times[file_name] = creation
+        self._creation_times_changed = self._creation_times_changed or changed
+
+    def _load_creation_times(self) -> Dict[str, float]:
+        try:
+            with open(str(self._pages_path / CREATION_TIMES_FILE)) as f:
+                creation_times = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError): # unreadable; the Pages get the best guess again
+            logger.exception('Failed to load the Page creation times of %s', self._pages_path)
+            return {}
+        if not isinstance(creation_times, dict):
+            return {}
+        return {file_name: creation for file_name, creation in creation_times.items() if isinstance(creation, (int, float))}
+
+    def _save_creation_times_if_changed(self) -> None:
+        if not self._creation_times_changed:
+            return
+        try:
+            write_page_atomically(self._pages_path / CREATION_TIMES_FILE, json.dumps(self._creation_times))
+        except OSError: # kept in memory; saved along with the next change
+            logger.exception('Failed to save the Page creation times of %s', self._pages_path)
+            return
+        self._creation_times_changed = False
+
+    def _get_sorted(self, sort: str) -> Tuple[List[tuple], List[PageFileMetadata]]:
+        ordered = self._sorted.get(sort)
+        if ordered is None:
+            pages = sorted(self._pages.values(), key=lambda page: _sort_key(page, sort))
+            ordered = ([_sort_key(page, sort) for page in pages], pages)
+            self._sorted[sort] = ordered
+        return ordered
+
+def _sort_key(page: PageFileMetadata, sort: str) -> tuple:
+    return (page.name,) if sort == 'name' else (getattr(page, sort), page.name)
+
+def _encode_cursor(sort_key: tuple) -> str:
+    return base64.urlsafe_b64encode(json.dumps(sort_key).encode()).decode()
+
+def _decode_cursor(cursor: str) -> tuple:
+    '''Raises `ValueError` for anything that isn't a cursor from `list_pages`'''
+    try:
+        return tuple(json.loads(base64.urlsafe_b64decode(cursor.encode())))
+    except (ValueError, TypeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+_metadata_indexes: Dict[Path, PageMetadataIndex] = {}
+_metadata_indexes_lock = threading.Lock()
+
+def get_page_metadata_index(pages_path: Path) -> PageMetadataIndex:
+    '''## Get the (shared) Page metadata index of a Page folder
+    **NOTE:** the folder is only scanned on the first listing, not here'''
+    with _metadata_indexes_lock:
+        index = _metadata_indexes.get(pages_path)
+        if index is None:
+            index = PageMetadataIndex(pages_path)
+            _metadata_indexes[pages_path] = index
+            register_page_listener(index)
+        return index
+
+def get_page_metadata_index_stats() -> IndexStats:
+    with _metadata_indexes_lock:
+        indexes = list(_metadata_indexes.values())
+    return IndexStats(len(indexes), sum(len(index) for index in indexes))
+
+def drop_page_metadata_index(pages_path: Path) -> None:
+    '''**NOTE:** doesn't unregister it as a Page listener (see `index_utils.drop_reference_index`)'''
+    with _metadata_indexes_lock:
+        _metadata_indexes.pop(pages_path, None)
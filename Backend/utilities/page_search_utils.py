@@ -0,0 +1,232 @@
+import bisect
+import heapq
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from pathlib import Path
+
+from .index_utils import register_page_listener
+from .metrics_utils import metrics, IndexStats
+
+# Every 1, 2 and 3 character long piece of a name gets a posting list, so short queries are a
+#   single lookup and longer ones an intersection of (usually small) trigram postings
+MAX_GRAM_LENGTH = 3
+WORD_SEPARATORS = ' -_/.'
+# How much of a query's trigrams a name has to share to count as a fuzzy match
+FUZZY_MATCH_THRESHOLD = 0.5
+# Removed entries leave a gap in the entry arrays; once at least this many have piled up, and they
+#   make up this much of the arrays, the entries are renumbered to get rid of them
+COMPACT_MIN_REMOVED = 64
+COMPACT_REMOVED_RATIO = 0.5
+
+class PageNameIndex:
+    '''## In-memory index of the Page names in a user repository
+    Used for autocompleting Page links (`[[`), so it has to answer a query without touching the
+    file system. Kept up to date by the Page hooks in `index_utils` (Page creation and renames).
+
+    Names (and every word in them) are kept in sorted arrays, so the best matches (those starting
+    with the query) are found with a binary search. Matches in the middle of a word come from the
+    n-gram postings.'''
+    def __init__(self, repo_path: Path):
+        self._repo_path: Path = repo_path
+        self._repo_path_len: int = len(str(repo_path))
+        self._lock = threading.Lock()
+        self._built: bool = False
+        self._paths: List[Optional[str]] = [] # entry ID -> path relative to the repo (`None` once removed)
+        self._names: List[str] = []           # entry ID -> lowercase file name (see `_compact`)
+        self._ids_by_path: Dict[str, int] = {}
+        self._sorted_names: List[Tuple[str, int]] = []
+        self._sorted_words: List[Tuple[str, int]] = [] # (rest of the name starting at a word, entry ID)
+        self._postings: Dict[str, Set[int]] = {}
+
+    @property
+    def repo_path(self) -> Path:
+        return self._repo_path
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._ids_by_path)
+
+    def search(self, query: str, limit: Optional[int] = None, fuzzy: bool = False) -> List[str]:
+        '''## Find Pages with `query` in their file name (case-insensitive)
+        Best matches come first: names starting with the query, then names with a word starting
+        with it (both alphabetically), then everything else (earliest and shortest first). With
+        `fuzzy`, names sharing most of the query's trigrams (typos, missing letters, ...) are added
+        after the exact matches.'''
+        query = query.lower()
+        with self._lock:
+            self._build_if_needed()
+            found = self._ranked_matches(query, limit)
+            if fuzzy and (limit is None or len(found) < limit):
+                fuzzy_matches = self._fuzzy_matches(query, set(found))
+                found.extend(self._top(fuzzy_matches, None if limit is None else limit - len(found)))
+            return [self._paths[entry_id] for entry_id in found]
+
+    def update_page(self, path: Path) -> None:
+        with self._lock:
+            if self._built and path.suffix == '.md':
+                self._add(path)
+
+    def remove_page(self, path: Path) -> None:
+        with self._lock:
+            if self._built:
+                self._remove(path)
+
+    def rename_page(self, old_path: Path, new_path: Path) -> None:
+        with self._lock:
+            if self._built:
+                self._remove(old_path)
+                self._add(new_path)
+
+    def _build_if_needed(self) -> None:
+        if self._built:
+            return
+        for path in self._repo_path.rglob('*.md'):
+            self._add(path, keep_sorted=False)
+        metrics.increment('page_files_scanned_total', len(self._ids_by_path), index='page_name')
+        self._sorted_names.sort()
+        self._sorted_words.sort()
+        self._built = True
+
+    def _add(self, path: Path, keep_sorted: bool = True) -> None:
+        relative_path = str(path)[self._repo_path_len:]
+        if relative_path not in self._ids_by_path:
+            self._add_entry(relative_path, path.name.lower(), keep_sorted)
+
+    def _add_entry(self, relative_path: str, name: str, keep_sorted: bool) -> None:
+        entry_id = len(self._paths)
+        self._paths.append(relative_path)
+        self._names.append(name)
+        self._ids_by_path[relative_path] = entry_id
+        if keep_sorted:
+            bisect.insort(self._sorted_names, (name, entry_id))
+            for word in _words(name):
+                bisect.insort(self._sorted_words, (word, entry_id))
+        else: # sorted once at the end of a (re)build instead
+            self._sorted_names.append((name, entry_id))
+            self._sorted_words.extend((word, entry_id) for word in _words(name))
+        for gram in _grams(name):
+            self._postings.setdefault(gram, set()).add(entry_id)
+
+    def _remove(self, path: Path) -> None:
+        entry_id = self._ids_by_path.pop(str(path)[self._repo_path_len:], None)
+        if entry_id is None:
+            return
+        name = self._names[entry_id]
+        _remove_sorted(self._sorted_names, (name, entry_id))
+        for word in _words(name):
+            _remove_sorted(self._sorted_words, (word, entry_id))
+        for gram in _grams(name):
+            posting = self._postings[gram]
+            posting.discard(entry_id)
+            if not posting:
+                del self._postings[gram]
+        self._paths[entry_id] = None
+        removed_count = len(self._paths) - len(self._ids_by_path)
+        if removed_count >= COMPACT_MIN_REMOVED and removed_count >= len(self._paths) * COMPACT_REMOVED_RATIO:
+            self._compact()
+
+    def _compact(self) -> None:
+        '''Renumber the remaining entries, dropping the ones removed'''
+        entries = [(relative_path, name) for relative_path, name in zip(self._paths, self._names) if relative_path is not None]
+        self._paths, self._names, self._ids_by_path = [], [], {}
+        self._sorted_names, self._sorted_words, self._postings = [], [], {}
+        for relative_path, name in entries:
+            self._add_entry(relative_path, name, keep_sorted=False)
+        self._sorted_names.sort()
+        self._sorted_words.sort()
+
+    def _ranked_matches(self, query: str, limit: Optional[int]) -> List[int]:
+        found: List[int] = []
+        if limit is not None and limit <= 0:
+            return found
+        seen: Set[int] = set()
+        for sorted_keys in [self._sorted_names, self._sorted_words]:
+            for entry_id in _iter_starting_with(sorted_keys, query):
+                if entry_id in seen:
+                    continue
+                seen.add(entry_id)
+                found.append(entry_id)
+                if limit is not None and len(found) >= limit:
+                    return found
+        others = [((self._names[entry_id].find(query), len(self._names[entry_id]), self._names[entry_id]), entry_id)
+                  for entry_id in self._substring_matches(query) if entry_id not in seen]
+        found.extend(self._top(others, None if limit is None else limit - len(found)))
+        return found
+
+    def _substring_matches(self, query: str) -> Iterable[int]:
+        if not query:
+            return self._ids_by_path.values()
+        if len(query) <= MAX_GRAM_LENGTH:
+            return self._postings.get(query, ())
+        postings = sorted((self._postings.get(gram, set()) for gram in _trigrams(query)), key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+        return [entry_id for entry_id in candidates if query in self._names[entry_id]]
+
+    def _fuzzy_matches(self, query: str, exclude: Set[int]) -> List[Tuple[tuple, int]]:
+        query_trigrams = set(_trigrams(query))
+        if not query_trigrams:
+            return []
+        shared_counts: Dict[int, int] = {}
+        for trigram in query_trigrams:
+            for entry_id in self._postings.get(trigram, ()):
+                shared_counts[entry_id] = shared_counts.get(entry_id, 0) + 1
+        matches = []
+        for entry_id, shared_count in shared_counts.items():
+            similarity = shared_count / len(query_trigrams)
+            if entry_id not in exclude and similarity >= FUZZY_MATCH_THRESHOLD:
+                matches.append(((-similarity, len(self._names[entry_id]), self._names[entry_id]), entry_id))
+        return matches
+
+    def _top(self, matches: List[Tuple[tuple, int]], limit: Optional[int]) -> List[int]:
+        if limit is None:
+            ordered = sorted(matches)
+        else:
+            ordered = heapq.nsmallest(limit, matches)
+        return [entry_id for _, entry_id in ordered]
+
+def _iter_starting_with(sorted_keys: List[Tuple[str, int]], prefix: str) -> Iterable[int]:
+    index = bisect.bisect_left(sorted_keys, (prefix,))
+    while index < len(sorted_keys) and sorted_keys[index][0].startswith(prefix):
+        yield sorted_keys[index][1]
+        index += 1
+
+def _remove_sorted(sorted_keys: List[Tuple[str, int]], key: Tuple[str, int]) -> None:
+    index = bisect.bisect_left(sorted_keys, key)
+    if index < len(sorted_keys) and sorted_keys[index] == key:
+        del sorted_keys[index]
+
+def _words(name: str) -> List[str]:
+    '''Rest of the name starting at each word (except the first one, which is the whole name)'''
+    return [name[start:] for start in range(1, len(name)) if name[start - 1] in WORD_SEPARATORS]
+
+def _grams(name: str) -> Set[str]:
+    return set(name[start:start + length]
+               for length in range(1, MAX_GRAM_LENGTH + 1)
+               for start in range(len(name) - length + 1))
+
+def _trigrams(text: str) -> List[str]:
+    return [text[start:start + MAX_GRAM_LENGTH] for start in range(len(text) - MAX_GRAM_LENGTH + 1)]
+
+_page_name_indexes: Dict[Path, PageNameIndex] = {}
+_page_name_indexes_lock = threading.Lock()
+
+def get_page_name_index(repo_path: Path) -> PageNameIndex:
+    '''## Get the (shared) Page name index of a user repository
+    **NOTE:** the index is only built on the first search, not here'''
+    with _page_name_indexes_lock:
+        index = _page_name_indexes.get(repo_path)
+        if index is None:
+            index = PageNameIndex(repo_path)
+            _page_name_indexes[repo_path] = index
+            register_page_listener(index)
+        return index
+
+def get_page_name_index_stats() -> IndexStats:
+    with _page_name_indexes_lock:
+        indexes = list(_page_name_indexes.values())
+    return IndexStats(len(indexes), sum(len(index) for index in indexes))
+
+def drop_page_name_index(repo_path: Path) -> None:
+    '''**NOTE:** doesn't unregister it as a Page listener (see `index_utils.drop_reference_index`)'''
+    with _page_name_indexes_lock:
+        _page_name_indexes.pop(repo_path, None)
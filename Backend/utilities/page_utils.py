@@ -1,6 +1,66 @@
+import re
+from hashlib import blake2b
+from typing import List
+
+from ..models.page_model import PagePatchOperation
+
+PAGE_LINK_PATTERN = re.compile(r"\[\[.*?\]\]")
+PAGE_LINK_BRACKETS_PATTERN = re.compile(r"(\[\[|\]\])")
 
 def rename_page_references_in_str(old_page_name: str, new_page_name: str, content: str) -> str:
     # TODO make this more efficient - re.compile might be worth looking into...
     to_find = f'[[{old_page_name}]]'
     to_replace = f'[[{new_page_name}]]'
     return content.replace(to_find, to_replace)
+
+def extract_page_link_names(text: str) -> List[str]:
+    '''## Get the names of all Pages linked to (`[[name]]`) in some text
+    Links never span multiple lines, so this works on a single line as well as a whole Page.'''
+    return [PAGE_LINK_BRACKETS_PATTERN.sub('', match) for match in PAGE_LINK_PATTERN.findall(text)]
+
+def compute_page_version(content: str) -> str:
+    '''## Short hash identifying a version of some Page content'''
+    return blake2b(content.encode(), digest_size=8).hexdigest()
+
+def normalize_line_endings(content: str) -> str:
+    '''## Page content as it reads back once saved
+    Page files are read with universal newlines, so `\\r\\n` and `\\r` come back as `\\n`; versions
+    of content about to be saved have to be computed from this.'''
+    return content.replace('\r\n', '\n').replace('\r', '\n')
+
+def apply_page_patch(content: str, operations: List[PagePatchOperation]) -> str:
+    '''## Apply Block-level operations to Page content
+    Raises `ValueError` if an operation does not fit the Page (see `PagePatchOperation`).'''
+    lines = content.split('\n')
+    for operation in operations:
+        if operation.op == 'insert':
+            _check_line_position(lines, operation.start)
+            lines[operation.start - 1:operation.start - 1] = operation.lines
+            continue
+
+        end = operation.start if operation.end is None else operation.end
+        _check_line_range(lines, operation.start, end)
+        if operation.op == 'replace':
+            lines[operation.start - 1:end] = operation.lines
+        elif operation.op == 'delete':
+            del lines[operation.start - 1:end]
+        elif operation.op == 'move':
+            if operation.to is None:
+                raise ValueError('Move operation requires a target line (`to`)')
+            _check_line_position(lines, operation.to)
+            if operation.start <= operation.to <= end:
+                raise ValueError('Cannot move lines into themselves')
+            moved = lines[operation.start - 1:end]
+            del lines[operation.start - 1:end]
+            target = operation.to if operation.to < operation.start else operation.to - len(moved)
+            lines[target - 1:target - 1] = moved
+    return '\n'.join(lines)
+
+def _check_line_range(lines: List[str], start: int, end: int) -> None:
+    if start < 1 or end < start or end > len(lines):
+        raise ValueError(f'Line range {start}-{end} is outside of the Page (1-{len(lines)})')
+
+def _check_line_position(lines: List[str], line_number: int) -> None:
+    # a position before `line_number`; one past the last line is the end of the Page
+    if line_number < 1 or line_number > len(lines) + 1:
+        raise ValueError(f'Line {line_number} is outside of the Page (1-{len(lines) + 1})')
@@ -0,0 +1,64 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional, Sequence, TypeVar
+
+from ..config import get_reference_scan_workers
+from .cache_utils import page_cache
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+# Below this many files per worker the cost of shipping work to other processes isn't worth it
+MIN_FILES_PER_WORKER = 32
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_size: int = 0
+_pool_lock = threading.Lock()
+
+def _init_worker() -> None:
+    # workers only see each file once per scan, so caching would just hold on to memory
+    page_cache.set_max_bytes(0)
+
+def _get_pool(worker_count: int) -> ProcessPoolExecutor:
+    global _pool, _pool_size
+    with _pool_lock:
+        if _pool is None or _pool_size != worker_count:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # `spawn` since forking a process that's running other threads (the web server) isn't safe
+            _pool = ProcessPoolExecutor(max_workers=worker_count, mp_context=multiprocessing.get_context('spawn'),
+                                        initializer=_init_worker)
+            _pool_size = worker_count
+        return _pool
+
+def shutdown_scan_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+def split_into_shards(items: Sequence[T], shard_count: int) -> List[Sequence[T]]:
+    '''## Split `items` into (at most) `shard_count` contiguous, similarly sized pieces
+    Contiguous so that concatenating the results of each shard keeps the original order.'''
+    shard_count = max(1, min(shard_count, len(items)))
+    shard_size, remainder = divmod(len(items), shard_count)
+    shards = []
+    start = 0
+    for shard_index in range(shard_count):
+        end = start + shard_size + (1 if shard_index < remainder else 0)
+        shards.append(items[start:end])
+        start = end
+    return shards
+
+def map_shards(func: Callable[[Sequence[T]], R], items: Sequence[T]) -> List[R]:
+    '''## Run `func` on shards of `items`, in parallel when it's worth it
+    Results come back in shard order regardless of which worker finished first, so merging them
+    gives the same result as `[func(items)]` would (the serial path used with a single worker).
+    `func` and the items have to be picklable.'''
+    worker_count = min(get_reference_scan_workers(), len(items) // MIN_FILES_PER_WORKER)
+    if worker_count <= 1:
+        return [func(items)]
+    pool = _get_pool(get_reference_scan_workers())
+    return list(pool.map(func, split_into_shards(items, worker_count)))
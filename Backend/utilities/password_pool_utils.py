@@ -0,0 +1,80 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, NamedTuple, Optional, TypeVar
+
+from ..config import get_password_hash_workers, get_password_hash_queue_limit
+from .auth_utils import hash_str, hash_equals_plaintext
+
+T = TypeVar('T')
+
+class PasswordHashingBusyError(Exception):
+    '''Raised instead of queueing more work once the queue of the pool is full'''
+
+class PasswordPoolStats(NamedTuple):
+    in_flight: int # running + waiting
+    completed: int
+    rejected: int
+    max_workers: int
+    queue_limit: int
+
+class PasswordHashingPool:
+    '''## Dedicated, size-limited thread pool for hashing and verifying passwords
+    bcrypt is slow on purpose, so running it on the threads serving requests lets a burst of logins
+    hold up everything else (like saving Pages). bcrypt releases the GIL while hashing, so these
+    threads run in parallel with the rest of the application.
+    At most `max_workers` passwords are hashed at once and `queue_limit` more may wait; anything
+    beyond that fails right away with `PasswordHashingBusyError` (a 503 for the client).'''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._max_workers: int = 0
+        self._in_flight: int = 0
+        self._completed: int = 0
+        self._rejected: int = 0
+
+    async def hash(self, plain_text: str) -> str:
+        return await self.run(hash_str, plain_text)
+
+    async def verify(self, hash: str, plain_text: str) -> bool:
+        return await self.run(hash_equals_plaintext, hash, plain_text)
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        with self._lock:
+            executor = self._get_executor()
+            if self._in_flight >= self._max_workers + get_password_hash_queue_limit():
+                self._rejected += 1
+                raise PasswordHashingBusyError()
+            self._in_flight += 1
+        future = executor.submit(func, *args)
+        future.add_done_callback(self._on_done)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+    def stats(self) -> PasswordPoolStats:
+        with self._lock:
+            return PasswordPoolStats(self._in_flight, self._completed, self._rejected,
+                                     get_password_hash_workers(), get_password_hash_queue_limit())
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # caller holds the lock; (re)created when the configured size changes
+        worker_count = get_password_hash_workers()
+        if self._executor is None or self._max_workers != worker_count:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False) # anything already submitted still runs
+            self._executor = ThreadPoolExecutor(max_workers=worker_count, thread_name_prefix='password-hashing')
+            self._max_workers = worker_count
+        return self._executor
+
+    def _on_done(self, _) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._completed += 1
+
+# shared by every request dealing with passwords in this process
+password_hashing_pool = PasswordHashingPool()
@@ -0,0 +1,114 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Tuple
+from pathlib import Path
+
+from .page_utils import rename_page_references_in_str
+from .cache_utils import page_cache
+from .index_utils import on_page_written, on_page_renamed
+from .parallel_utils import split_into_shards
+from .write_queue_utils import stage_page_content, write_page_atomically
+
+# Rewriting references is mostly file I/O, so threads are enough (and don't need to be many)
+RENAME_MAX_WORKERS = 8
+
+class RenameFailedError(Exception):
+    '''Raised when a rename could not be completed; the repository is left as it was before'''
+
+class _StagedRewrite(NamedTuple):
+    path: Path
+    original_content: str
+    tmp_path: Path
+
+class PageRenameTransaction:
+    '''## Rename a Page along with every reference to it, all or nothing
+    The referencing Pages are rewritten concurrently into temporary files next to them ("staged"),
+    and only once all of them are staged are they moved over the originals and the Page file
+    itself renamed ("committed"). If anything fails along the way the files already replaced get
+    their original content back and the staged files are removed.'''
+    def __init__(self, old_path: Path, new_path: Path, old_name: str, new_name: str):
+        self._old_path: Path = old_path
+        self._new_path: Path = new_path
+        self._old_name: str = old_name
+        self._new_name: str = new_name
+        self._staged: List[_StagedRewrite] = []
+
+    def run(self, referencing_paths: Iterable[Path]) -> List[Path]:
+        '''## Perform the rename, returning the Pages that had their references updated'''
+        if not self._old_path.exists():
+            raise FileNotFoundError(str(self._old_path))
+        if self._new_path.exists():
+            raise FileExistsError(str(self._new_path))
+
+        shards = split_into_shards(sorted(set(referencing_paths), key=str), RENAME_MAX_WORKERS)
+        error: Optional[BaseException] = None
+        with ThreadPoolExecutor(max_workers=len(shards)) as executor:
+            # a shard of files per thread instead of a task per file - keeps thousands of tiny tasks
+            #   from fighting over the executor's locks
+            futures = [executor.submit(self._stage_shard, shard) for shard in shards]
+            # wait for every one of them, so nothing staged is left behind when one fails
+            for future in futures:
+                staged_shard, shard_error = future.result()
+                self._staged.extend(staged_shard)
+                error = error or shard_error
+        if error is not None:
+            self._discard_staged()
+            raise RenameFailedError(f'Could not update the references to {self._old_name}') from error
+
+        self._commit()
+        return [staged.path for staged in self._staged]
+
+    def _stage_shard(self, paths: Sequence[Path]) -> Tuple[List[_StagedRewrite], Optional[BaseException]]:
+        staged_shard: List[_StagedRewrite] = []
+        for path in paths:
+            try:
+                staged = self._stage(path)
+            except Exception as e:
+                return staged_shard, e
+            if staged is not None:
+                staged_shard.append(staged)
+        return staged_shard, None
+
+    def _stage(self, path: Path) -> Optional[_StagedRewrite]:
+        try:
+            content = page_cache.read_text(path)
+        except FileNotFoundError:
+            return None # removed in the meantime; nothing to update
+        replaced_references = rename_page_references_in_str(self._old_name, self._new_name, content)
+        if replaced_references == content: # Only write to the file if something changed - prevents weird file metadata changes
+            return None
+        return _StagedRewrite(path, content, stage_page_content(path, replaced_references))
+
+    def _commit(self) -> None:
+        committed: List[_StagedRewrite] = []
+        try:
+            for staged in self._staged:
+                os.replace(str(staged.tmp_path), str(staged.path))
+                committed.append(staged)
+            os.rename(str(self._old_path), str(self._new_path))
+        except BaseException as e:
+            self._roll_back(committed)
+            raise RenameFailedError(f'Could not rename {self._old_name} to {self._new_name}') from e
+
+        # the rename first, so listeners move what they know about the Page (e.g. its creation time)
+        on_page_renamed(self._old_path, self._new_path)
+        for staged in self._staged:
+            # a Page linking to itself got rewritten under the name it doesn't have anymore
+            on_page_written(self._new_path if staged.path == self._old_path else staged.path)
+
+    def _roll_back(self, committed: List[_StagedRewrite]) -> None:
+        for staged in committed:
+            write_page_atomically(staged.path, staged.original_content) # never leaves a Page half restored
+            page_cache.invalidate(staged.path)
+        committed_paths = set(staged.path for staged in committed)
+        self._discard_staged(skip=committed_paths)
+
+    def _discard_staged(self, skip: Iterable[Path] = ()) -> None:
+        skip = set(skip)
+        for staged in self._staged:
+            if staged.path in skip:
+                continue
+            try:
+                os.unlink(str(staged.tmp_path))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,235 @@
+import hashlib
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+from pathlib import Path
+
+from ..config import get_block_search_db_path
+from ..models.meta_model import BlockSearchResult
+from .index_utils import BLOCK_ID_PROPERTY, register_page_listener
+from .metrics_utils import metrics, IndexStats
+
+# The trigram tokenizer makes FTS5 match any (case-insensitive) substring of at least three
+#   characters, which is what the plain Block search does. Shorter queries scan the repository's
+#   Blocks in SQLite instead.
+TRIGRAM_LENGTH = 3
+
+# Every repository gets tables of its own (`{prefix}` is derived from its path), so searches only
+#   ever go through the Blocks of the repository searched, however many users share the database
+SEARCH_DB_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS {prefix}_pages (
+    page_path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS {prefix}_blocks (
+    id INTEGER PRIMARY KEY,
+    page_path TEXT NOT NULL,
+    page_name TEXT NOT NULL,
+    line_number INTEGER NOT NULL,
+    block_text TEXT NOT NULL,
+    id_lines TEXT
+);
+CREATE INDEX IF NOT EXISTS {prefix}_blocks_by_page ON {prefix}_blocks (page_path, line_number);
+CREATE VIRTUAL TABLE IF NOT EXISTS {prefix}_fts USING fts5(
+    block_text, content='{prefix}_blocks', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS {prefix}_after_insert AFTER INSERT ON {prefix}_blocks BEGIN
+    INSERT INTO {prefix}_fts(rowid, block_text) VALUES (new.id, new.block_text);
+END;
+CREATE TRIGGER IF NOT EXISTS {prefix}_after_delete AFTER DELETE ON {prefix}_blocks BEGIN
+    INSERT INTO {prefix}_fts({prefix}_fts, rowid, block_text) VALUES ('delete', old.id, old.block_text);
+END;
+'''
+
+class BlockSearchIndex:
+    '''## Full-text (SQLite FTS5) index of every Block in a user repository
+    The index is stored on disk, so after a restart only the Pages that changed in the meantime (by
+    modification time and size) are re-indexed. Afterwards it's kept up to date through the Page
+    hooks in `index_utils`. Finds the same Blocks as scanning the Pages (see `meta_utils.find_blocks`),
+    only ordered by relevance.'''
+    def __init__(self, repo_path: Path, db_path: Path):
+        self._repo_path: Path = repo_path
+        self._prefix: str = 'repo_' + hashlib.blake2b(str(repo_path).encode(), digest_size=8).hexdigest()
+        self._lock = threading.Lock()
+        self._synced: bool = False
+        self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        # the same case-insensitive match as the scan (`LIKE` and FTS5 only fold ASCII / some letters)
+        self._db.create_function('contains_lowered', 2, _contains_lowered, deterministic=True)
+        self._db.executescript(SEARCH_DB_SCHEMA.format(prefix=self._prefix))
+
+    @property
+    def repo_path(self) -> Path:
+        return self._repo_path
+
+    def search(self, query: str, limit: Optional[int] = None, offset: int = 0) -> List[BlockSearchResult]:
+        '''## Find Blocks containing `query` (case-insensitive), best matches first'''
+        lowered_query = query.lower()
+        with self._lock:
+            self._sync_if_needed()
+            limit = -1 if limit is None else limit # -1 = no limit in SQLite
+            if len(query) >= TRIGRAM_LENGTH:
+                phrase = '"' + query.replace('"', '""') + '"'
+                rows = self._db.execute(
+                    f'SELECT b.block_text, b.line_number, b.page_name, b.id_lines '
+                    f'FROM {self._prefix}_fts JOIN {self._prefix}_blocks b ON b.id = {self._prefix}_fts.rowid '
+                    f'WHERE {self._prefix}_fts MATCH ? AND contains_lowered(b.block_text, ?) '
+                    f'ORDER BY {self._prefix}_fts.rank, b.page_path, b.line_number LIMIT ? OFFSET ?',
+                    (phrase, lowered_query, limit, offset))
+            else:
+                rows = self._db.execute(
+                    f'SELECT block_text, line_number, page_name, id_lines FROM {self._prefix}_blocks '
+                    f'WHERE contains_lowered(block_text, ?) '
+                    f'ORDER BY page_path, line_number LIMIT ? OFFSET ?',
+                    (lowered_query, limit, offset))
+            return [BlockSearchResult(block_id=_find_block_id(lowered_query, id_lines), block_text=block_text,
+                                      line_number=line_number, page_name=page_name)
+                    for block_text, line_number, page_name, id_lines in rows]
+
+    def update_page(self, path: Path) -> None:
+        with self._lock:
+            if self._synced:
+                with self._db:
+                    self._index_page(path)
+
+    def remove_page(self, path: Path) -> None:
+        with self._lock:
+            if self._synced:
+                with self._db:
+                    self._remove_page(str(path))
+
+    def rename_page(self, old_path: Path, new_path: Path) -> None:
+        with self._lock:
+            if self._synced:
+                with self._db:
+                    self._remove_page(str(old_path))
+                    self._index_page(new_path)
+
+    @property
+    def page_count(self) -> int:
+        '''Pages in the index (stored on disk, so possibly from before a restart)'''
+        with self._lock:
+            try:
+                return self._db.execute(f'SELECT COUNT(*) FROM {self._prefix}_pages').fetchone()[0]
+            except sqlite3.ProgrammingError: # closed in the meantime (see `drop_block_search_index`)
+                return 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def _sync_if_needed(self) -> None:
+        if self._synced:
+            return
+        indexed: Dict[str, Tuple[int, int]] = {
+            page_path: (mtime_ns, size) for page_path, mtime_ns, size in self._db.execute(
+                f'SELECT page_path, mtime_ns, size FROM {self._prefix}_pages')
+        }
+        scanned_count = 0
+        with self._db:
+            for path in self._repo_path.rglob('*.md'):
+                scanned_count += 1
+                stat = path.stat()
+                if indexed.pop(str(path), None) != (stat.st_mtime_ns, stat.st_size):
+                    self._index_page(path)
+            for removed_page_path in indexed:
+                self._remove_page(removed_page_path)
+        metrics.increment('page_files_scanned_total', scanned_count, index='block_search')
+        self._synced = True
+
+    def _index_page(self, path: Path) -> None:
+        self._remove_page(str(path))
+        try:
+            content = path.read_text()
+            stat = path.stat()
+        except FileNotFoundError:
+            return
+        metrics.increment('page_files_read_total', reader='block_search_index')
+        metrics.increment('page_bytes_read_total', stat.st_size, reader='block_search_index')
+        self._db.executemany(
+            f'INSERT INTO {self._prefix}_blocks (page_path, page_name, line_number, block_text, id_lines) VALUES (?, ?, ?, ?, ?)',
+            [(str(path), path.name, line_number, block_text, id_lines)
+             for line_number, block_text, id_lines in parse_blocks(content)])
+        self._db.execute(
+            f'INSERT INTO {self._prefix}_pages (page_path, mtime_ns, size) VALUES (?, ?, ?)',
+            (str(path), stat.st_mtime_ns, stat.st_size))
+
+    def _remove_page(self, page_path: str) -> None:
+        self._db.execute(f'DELETE FROM {self._prefix}_blocks WHERE page_path = ?', (page_path,))
+        self._db.execute(f'DELETE FROM {self._prefix}_pages WHERE page_path = ?', (page_path,))
+
+def parse_blocks(content: str) -> List[Tuple[int, str, Optional[str]]]:
+    '''## Split Page content into `(line number, line, id lines)` entries, one for every line
+    The id lines are the `id::` lines right below (joined by `\\n`, `None` if there are none), which
+    give a matching line its Block ID (see `_find_block_id`). They're entries of their own as well,
+    since the scan finds them too when they match.'''
+    lines = content.splitlines()
+    blocks = []
+    for line_index, line in enumerate(lines):
+        id_line_end = line_index + 1
+        while id_line_end < len(lines) and BLOCK_ID_PROPERTY in lines[id_line_end]:
+            id_line_end += 1
+        id_lines = '\n'.join(lines[line_index + 1:id_line_end]) if id_line_end > line_index + 1 else None
+        blocks.append((line_index + 1, line, id_lines))
+    return blocks
+
+def _find_block_id(lowered_query: str, id_lines: Optional[str]) -> Optional[str]:
+    # like the scan: the `id::` lines after a match belong to it, up to one matching the query itself
+    block_id = None
+    if id_lines is not None:
+        for id_line in id_lines.split('\n'):
+            if lowered_query in id_line.lower():
+                break
+            block_id = id_line.split(BLOCK_ID_PROPERTY)[1].strip()
+    return block_id
+
+def _contains_lowered(text: str, lowered_query: str) -> bool:
+    return lowered_query in text.lower()
+
+_fts5_available: Optional[bool] = None
+
+def is_fts5_available() -> bool:
+    global _fts5_available
+    if _fts5_available is None:
+        db = sqlite3.connect(':memory:')
+        try:
+            db.execute("CREATE VIRTUAL TABLE probe USING fts5(text, tokenize='trigram')")
+            _fts5_available = True
+        except sqlite3.OperationalError:
+            _fts5_available = False # SQLite built without FTS5 or too old for the trigram tokenizer
+        finally:
+            db.close()
+    return _fts5_available
+
+_search_indexes: Dict[Tuple[Path, Path], BlockSearchIndex] = {}
+_search_indexes_lock = threading.Lock()
+
+def get_block_search_index(repo_path: Path) -> Optional[BlockSearchIndex]:
+    '''## Get the (shared) Block search index of a user repository
+    Returns `None` when the index is disabled (see `config.set_block_search_db_path`) or not
+    supported by the installed SQLite version, in which case callers scan the Pages instead.'''
+    db_path = get_block_search_db_path()
+    if db_path is None or not is_fts5_available():
+        return None
+    with _search_indexes_lock:
+        index = _search_indexes.get((db_path, repo_path))
+        if index is None:
+            index = BlockSearchIndex(repo_path, db_path)
+            _search_indexes[(db_path, repo_path)] = index
+            register_page_listener(index)
+        return index
+
+def get_block_search_index_stats() -> IndexStats:
+    with _search_indexes_lock:
+        indexes = list(_search_indexes.values())
+    return IndexStats(len(indexes), sum(index.page_count for index in indexes))
+
+def drop_block_search_index(repo_path: Path) -> None:
+    '''## Close the Block search index of a repository (the indexed Blocks stay in the database)
+    **NOTE:** doesn't unregister it as a Page listener (see `index_utils.drop_reference_index`)'''
+    with _search_indexes_lock:
+        keys = [key for key in _search_indexes if key[1] == repo_path]
+        indexes = [_search_indexes.pop(key) for key in keys]
+    for index in indexes:
+        index.close()
@@ -1,9 +1,19 @@
-from typing import Generator
+import logging
+import threading
+import time
+from typing import Dict, Generator, Optional
 from pathlib import Path
 
 from ..models.user_model import User
-from ..config import get_pages_path
+from ..config import get_pages_path, get_watch_repositories
 from .path_utils import create_path_if_not_exit
+from .index_utils import ReferenceIndex, get_reference_index, drop_reference_index
+from .page_search_utils import PageNameIndex, get_page_name_index, drop_page_name_index
+from .search_index_utils import BlockSearchIndex, get_block_search_index, drop_block_search_index
+from .page_metadata_utils import PageMetadataIndex, get_page_metadata_index, drop_page_metadata_index
+from .watch_utils import start_repo_watcher, stop_repo_watcher
+
+logger = logging.getLogger(__name__)
 
 USERS_DIR = 'users'
 ELEGANT_NOTES_REPO_DIRS = [
@@ -18,25 +28,130 @@ USER_ROOT_REPO_DIRS = [
                    #   and projects defined in the pages/ directory
 ]
 
+# Users without a request for this long get their in-memory state (indexes) dropped; it's rebuilt
+#   from their files on their next request
+USER_REPOSITORY_IDLE_SECONDS = 30 * 60
+# How often the background thread looks for idle users (see `start_user_repository_evictor`)
+USER_REPOSITORY_EVICT_INTERVAL_SECONDS = USER_REPOSITORY_IDLE_SECONDS / 10
+
 def get_repo_path() -> Path:
     path = get_pages_path().parent
     create_path_if_not_exit(path)
     return path
 
+class UserRepository:
+    '''## Handle to a user's repository, with everything the server keeps in memory for it
+    The paths are resolved (and created) once, when the handle is first created, so requests don't
+    have to touch the file system before doing their actual work. The indexes are created on first
+    use and dropped along with the handle once the user has been idle for a while. While the handle
+    exists, the repository is watched for edits made outside the API (if enabled, see `watch_utils`).'''
+    def __init__(self, user_id: str, root_repo_path: Path):
+        self.user_id: str = user_id
+        self.root_repo_path: Path = root_repo_path
+        self.repo_path: Path = root_repo_path / USERS_DIR / user_id
+        self.pages_path: Path = self.repo_path / 'pages'
+        create_path_if_not_exit(self.pages_path) # creates the user's folder as well
+        self.last_used: float = time.monotonic()
+        if get_watch_repositories():
+            start_repo_watcher(self.repo_path)
+
+    @property
+    def reference_index(self) -> ReferenceIndex:
+        return get_reference_index(self.repo_path)
+
+    @property
+    def page_name_index(self) -> PageNameIndex:
+        return get_page_name_index(self.repo_path)
+
+    @property
+    def page_metadata_index(self) -> PageMetadataIndex:
+        return get_page_metadata_index(self.pages_path)
+
+    @property
+    def block_search_index(self) -> Optional[BlockSearchIndex]:
+        return get_block_search_index(self.repo_path)
+
+    def release(self) -> None:
+        '''## Drop the in-memory state of the repository (the files are left alone)
+        **NOTE:** the state is kept by path, so this has to happen before the user gets a new handle
+        (see `evict_idle_user_repositories`), or the new handle's watcher and indexes go with it'''
+        stop_repo_watcher(self.repo_path)
+        drop_reference_index(self.repo_path)
+        drop_page_name_index(self.repo_path)
+        drop_block_search_index(self.repo_path)
+        drop_page_metadata_index(self.pages_path)
+
+_user_repositories: Dict[str, UserRepository] = {}
+_user_repositories_lock = threading.Lock()
+_evictor: Optional[threading.Thread] = None
+_evictor_stop_event = threading.Event()
+
+def get_user_repository(user: User, root_repo_path: Path = get_repo_path()) -> UserRepository:
+    '''## Get the (cached) repository handle of a user
+    **NOTE:** this will create the user's folders if they do not exist'''
+    with _user_repositories_lock:
+        repository = _user_repositories.get(user.id)
+        if repository is None or repository.root_repo_path != root_repo_path:
+            repository = UserRepository(user.id, root_repo_path)
+            _user_repositories[user.id] = repository
+        repository.last_used = time.monotonic()
+        return repository
+
+def evict_idle_user_repositories(max_idle_seconds: float = USER_REPOSITORY_IDLE_SECONDS) -> int:
+    '''## Release the repositories of users idle for at least `max_idle_seconds`
+    Happens on its own every now and then (see `start_user_repository_evictor`). Returns how many
+    were released.'''
+    with _user_repositories_lock:
+        idle = [repository for repository in _user_repositories.values()
+                if repository.last_used <= time.monotonic() - max_idle_seconds]
+        # still holding the lock, so a user coming back in the meantime waits for a new handle
+        #   until the old one is fully released
+        for repository in idle:
+            del _user_repositories[repository.user_id]
+            repository.release()
+    return len(idle)
+
+def start_user_repository_evictor(interval_seconds: float = USER_REPOSITORY_EVICT_INTERVAL_SECONDS,
+                                  max_idle_seconds: float = USER_REPOSITORY_IDLE_SECONDS) -> None:
+    '''## Release idle repositories every `interval_seconds` on a background thread (if not running already)
+    Keeps the releasing off the event loop and out of the way of requests.'''
+    global _evictor
+    if _evictor is not None and _evictor.is_alive():
+        return
+    _evictor_stop_event.clear()
+    _evictor = threading.Thread(target=_evict_until_stopped, args=(interval_seconds, max_idle_seconds),
+                                name='user-repository-evictor', daemon=True)
+    _evictor.start()
+
+def stop_user_repository_evictor() -> None:
+    global _evictor
+    _evictor_stop_event.set()
+    if _evictor is not None:
+        _evictor.join()
+        _evictor = None
+
+def _evict_until_stopped(interval_seconds: float, max_idle_seconds: float) -> None:
+    while not _evictor_stop_event.wait(interval_seconds):
+        try:
+            evict_idle_user_repositories(max_idle_seconds)
+        except Exception: # e.g. a watcher or index failing to shut down; try again next time
+            logger.exception('Failed to release idle user repositories')
+
+def get_user_repository_count() -> int:
+    '''Repositories currently held in memory (one per recently active user)'''
+    with _user_repositories_lock:
+        return len(_user_repositories)
+
 def get_user_repo_path(user: User, root_repo_path: Path = get_repo_path()) -> Path:
     '''## Get the path to the user's root folder
     **NOTE:** this will create the path if it does not exist'''
-    user_path = root_repo_path / USERS_DIR / user.id
-    create_path_if_not_exit(user_path)
-    return user_path
+    return get_user_repository(user, root_repo_path).repo_path
 
 def get_page_objects(user_repo_path: Path) -> Generator[Path, None, None]:
     return user_repo_path.rglob('*.md')
 
 def get_user_pages_path(user: User, root_repo_path: Path = get_repo_path()) -> Path:
-    pages_path = get_user_repo_path(user, root_repo_path) / 'pages'
-    create_path_if_not_exit(pages_path)
-    return pages_path
+    return get_user_repository(user, root_repo_path).pages_path
 
 def create_user_repo(repo_path: Path, new_user: User):
     user_directory_name = new_user.id
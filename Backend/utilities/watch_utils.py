@@ -0,0 +1,218 @@
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from pathlib import Path
+
+from watchfiles import watch
+
+from .index_utils import register_page_listener, on_page_written, on_page_removed
+from .metrics_utils import metrics
+
+# Changes are collected until nothing changed for `WATCH_STEP_MS`, but for at most
+#   `WATCH_DEBOUNCE_MS`, so a sync tool writing hundreds of files results in a few batches
+WATCH_DEBOUNCE_MS = 1000
+WATCH_STEP_MS = 100
+# A batch this big is most likely a sync, and may well be missing events the OS dropped (inotify
+#   queue overflow); checking the whole repository is cheaper and safer than going event by event
+WATCH_RESCAN_THRESHOLD = 500
+# Safety net for events lost without any sign of it
+WATCH_RESCAN_INTERVAL_SECONDS = 10 * 60
+# How long the watcher waits before watching again after an error
+WATCH_RETRY_SECONDS = 5
+
+FileStamp = Tuple[int, int] # (modification time in ns, size)
+
+class RepoWatcher:
+    '''## Keeps the indexes and caches of a user repository in line with edits made outside the API
+    Watches the repository (with `watchfiles`) on a background thread and feeds every Page
+    created, changed or removed by something else (sync tools, other editors) into the usual Page
+    hooks of `index_utils`, which update every index and invalidate the Page cache.
+
+    A manifest of the modification time and size of every Page is kept along the way. It tells
+    changes apart from events about files the API itself just wrote (the watcher is a Page listener
+    too, so it knows about those), and is what full rescans compare against: on start, after
+    errors, for very large batches and every now and then, in case events got dropped.'''
+    def __init__(self, repo_path: Path):
+        self._repo_path: Path = repo_path
+        self._lock = threading.Lock()
+        self._manifest: Dict[Path, FileStamp] = {}
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_rescan: float = 0.0
+
+    @property
+    def repo_path(self) -> Path:
+        return self._repo_path
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name=f'repo-watcher-{self._repo_path.name}', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop_event.set()
+        if self._thread is not None and timeout != 0:
+            self._thread.join(timeout)
+
+    def rescan(self) -> int:
+        '''## Compare every Page against the manifest and pass on whatever changed
+        Returns how many Pages were found changed, added or removed.'''
+        self._last_rescan = time.monotonic()
+        metrics.increment('repo_watch_rescans_total')
+        return self._reconcile([self._repo_path])
+
+    def apply_changes(self, changed_paths: Iterable[Path]) -> int:
+        '''## Pass on the changes of a batch of events (paths of files or folders)
+        Returns how many Pages were actually changed, added or removed.'''
+        changed_paths = set(changed_paths)
+        if len(changed_paths) >= WATCH_RESCAN_THRESHOLD:
+            return self.rescan()
+        return self._reconcile(changed_paths)
+
+    ##
+    ## Page listener: keeps the manifest in line with what the API writes itself
+    ##
+
+    def update_page(self, path: Path) -> None:
+        stamp = _stat_page(path)
+        with self._lock:
+            if stamp is None:
+                self._manifest.pop(path, None)
+            else:
+                self._manifest[path] = stamp
+
+    def remove_page(self, path: Path) -> None:
+        with self._lock:
+            self._manifest.pop(path, None)
+
+    def rename_page(self, old_path: Path, new_path: Path) -> None:
+        self.remove_page(old_path)
+        self.update_page(new_path)
+
+    ##
+    ## Background thread
+    ##
+
+    def _run(self) -> None:
+        self._record_baseline()
+        while not self._stop_event.is_set():
+            try:
+                for changes in watch(self._repo_path,
+                                     watch_filter=_is_page_event,
+                                     debounce=WATCH_DEBOUNCE_MS,
+                                     step=WATCH_STEP_MS,
+                                     stop_event=self._stop_event,
+                                     rust_timeout=WATCH_RESCAN_INTERVAL_SECONDS * 1000 // 10,
+                                     yield_on_timeout=True,
+                                     raise_interrupt=False):
+                    if changes:
+                        metrics.increment('repo_watch_events_total', len(changes))
+                        self.apply_changes(Path(path) for _, path in changes)
+                    if time.monotonic() - self._last_rescan >= WATCH_RESCAN_INTERVAL_SECONDS:
+                        self.rescan()
+            except Exception: # e.g. the repository was removed, or the OS ran out of watches
+                metrics.increment('repo_watch_errors_total')
+                if self._stop_event.wait(WATCH_RETRY_SECONDS):
+                    return
+                # whatever happened while not watching is only found by comparing with the manifest
+                self.rescan()
+
+    def _record_baseline(self) -> None:
+        # the indexes are built from the files as they are now, so nothing to pass on yet
+        pages = _scan_pages(self._repo_path)
+        with self._lock:
+            self._manifest.update(pages)
+        self._last_rescan = time.monotonic()
+
+    def _reconcile(self, paths: Iterable[Path]) -> int:
+        current: Dict[Path, FileStamp] = {}
+        removed: List[Path] = []
+        with self._lock:
+            known = dict(self._manifest)
+        for path in paths:
+            found = _scan_pages(path)
+            current.update(found)
+            if path in known and path not in found:
+                removed.append(path)
+            elif path.suffix != '.md' or path == self._repo_path: # a folder (or what used to be one)
+                removed.extend(known_path for known_path in known
+                               if known_path.is_relative_to(path) and known_path not in found)
+        changed = [path for path, stamp in current.items() if known.get(path) != stamp]
+
+        # the hooks come back to this watcher (as a Page listener) to update the manifest
+        for path in sorted(changed):
+            on_page_written(path)
+        for path in sorted(set(removed)):
+            on_page_removed(path)
+        return len(changed) + len(set(removed))
+
+def _is_page_event(_, path: str) -> bool:
+    name = os.path.basename(path)
+    # hidden files include the temporary files of saves in progress (see `write_queue_utils`)
+    return not name.startswith('.') and (name.endswith('.md') or '.' not in name)
+
+def _stat_page(path: Path) -> Optional[FileStamp]:
+    try:
+        stat = os.stat(str(path))
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def _scan_pages(path: Path) -> Dict[Path, FileStamp]:
+    '''## Stamps of every Page at or under `path` (nothing if it doesn't exist)'''
+    if path.suffix == '.md':
+        stamp = _stat_page(path)
+        return {} if stamp is None else {path: stamp}
+
+    pages: Dict[Path, FileStamp] = {}
+    folders = [path]
+    scanned_count = 0
+    while folders:
+        try:
+            entries = os.scandir(str(folders.pop()))
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        with entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    folders.append(Path(entry.path))
+                elif entry.name.endswith('.md'):
+                    scanned_count += 1
+                    stat = entry.stat()
+                    pages[Path(entry.path)] = (stat.st_mtime_ns, stat.st_size)
+    metrics.increment('page_files_scanned_total', scanned_count, index='watcher')
+    return pages
+
+_watchers: Dict[Path, RepoWatcher] = {}
+_watchers_lock = threading.Lock()
+
+def start_repo_watcher(repo_path: Path) -> RepoWatcher:
+    '''## Start watching a user repository (if it isn't watched already)'''
+    with _watchers_lock:
+        watcher = _watchers.get(repo_path)
+        if watcher is None:
+            watcher = RepoWatcher(repo_path)
+            _watchers[repo_path] = watcher
+            register_page_listener(watcher)
+            watcher.start()
+        return watcher
+
+def stop_repo_watcher(repo_path: Path) -> None:
+    '''**NOTE:** doesn't unregister it as a Page listener (see `index_utils.drop_reference_index`)'''
+    with _watchers_lock:
+        watcher = _watchers.pop(repo_path, None)
+    if watcher is not None:
+        watcher.stop(timeout=0) # it notices within `WATCH_STEP_MS`; no need to wait for it here
+
+def stop_repo_watchers() -> None:
+    with _watchers_lock:
+        watchers = list(_watchers.values())
+        _watchers.clear()
+    for watcher in watchers:
+        watcher.stop()
+
+def get_repo_watcher_count() -> int:
+    with _watchers_lock:
+        return len(_watchers)
@@ -0,0 +1,263 @@
+import logging
+import os
+import stat
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+from pathlib import Path
+
+from ..config import get_save_coalesce_window, get_save_fsync
+from .index_utils import on_page_written
+
+logger = logging.getLogger(__name__)
+
+# Saves that failed to be written (full disk, permissions, ...) stay queued and are tried again after this many seconds
+SAVE_RETRY_DELAY = 1.0
+
+class WriteQueueStats(NamedTuple):
+    submitted: int # saves handed to the queue
+    written: int   # actual file writes
+    coalesced: int # saves replaced by a newer one before being written
+    failed: int    # failed file writes (the saves stay queued)
+    pending: int
+
+def write_page_atomically(path: Path, content: str, fsync: bool = False) -> None:
+    '''## Replace a Page file's content without ever leaving a half-written file behind
+    The content goes to a temporary file in the same directory first (see `stage_page_content`),
+    which is then moved over the Page (`os.replace` is atomic on the same file system).'''
+    tmp_path = stage_page_content(path, content, fsync)
+    try:
+        os.replace(str(tmp_path), str(path))
+    except BaseException:
+        _remove_if_exists(tmp_path)
+        raise
+
+def stage_page_content(path: Path, content: str, fsync: bool = False) -> Path:
+    '''## Write the new content of a Page to a temporary file next to it, to be moved over it later
+    The file gets the Page's permissions (or the usual ones for a new Page).'''
+    # not ending in `.md`, so repo scans never pick up the temporary file
+    fd, tmp_name = tempfile.mkstemp(dir=str(path.parent), prefix=f'.{path.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        try:
+            os.chmod(tmp_name, stat.S_IMODE(os.stat(str(path)).st_mode))
+        except FileNotFoundError:
+            os.chmod(tmp_name, 0o644) # new Page; `mkstemp` would leave it readable by us only
+    except BaseException:
+        _remove_if_exists(Path(tmp_name))
+        raise
+    return Path(tmp_name)
+
+def _remove_if_exists(path: Path) -> None:
+    try:
+        os.unlink(str(path))
+    except FileNotFoundError:
+        pass
+
+def fsync_directory(path: Path) -> None:
+    '''Makes renames within the directory durable (needed once per batch, not per file)'''
+    fd = os.open(str(path), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class PageWriteQueue:
+    '''## Write-behind queue for Page saves
+    Saves to the same Page arriving within the coalescing window are merged into a single write of
+    the latest content. Pending saves are written by a background thread once their window ends,
+    or right away when something needs to read the Page (`flush`/`flush_under`) or on shutdown.
+    With a window of `0` every save is written immediately (still atomically).
+    A save that fails to be written isn't dropped: it stays queued to be tried again, and flushing
+    the Page raises the error (the Page content on disk isn't the latest).'''
+    def __init__(self):
+        self._pending: Dict[Path, Tuple[str, float]] = {} # path -> (content, time to write it at)
+        self._condition = threading.Condition()
+        self._writing: Set[Path] = set()
+        self._worker: Optional[threading.Thread] = None
+        self._stopping: bool = False
+        self._submitted: int = 0
+        self._written: int = 0
+        self._coalesced: int = 0
+        self._failed: int = 0
+
+    def submit(self, path: Path, content: str) -> None:
+        window = get_save_coalesce_window()
+        if window <= 0:
+            with self._condition:
+                self._submitted += 1
+            self._write(path, content, get_save_fsync())
+            if get_save_fsync():
+                fsync_directory(path.parent)
+            return
+        with self._condition:
+            self._submitted += 1
+            if path in self._pending:
+                self._coalesced += 1
+                deadline = self._pending[path][1] # keep the first deadline so constant typing still gets saved
+            else:
+                deadline = time.monotonic() + window
+            self._pending[path] = (content, deadline)
+            self._start_worker_if_needed()
+            self._condition.notify()
+
+    def pending_content(self, path: Path) -> Optional[str]:
+        with self._condition:
+            pending = self._pending.get(path)
+            return None if pending is None else pending[0]
+
+    def flush(self, path: Path) -> None:
+        '''## Write the pending save of a Page (if any) before returning
+        Raises the `OSError` if it can't be written.'''
+        self._flush_matching(lambda pending_path: pending_path == path)
+
+    def flush_under(self, directory: Path) -> None:
+        '''## Write every pending save of Pages in `directory` (recursively) before returning
+        Raises the `OSError` of the first one that can't be written.'''
+        self._flush_matching(lambda pending_path: pending_path.is_relative_to(directory))
+
+    def flush_all(self) -> None:
+        self._flush_matching(lambda pending_path: True)
+
+    def shutdown(self) -> None:
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        try:
+            self.flush_all()
+        except OSError:
+            pass # already logged, and nothing is left to try again later
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+        with self._condition:
+            self._stopping = False
+
+    def stats(self) -> WriteQueueStats:
+        with self._condition:
+            return WriteQueueStats(self._submitted, self._written, self._coalesced, self._failed, len(self._pending))
+
+    def _flush_matching(self, matches) -> None:
+        with self._condition:
+            # also wait for the background thread if it's in the middle of writing one of them
+            while any(matches(path) for path in self._writing):
+                self._condition.wait()
+            batch = self._take([path for path in self._pending if matches(path)])
+        if batch:
+            error = self._write_batch(batch)
+            if error is not None:
+                raise error
+
+    def _take(self, paths: List[Path]) -> List[Tuple[Path, str]]:
+        # caller holds the lock
+        batch = [(path, self._pending.pop(path)[0]) for path in paths]
+        self._writing.update(path for path, _ in batch)
+        return batch
+
+    def _write_batch(self, batch: List[Tuple[Path, str]]) -> Optional[OSError]:
+        '''Returns the first error; the saves that failed are queued again'''
+        fsync = get_save_fsync()
+        failed: List[Tuple[Path, str]] = []
+        error: Optional[OSError] = None
+        tried_count = 0
+        try:
+            for path, content in batch:
+                tried_count += 1
+                try:
+                    self._write(path, content, fsync)
+                except OSError as e:
+                    logger.exception('Failed to save Page %s', path)
+                    failed.append((path, content))
+                    error = e if error is None else error
+            if fsync:
+                for directory in set(path.parent for path, _ in batch):
+                    try:
+                        fsync_directory(directory)
+                    except OSError as e: # written, but possibly not durable yet
+                        logger.exception('Failed to sync directory %s', directory)
+                        error = e if error is None else error
+        finally:
+            with self._condition:
+                self._failed += len(failed)
+                retry_at = time.monotonic() + SAVE_RETRY_DELAY
+                # after something unexpected, the saves not tried yet are kept as well
+                for path, content in failed + batch[tried_count:]:
+                    if path not in self._pending: # unless a newer save came in while writing
+                        self._pending[path] = (content, retry_at)
+                if failed or tried_count < len(batch):
+                    self._start_worker_if_needed()
+                # in the same step, so a flush never finds a failed save neither being written nor queued
+                self._writing.difference_update(path for path, _ in batch)
+                self._condition.notify_all()
+        return error
+
+    def _write(self, path: Path, content: str, fsync: bool) -> None:
+        write_page_atomically(path, content, fsync)
+        with self._condition:
+            self._written += 1
+        try:
+            on_page_written(path)
+        except Exception: # e.g. the Block search database being locked; the save itself went through
+            logger.exception('Failed to update the indexes for Page %s', path)
+
+    def _start_worker_if_needed(self) -> None:
+        # caller holds the lock
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name='page-write-queue', daemon=True)
+            self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._stopping:
+                    now = time.monotonic()
+                    # Pages being written by a flush right now have to wait for it to finish
+                    ready = [(deadline, path) for path, (_, deadline) in self._pending.items() if path not in self._writing]
+                    due = [path for deadline, path in ready if deadline <= now]
+                    if due:
+                        break
+                    next_deadline = min((deadline for deadline, _ in ready), default=None)
+                    self._condition.wait(None if next_deadline is None else next_deadline - now)
+                if self._stopping:
+                    return
+                batch = self._take(due)
+            try:
+                self._write_batch(batch) # nobody to report failures to here; the next flush will
+            except Exception: # anything else (already cleaned up), so the thread keeps going
+                logger.exception('Failed to save Pages')
+
+class PageLocks:
+    '''## A lock per Page, for saves that depend on what the Page currently holds
+    E.g. checking the version a client edited against before saving: without holding the lock from
+    the check until the save is submitted, two saves made against the same version could both pass
+    and the second would silently undo the first. Locks only exist while someone holds them.'''
+    def __init__(self):
+        self._locks: Dict[Path, Tuple[threading.Lock, int]] = {} # path -> (lock, holders and waiters)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def hold(self, path: Path) -> Iterator[None]:
+        with self._lock:
+            lock, user_count = self._locks.get(path, (None, 0))
+            lock = threading.Lock() if lock is None else lock
+            self._locks[path] = (lock, user_count + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self._lock:
+                lock, user_count = self._locks[path]
+                if user_count == 1:
+                    del self._locks[path]
+                else:
+                    self._locks[path] = (lock, user_count - 1)
+
+# shared by everything saving Pages in this process
+page_write_queue = PageWriteQueue()
+page_locks = PageLocks()